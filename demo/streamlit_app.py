@@ -4,7 +4,32 @@ import numpy as np
 import implicit
 import dvc.api
 import os
+import pickle
 branch = os.environ.get('BRANCH', 'dev')
+# Recommend from the item index saved by the implicit_ann or ann pipeline
+ann_enabled = os.environ.get('ANN_ENABLED', 'false').lower() == 'true'
+
+@st.cache(allow_output_mutation=True)
+def load_serving(branch, regularization):
+    """The fold-in solver and the pickled item index, loaded once per branch."""
+    from productrec.models import FoldIn
+
+    with dvc.api.open(
+            'data/interim/item_factors.npy',
+            rev=branch,
+            mode='rb',
+            repo='https://github.com/hsv-ai/product-recommendation') as f:
+        item_factors = np.load(f)
+
+    # data/06_models/item_index.pkl, copied next to the other demo artifacts
+    with dvc.api.open(
+            'data/interim/item_index.pkl',
+            rev=branch,
+            mode='rb',
+            repo='https://github.com/hsv-ai/product-recommendation') as f:
+        item_index = pickle.load(f)
+
+    return FoldIn(item_factors, regularization), item_index
 
 def app():
     st.image("https://github.com/HSV-AI/hugo-website/blob/master/static/images/logo_v9.png?raw=true")
@@ -58,8 +83,13 @@ def app():
     model.user_factors = user_factors
     model.item_factors = item_factors
 
-    invoices = selected_df.InvoiceNo.unique()
+    # Hash lookups for the invoice row and the item descriptions, not list scans
+    invoices = pd.Index(selected_df.InvoiceNo.unique())
     products = selected_df.StockCode.unique()
+    descriptions_by_code = item_lookup \
+        .drop_duplicates('StockCode') \
+        .set_index('StockCode') \
+        .iloc[:, 0]
 
     selection = st.selectbox('Select an invoice', np.random.choice(invoices, 5))
 
@@ -74,9 +104,17 @@ def app():
     st.write("The invoice",selection,'containes',len(display_df.StockCode.unique()),'items, displayed below:')
     st.table(display_df)
 
-    invoice_index = list(invoices).index(selection)
+    invoice_index = invoices.get_loc(selection)
     user_items = (product_train * 1).astype('double').T.tocsr()
-    recommendations = model.recommend(invoice_index, user_items)
+    if ann_enabled:
+        # Fold the invoice in and take the top 10 from the index, as served
+        fold_in, item_index = load_serving(branch, regularization)
+        ids, scores = fold_in.recommend(user_items[invoice_index], N=10,
+                                        index=item_index)
+        recommendations = [(index, score) for index, score in zip(ids[0], scores[0])
+                           if index >= 0]
+    else:
+        recommendations = model.recommend(invoice_index, user_items)
 
     st.write('Recommended items based on all other invoices:')
 
@@ -89,9 +127,7 @@ def app():
         probabilities.append(prob)
         stock_code = products[index]
         stock_codes.append(stock_code)
-        item = item_lookup[item_lookup.StockCode == stock_code].values
-        description = item[0][1]
-        descriptions.append(description)
+        descriptions.append(descriptions_by_code[stock_code])
 
     recommendation_df = pd.DataFrame({'Probability':probabilities,'StockCode':stock_codes,'Description':descriptions})
     st.table(recommendation_df)
@@ -0,0 +1,83 @@
+"""Measurements that back storage and performance decisions for the project."""
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+import pandas as pd
+
+from productrec.extras.datasets import ChunkedParquetDataSet
+from productrec.memory import peak_rss, reset_peak_rss
+
+ID_COLUMNS = ["order_id", "product_id", "customer_id"]
+
+
+def compare_formats(data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                    categorical: List[str] = None,
+                    dtypes: Dict[str, str] = None, columns: List[str] = None,
+                    directory: str = None) -> pd.DataFrame:
+    """Load time, memory and file size of ``data`` stored as CSV and Parquet.
+
+    The table is written as CSV (as ``pandas.CSVDataSet`` saves it) and as
+    Parquet with ``categorical`` id columns (as ``ChunkedParquetDataSet`` saves
+    it). Each file is then loaded in a new process, so every measurement
+    starts from the same baseline; ``peak_rss_mb`` is the transient peak of
+    the load and ``frame_mb`` the size of the loaded frame. ``columns`` adds
+    a projected Parquet load. Chunked datasets may be passed as an iterable
+    of frames. Measured results are in ``docs/source/format_comparison.md``.
+    """
+
+    if not isinstance(data, pd.DataFrame):
+        data = pd.concat(data, ignore_index=True)
+    categorical = [c for c in (categorical or ID_COLUMNS) if c in data]
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        csv_path = Path(temp_dir) / "data.csv"
+        parquet_path = Path(temp_dir) / "data.parquet"
+
+        data.to_csv(csv_path, index=False)
+        ChunkedParquetDataSet(str(parquet_path), categorical=categorical,
+                              dtypes=dtypes).save(data)
+
+        runs = [("csv", csv_path, None), ("parquet", parquet_path, None)]
+        if columns:
+            runs.append(("parquet", parquet_path, list(columns)))
+
+        rows = []
+        for file_format, path, projection in runs:
+            seconds, peak, frame_bytes = _measure_in_subprocess(
+                file_format, str(path), projection)
+            rows.append({
+                "format": file_format,
+                "columns": ",".join(projection) if projection else "all",
+                "file_mb": path.stat().st_size / 2 ** 20,
+                "load_seconds": seconds,
+                "peak_rss_mb": peak / 2 ** 10,
+                "frame_mb": frame_bytes / 2 ** 20,
+            })
+
+    return pd.DataFrame(rows)
+
+
+def _measure_in_subprocess(file_format, path, columns):
+
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(_measure_load, file_format, path, columns).result()
+
+
+def _measure_load(file_format, path, columns):
+
+    # Importing pandas and pyarrow already peaks above a small load, so the
+    # high-water mark is reset to the current RSS before measuring
+    baseline = reset_peak_rss()
+    start = time.perf_counter()
+    if file_format == "csv":
+        frame = pd.read_csv(path, usecols=columns)
+    else:
+        frame = pd.read_parquet(path, columns=columns)
+    seconds = time.perf_counter() - start
+    peak = peak_rss() - baseline
+    frame_bytes = frame.memory_usage(deep=True).sum()
+    del frame
+    return seconds, peak, frame_bytes
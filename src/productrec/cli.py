@@ -46,6 +46,9 @@ This option cannot be used together with --parallel."""
 PARALLEL_ARG_HELP = """Run the pipeline using the `ParallelRunner`.
 If not specified, use the `SequentialRunner`. This flag cannot be used together
 with --runner."""
+MEMOIZE_ARG_HELP = """Skip nodes whose code, inputs and parameters are unchanged
+since a previous run, loading their outputs from the node cache instead.
+This option cannot be used together with --parallel or --runner."""
 ASYNC_ARG_HELP = """Load and save node inputs and outputs asynchronously
 with threads. If not specified, load and save datasets synchronously."""
 TAG_ARG_HELP = """Construct the pipeline using only nodes which have this tag
@@ -61,6 +64,17 @@ PARAMS_ARG_HELP = """Specify extra parameters that you want to pass
 to the context initializer. Items must be separated by comma, keys - by colon,
 example: param1:value1,param2:value2. Each parameter is split by the first comma,
 so parameter values are allowed to contain colons, parameter keys are not."""
+DATASET_ARG_HELP = """Name of the catalog dataset to measure."""
+COLUMNS_ARG_HELP = """Comma separated columns for an extra, projected Parquet load."""
+OUTPUT_ARG_HELP = """File the comparison is written to as JSON."""
+PROFILE_ARG_HELP = """Run profile to summarize. Defaults to the most recent one
+in --directory."""
+PROFILE_DIR_HELP = """Directory the instrumentation hook writes run profiles to."""
+TOP_ARG_HELP = """Number of nodes and datasets to list."""
+CACHE_DIR_HELP = """Directory of the node cache."""
+CACHE_NODE_HELP = """Only clear the cached outputs of this node."""
+THRESHOLD_ARG_HELP = """Flag nodes and datasets that take at least this fraction
+of the run's wall time."""
 
 
 def _get_values_as_tuple(values: Iterable[str]) -> Tuple[str, ...]:
@@ -90,6 +104,7 @@ def cli():
     "--runner", "-r", type=str, default=None, multiple=False, help=RUNNER_ARG_HELP
 )
 @click.option("--parallel", "-p", is_flag=True, multiple=False, help=PARALLEL_ARG_HELP)
+@click.option("--memoize", is_flag=True, multiple=False, help=MEMOIZE_ARG_HELP)
 @click.option("--async", "is_async", is_flag=True, multiple=False, help=ASYNC_ARG_HELP)
 @env_option
 @click.option("--tag", "-t", type=str, multiple=True, help=TAG_ARG_HELP)
@@ -116,6 +131,7 @@ def run(
     tag,
     env,
     parallel,
+    memoize,
     runner,
     is_async,
     node_names,
@@ -134,9 +150,15 @@ def run(
             "Both --parallel and --runner options cannot be used together. "
             "Please use either --parallel or --runner."
         )
+    if memoize and (parallel or runner):
+        raise KedroCliError(
+            "The --memoize option cannot be used together with --parallel or --runner."
+        )
     runner = runner or "SequentialRunner"
     if parallel:
         runner = "ParallelRunner"
+    if memoize:
+        runner = "productrec.memoize.MemoizingRunner"
     runner_class = load_obj(runner, "kedro.runner")
 
     tag = _get_values_as_tuple(tag) if tag else tag
@@ -155,3 +177,95 @@ def run(
             load_versions=load_version,
             pipeline_name=pipeline,
         )
+
+
+@cli.command("compare-formats")
+@env_option
+@click.option(
+    "--dataset", type=str, default="clean_transactions", help=DATASET_ARG_HELP
+)
+@click.option("--columns", type=str, default="", help=COLUMNS_ARG_HELP)
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False),
+    default="data/08_reporting/format_comparison.json",
+    help=OUTPUT_ARG_HELP,
+)
+def compare_formats(env, dataset, columns, output):
+    """Compare CSV and Parquet load time and memory for a catalog dataset."""
+    from productrec.benchmarks import compare_formats as run_comparison
+
+    package_name = str(Path(__file__).resolve().parent.name)
+    with KedroSession.create(package_name, env=env) as session:
+        data = session.load_context().catalog.load(dataset)
+
+    comparison = run_comparison(
+        data, dtypes={"quantity": "int32"}, columns=split_string(None, None, columns)
+    )
+    click.echo(comparison.to_string(index=False))
+
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    comparison.to_json(output, orient="records", indent=2)
+
+
+@cli.command("profile-summary")
+@click.option(
+    "--profile",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help=PROFILE_ARG_HELP,
+)
+@click.option(
+    "--directory", type=str, default="data/08_reporting/profiles", help=PROFILE_DIR_HELP
+)
+@click.option("--top", type=int, default=5, help=TOP_ARG_HELP)
+@click.option("--threshold", type=float, default=0.1, help=THRESHOLD_ARG_HELP)
+def profile_summary(profile, directory, top, threshold):
+    """Show the slowest nodes and datasets of a profiled run."""
+    from productrec.instrumentation import load_profile, summarize
+
+    try:
+        run = load_profile(profile, directory)
+    except FileNotFoundError as err:
+        raise KedroCliError(str(err))
+    nodes, datasets = summarize(run, top=top, threshold=threshold)
+
+    click.echo(
+        "Pipeline {} ({}), run {}: {:.1f}s".format(
+            run["pipeline"], run["status"], run["run_id"], run["wall_seconds"]
+        )
+    )
+    click.echo("\nSlowest nodes:")
+    click.echo(nodes.to_string(index=False, float_format="{:.2f}".format))
+    click.echo("\nSlowest dataset loads and saves:")
+    click.echo(datasets.to_string(index=False, float_format="{:.2f}".format))
+
+
+@cli.group()
+def cache():
+    """Inspect or clear the node cache of `kedro run --memoize`."""
+
+
+@cache.command("info")
+@click.option("--directory", type=str, default="data/09_cache", help=CACHE_DIR_HELP)
+def cache_info(directory):
+    """List the cached node outputs, most recently used first."""
+    from productrec.memoize import NodeCache
+
+    entries = NodeCache(directory).entries()
+    click.echo(
+        "{} entries, {:.1f} MB in {}".format(len(entries), entries.mb.sum(), directory)
+    )
+    if len(entries):
+        click.echo(entries.to_string(index=False, float_format="{:.1f}".format))
+
+
+@cache.command("clear")
+@click.option("--directory", type=str, default="data/09_cache", help=CACHE_DIR_HELP)
+@click.option("--node", "-n", "node_name", type=str, default=None, help=CACHE_NODE_HELP)
+def cache_clear(directory, node_name):
+    """Remove cached node outputs."""
+    from productrec.memoize import NodeCache
+
+    dropped = NodeCache(directory).clear(node_name)
+    click.echo("Removed {} cache entries".format(dropped))
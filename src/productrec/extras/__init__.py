@@ -0,0 +1 @@
+"""Custom extensions for the project."""
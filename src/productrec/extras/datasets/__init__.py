@@ -0,0 +1,5 @@
+"""Custom ``AbstractDataSet`` implementations for the project."""
+from .chunked_csv import ChunkedCSVDataSet
+from .chunked_parquet import ChunkedParquetDataSet
+from .memmap_array import MemmapArrayDataSet
+from .model_artifact import ModelArtifactDataSet
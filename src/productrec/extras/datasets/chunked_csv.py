@@ -0,0 +1,63 @@
+"""``ChunkedCSVDataSet`` streams a CSV file in chunks instead of loading it as
+one ``pandas.DataFrame``, and saves data that arrives as a stream of chunks.
+"""
+from typing import Any, Iterable, Iterator, Union
+
+import pandas as pd
+from kedro.extras.datasets.pandas import CSVDataSet
+from kedro.io.core import get_filepath_str
+
+
+class ChunkedCSVDataSet(CSVDataSet):
+    """``ChunkedCSVDataSet`` behaves like ``pandas.CSVDataSet``, except that:
+
+    * when ``load_args`` has a ``chunksize``, loading returns an iterator of
+      DataFrames. The file stays open until the iterator is used up, so only
+      one chunk is in memory at a time.
+    * saving accepts a DataFrame or any iterable of DataFrames. Chunks are
+      appended to the file as they arrive, and only the first one writes the
+      header.
+
+    Example catalog entries:
+
+    .. code-block:: yaml
+
+        >>> instacart_kaggle_order_data:
+        >>>   type: productrec.extras.datasets.ChunkedCSVDataSet
+        >>>   filepath: data/01_raw/instacart/order_products__prior.csv.zip
+        >>>   load_args:
+        >>>     compression: 'zip'
+        >>>     chunksize: 1000000
+        >>>
+        >>> transactions:
+        >>>   type: productrec.extras.datasets.ChunkedCSVDataSet
+        >>>   filepath: data/02_intermediate/transactions.csv
+    """
+
+    def _load(self) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        if not self._load_args.get("chunksize"):
+            return super()._load()
+        return self._load_chunks()
+
+    def _load_chunks(self) -> Iterator[pd.DataFrame]:
+        load_path = get_filepath_str(self._get_load_path(), self._protocol)
+
+        with self._fs.open(load_path, **self._fs_open_args_load) as fs_file:
+            with pd.read_csv(fs_file, **self._load_args) as reader:
+                yield from reader
+
+    def _save(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> None:
+        if isinstance(data, pd.DataFrame):
+            super()._save(data)
+            return
+
+        save_path = get_filepath_str(self._get_save_path(), self._protocol)
+
+        with self._fs.open(save_path, **self._fs_open_args_save) as fs_file:
+            header = self._save_args.get("header", True)
+            for chunk in data:
+                chunk.to_csv(path_or_buf=fs_file,
+                             **{**self._save_args, "header": header})
+                header = False
+
+        self._invalidate_cache()
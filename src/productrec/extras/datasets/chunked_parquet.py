@@ -0,0 +1,129 @@
+"""``ChunkedParquetDataSet`` stores tables as Parquet with dictionary encoded id
+columns, and saves data that arrives as a stream of chunks.
+"""
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from kedro.extras.datasets.pandas import ParquetDataSet
+from kedro.io.core import DataSetError, get_filepath_str
+
+
+class ChunkedParquetDataSet(ParquetDataSet):
+    """``ChunkedParquetDataSet`` behaves like ``pandas.ParquetDataSet``, with three
+    additions:
+
+    * ``categorical`` columns are stored as strings with dictionary encoding
+      and int32 indices, and are loaded back as ``category`` columns. Each
+      distinct id is written once per row group rather than once per row.
+    * ``dtypes`` casts other columns to explicit types before saving.
+    * saving accepts a DataFrame or any iterable of DataFrames. Each chunk
+      becomes its own row group through a single ``ParquetWriter``, so chunked
+      transforms never hold the whole table.
+
+    Use ``load_args: {columns: [...]}`` to read only some of the columns.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        >>> transactions:
+        >>>   type: productrec.extras.datasets.ChunkedParquetDataSet
+        >>>   filepath: data/02_intermediate/transactions.parquet
+        >>>   categorical: [order_id, product_id, customer_id]
+        >>>   dtypes:
+        >>>     quantity: int32
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        filepath: str,
+        categorical: List[str] = None,
+        dtypes: Dict[str, str] = None,
+        load_args: Dict[str, Any] = None,
+        save_args: Dict[str, Any] = None,
+        version=None,
+        credentials: Dict[str, Any] = None,
+        fs_args: Dict[str, Any] = None,
+    ) -> None:
+        """Creates a new instance of ``ChunkedParquetDataSet``.
+
+        Args:
+            filepath: Filepath in POSIX format to a Parquet file, as for
+                ``pandas.ParquetDataSet``.
+            categorical: Columns to store as dictionary encoded strings.
+            dtypes: Mapping of column name to the dtype it is saved with.
+            load_args, save_args, version, credentials, fs_args: As for
+                ``pandas.ParquetDataSet``.
+        """
+        super().__init__(
+            filepath=filepath,
+            load_args=load_args,
+            save_args=deepcopy(save_args),
+            version=version,
+            credentials=credentials,
+            fs_args=fs_args,
+        )
+        self._categorical = list(categorical or [])
+        self._dtypes = dict(dtypes or {})
+
+    def _describe(self) -> Dict[str, Any]:
+        return dict(
+            super()._describe(), categorical=self._categorical, dtypes=self._dtypes
+        )
+
+    def _save(self, data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> None:
+        save_path = get_filepath_str(self._get_save_path(), self._protocol)
+
+        if Path(save_path).is_dir():
+            raise DataSetError(
+                f"Saving {self.__class__.__name__} to a directory is not supported."
+            )
+        self._fs.makedirs(Path(save_path).parent.as_posix(), exist_ok=True)
+
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        from_pandas_args = {"preserve_index": False, **self._from_pandas_args}
+
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(self._typed(chunk), **from_pandas_args)
+                if writer is None:
+                    schema = self._schema(table.schema)
+                    writer = pq.ParquetWriter(
+                        save_path, schema, filesystem=self._fs, **self._save_args
+                    )
+                writer.write_table(table.cast(schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            raise DataSetError("No data was given to {}".format(self))
+
+        self._invalidate_cache()
+
+    def _typed(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        chunk = chunk.copy(deep=False)
+        for column in self._categorical:
+            if column in chunk:
+                chunk[column] = chunk[column].astype(str).astype("category")
+        for column, dtype in self._dtypes.items():
+            if column in chunk:
+                chunk[column] = chunk[column].astype(dtype)
+        return chunk
+
+    def _schema(self, schema: pa.Schema) -> pa.Schema:
+        # pandas picks the narrowest index type for each chunk's categories, so
+        # fix the dictionary type to keep every row group on the same schema
+        for column in self._categorical:
+            if column in schema.names:
+                position = schema.get_field_index(column)
+                schema = schema.set(
+                    position, pa.field(column, pa.dictionary(pa.int32(), pa.string()))
+                )
+        return schema
@@ -0,0 +1,38 @@
+"""``MemmapArrayDataSet`` saves a single dense array or sparse matrix as raw
+``.npy`` files, and loads it memory-mapped.
+"""
+from typing import Union
+
+import numpy as np
+from scipy.sparse import spmatrix
+
+from .model_artifact import ModelArtifactDataSet
+
+VALUE = "value"
+
+
+class MemmapArrayDataSet(ModelArtifactDataSet):
+    """``MemmapArrayDataSet`` stores one array the way ``ModelArtifactDataSet``
+    stores the arrays of a model.
+
+    A dense array is written as one ``.npy`` file and a sparse matrix as its
+    ``data``, ``indices`` and ``indptr`` arrays. Arrays that are memory maps
+    themselves, like the factors of ``OutOfCoreALS``, are written straight
+    from their pages, and loading maps the files again instead of reading
+    them. Unlike a pickle, neither direction holds the whole array in memory.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        >>> train:
+        >>>   type: productrec.extras.datasets.MemmapArrayDataSet
+        >>>   path: data/05_model_input/train
+        >>>   mmap_mode: r
+    """
+
+    def _load(self) -> Union[np.ndarray, spmatrix]:
+        return super()._load()[VALUE]
+
+    def _save(self, data: Union[np.ndarray, spmatrix]) -> None:
+        super()._save({VALUE: data})
@@ -0,0 +1,129 @@
+"""``ModelArtifactDataSet`` saves a trained model as a directory of raw ``.npy``
+arrays plus a JSON manifest, and loads the arrays memory-mapped.
+"""
+import json
+import os
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+from kedro.io.core import AbstractDataSet, DataSetError
+from scipy.sparse import csr_matrix, issparse
+
+MANIFEST = "manifest.json"
+
+
+class ModelArtifactDataSet(AbstractDataSet):
+    """``ModelArtifactDataSet`` stores a dictionary describing a model.
+
+    Dense arrays (e.g. ``user_factors`` and ``item_factors``) are written as
+    one ``.npy`` file each, and sparse matrices (e.g. ``product_train``) as
+    separate ``data``, ``indices`` and ``indptr`` arrays. Every other entry
+    (training parameters, the id vocabulary, ...) goes into ``manifest.json``
+    together with the shape and dtype of each array.
+
+    Loading opens the arrays with ``np.load(mmap_mode=...)``, so nothing is
+    read until it is touched. Several processes that load the same artifact
+    share one copy in the page cache. The artifact must be on a local
+    filesystem.
+
+    Example catalog entry:
+
+    .. code-block:: yaml
+
+        >>> model_artifact:
+        >>>   type: productrec.extras.datasets.ModelArtifactDataSet
+        >>>   path: data/06_models/model_artifact
+        >>>   mmap_mode: r
+    """
+
+    def __init__(self, path: str, mmap_mode: str = "r") -> None:
+        """Creates a new instance of ``ModelArtifactDataSet``.
+
+        Args:
+            path: Local directory that holds the manifest and the arrays.
+            mmap_mode: Passed to ``np.load``. ``None`` reads the arrays into
+                memory instead of mapping them.
+        """
+        self._path = Path(path)
+        self._mmap_mode = mmap_mode
+
+    def _describe(self) -> Dict[str, Any]:
+        return dict(path=str(self._path), mmap_mode=self._mmap_mode)
+
+    def _exists(self) -> bool:
+        return (self._path / MANIFEST).exists()
+
+    def _load(self) -> Dict[str, Any]:
+        manifest_path = self._path / MANIFEST
+        if not manifest_path.exists():
+            raise DataSetError("No model artifact found at {}".format(self._path))
+
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+
+        data = deepcopy(manifest["metadata"])
+        for name, entry in manifest["arrays"].items():
+            data[name] = self._load_array(entry)
+
+        for name, entry in manifest["sparse"].items():
+            data[name] = csr_matrix(
+                (
+                    self._load_array(entry["data"]),
+                    self._load_array(entry["indices"]),
+                    self._load_array(entry["indptr"]),
+                ),
+                shape=tuple(entry["shape"]),
+                copy=False,
+            )
+
+        return data
+
+    def _save(self, data: Dict[str, Any]) -> None:
+        self._path.mkdir(parents=True, exist_ok=True)
+
+        manifest = {"arrays": {}, "sparse": {}, "metadata": {}}
+        for name, value in data.items():
+            if issparse(value):
+                value = csr_matrix(value)
+                manifest["sparse"][name] = {
+                    "shape": list(value.shape),
+                    "data": self._save_array(name + ".data", value.data),
+                    "indices": self._save_array(name + ".indices", value.indices),
+                    "indptr": self._save_array(name + ".indptr", value.indptr),
+                }
+            elif isinstance(value, np.ndarray):
+                manifest["arrays"][name] = self._save_array(name, value)
+            else:
+                manifest["metadata"][name] = value
+
+        # The manifest goes last, so a reader never sees a half written artifact
+        self._write_atomic(
+            MANIFEST, lambda f: f.write(json.dumps(manifest, indent=2).encode())
+        )
+
+    def _load_array(self, entry: Dict[str, Any]) -> np.ndarray:
+        array = np.load(self._path / entry["file"], mmap_mode=self._mmap_mode)
+        if list(array.shape) != entry["shape"] or str(array.dtype) != entry["dtype"]:
+            raise DataSetError(
+                "{} does not match the manifest of {}".format(entry["file"], self._path)
+            )
+        return array
+
+    def _save_array(self, name: str, array: np.ndarray) -> Dict[str, Any]:
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            raise DataSetError("Cannot memory map object array {}".format(name))
+
+        filename = name + ".npy"
+        self._write_atomic(filename, lambda f: np.save(f, array))
+        return {"file": filename, "shape": list(array.shape), "dtype": str(array.dtype)}
+
+    def _write_atomic(self, filename: str, write) -> None:
+        # Replace rather than overwrite, so processes that still map the
+        # previous file keep reading consistent data
+        temp_path = self._path / (filename + ".tmp")
+        with open(temp_path, "wb") as temp_file:
+            write(temp_file)
+        os.replace(temp_path, self._path / filename)
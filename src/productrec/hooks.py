@@ -14,13 +14,19 @@
 #
 
 """Project hooks."""
+import logging
 from typing import Any, Dict, Iterable, Optional
 
 from kedro.config import ConfigLoader
 from kedro.framework.hooks import hook_impl
 from kedro.io import DataCatalog
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
 from kedro.versioning import Journal
 
+from productrec import tracking
+from productrec.instrumentation import PROFILE_DIR, RunProfile
+
 
 class ProjectHooks:
     @hook_impl
@@ -41,3 +47,107 @@ class ProjectHooks:
         return DataCatalog.from_config(
             catalog, credentials, load_versions, save_version, journal
         )
+
+
+class MetricsHooks:
+    """Opens one ``tracking`` run per pipeline execution.
+
+    The run logs to the ``metrics_backends`` from the parameters, local files
+    under ``metrics_dir`` by default, and records which node logged what.
+    """
+
+    @hook_impl
+    def before_pipeline_run(
+        self, run_params: Dict[str, Any], pipeline: Pipeline, catalog: DataCatalog
+    ) -> None:
+        params = catalog.load("parameters")
+        name = "{}-{}".format(run_params.get("pipeline_name") or "__default__",
+                              run_params["run_id"])
+        tracking.start_run(
+            name,
+            params,
+            backends=params.get("metrics_backends", ["local"]),
+            directory=params.get("metrics_dir", "data/08_reporting/metrics"),
+            batch_size=params.get("metrics_batch_size", 100),
+            flush_seconds=params.get("metrics_flush_seconds", 5.0),
+        )
+
+    @hook_impl
+    def before_node_run(self, node: Node) -> None:
+        tracking.set_node(node.name)
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        tracking.finish_run()
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        tracking.finish_run()
+
+
+class InstrumentationHooks:
+    """Profiles every node of a run, see ``productrec.instrumentation``.
+
+    The profile is written to ``directory`` when the run ends, also when it
+    fails, and is summarized by ``kedro profile-summary``.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR):
+        self.directory = directory
+        self._profile = None
+
+    @hook_impl
+    def before_pipeline_run(self, run_params: Dict[str, Any]) -> None:
+        self._profile = RunProfile(run_params.get("pipeline_name") or "__default__",
+                                   run_params["run_id"])
+
+    @hook_impl
+    def before_dataset_loaded(self, dataset_name: str) -> None:
+        if self._profile is not None:
+            self._profile.start_load(dataset_name)
+
+    @hook_impl
+    def after_dataset_loaded(self, dataset_name: str, data: Any) -> None:
+        if self._profile is not None:
+            self._profile.finish_load(dataset_name, data)
+
+    @hook_impl
+    def before_node_run(self, node: Node) -> None:
+        if self._profile is not None:
+            self._profile.start_node(node.name, node.inputs)
+
+    @hook_impl
+    def after_node_run(
+        self, node: Node, inputs: Dict[str, Any], outputs: Dict[str, Any]
+    ) -> None:
+        if self._profile is not None:
+            self._profile.finish_node(node.name, inputs, outputs)
+
+    @hook_impl
+    def on_node_error(self, node: Node, inputs: Dict[str, Any]) -> None:
+        if self._profile is not None:
+            self._profile.finish_node(node.name, inputs, {}, status="failed")
+
+    @hook_impl
+    def before_dataset_saved(self, dataset_name: str) -> None:
+        if self._profile is not None:
+            self._profile.start_save(dataset_name)
+
+    @hook_impl
+    def after_dataset_saved(self, dataset_name: str, data: Any) -> None:
+        if self._profile is not None:
+            self._profile.finish_save(dataset_name, data)
+
+    @hook_impl
+    def after_pipeline_run(self) -> None:
+        self._write("completed")
+
+    @hook_impl
+    def on_pipeline_error(self) -> None:
+        self._write("failed")
+
+    def _write(self, status):
+        if self._profile is not None:
+            path = self._profile.write(self.directory, status)
+            logging.getLogger(__name__).info("Wrote the run profile to {}".format(path))
+            self._profile = None
@@ -0,0 +1,212 @@
+"""Per-node performance profiles of pipeline runs.
+
+``InstrumentationHooks`` feeds a ``RunProfile`` with the wall time, CPU time
+and peak RSS of every node, the size of its inputs and outputs, and how long
+each dataset took to load and save. The profile is written as JSON when the
+run ends, and ``summarize`` ranks its slowest nodes and datasets.
+
+CPU time and RSS are measured for the whole process. The peak RSS is reset
+when a node starts, which would discard the peak of any node still running,
+so with the ``ThreadRunner`` it is only reset for nodes that start alone, and
+nodes that ran at the same time as another are recorded without a peak and
+with overlapping CPU times. Nodes run in the worker processes of the
+``ParallelRunner`` are not recorded.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import issparse
+
+from productrec.memory import peak_rss, reset_peak_rss
+
+PROFILE_DIR = "data/08_reporting/profiles"
+
+
+def data_size(data: Any) -> Dict[str, Any]:
+    """Rows, stored nonzeros and in-memory bytes of ``data``, where they apply.
+
+    DataFrames report their shallow memory usage, so object columns only
+    count their pointers; that keeps the measurement cheap on large frames.
+    """
+
+    rows = nnz = size = None
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        rows = len(data)
+        usage = data.memory_usage(index=True, deep=False)
+        size = int(usage.sum() if isinstance(data, pd.DataFrame) else usage)
+    elif issparse(data):
+        rows, nnz = data.shape[0], data.nnz
+        size = sum(getattr(data, part).nbytes
+                   for part in ("data", "indices", "indptr", "row", "col")
+                   if isinstance(getattr(data, part, None), np.ndarray))
+    elif isinstance(data, np.ndarray):
+        rows = data.shape[0] if data.ndim else 1
+        size = data.nbytes
+    elif isinstance(data, (list, tuple, dict)):
+        rows = len(data)
+    return {"rows": rows, "nnz": nnz, "bytes": size}
+
+
+class RunProfile:
+    """Collects the measurements of one pipeline run.
+
+    Load times are kept by dataset name until the node that asked for the
+    dataset starts; save times go to the node that produced the dataset.
+    """
+
+    def __init__(self, pipeline: str, run_id: str):
+        self.pipeline = pipeline
+        self.run_id = run_id
+        self.started = time.time()
+        self.nodes = []
+        self.datasets = []
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._running = {}
+        self._load_starts = {}
+        self._pending_loads = {}
+        self._pending_saves = {}
+        self._producers = {}
+
+    def start_load(self, dataset: str) -> None:
+        # A load starts and finishes on the same thread, also with --async
+        with self._lock:
+            self._load_starts[dataset, threading.get_ident()] = time.perf_counter()
+
+    def finish_load(self, dataset: str, data: Any) -> None:
+        with self._lock:
+            start = self._load_starts.pop((dataset, threading.get_ident()), None)
+            if start is not None:
+                self._pending_loads.setdefault(dataset, []).append({
+                    "dataset": dataset, "operation": "load", "node": None,
+                    "seconds": time.perf_counter() - start, **data_size(data)})
+
+    def start_node(self, node: str, inputs: List[str]) -> None:
+        with self._lock:
+            loads = []
+            for dataset in inputs:
+                for entry in self._pending_loads.pop(dataset, []):
+                    entry["node"] = node
+                    loads.append(entry)
+            self.datasets.extend(loads)
+            # Resetting the peak while another node runs would lose its peak
+            overlapped = bool(self._running)
+            for running in self._running.values():
+                running["overlapped"] = True
+            self._running[node] = {
+                "loads": loads,
+                "start": time.perf_counter(),
+                "cpu": time.process_time(),
+                "rss": peak_rss() if overlapped else reset_peak_rss(),
+                "overlapped": overlapped,
+            }
+
+    def finish_node(self, node: str, inputs: Dict[str, Any], outputs: Dict[str, Any],
+                    status: str = "completed") -> None:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        peak = peak_rss()
+        with self._lock:
+            running = self._running.pop(node, None)
+            if running is None:
+                return
+            record = {
+                "node": node,
+                "status": status,
+                "offset_seconds": running["start"] - self._start,
+                "wall_seconds": wall - running["start"],
+                "cpu_seconds": cpu - running["cpu"],
+                "overlapped": running["overlapped"],
+                "rss_start_mb": running["rss"] / 2 ** 10,
+                "peak_rss_delta_mb": None if running["overlapped"]
+                else max(peak - running["rss"], 0) / 2 ** 10,
+                "load_seconds": sum(entry["seconds"] for entry in running["loads"]),
+                "save_seconds": 0.0,
+                "inputs": {name: data_size(data) for name, data in inputs.items()},
+                "outputs": {name: data_size(data) for name, data in outputs.items()},
+            }
+            self.nodes.append(record)
+            for dataset in outputs:
+                self._producers[dataset] = record
+
+    def start_save(self, dataset: str) -> None:
+        with self._lock:
+            self._pending_saves[dataset] = time.perf_counter()
+
+    def finish_save(self, dataset: str, data: Any) -> None:
+        with self._lock:
+            start = self._pending_saves.pop(dataset, None)
+            if start is None:
+                return
+            seconds = time.perf_counter() - start
+            record = self._producers.get(dataset)
+            if record is not None:
+                record["save_seconds"] += seconds
+            self.datasets.append({"dataset": dataset, "operation": "save",
+                                  "node": record and record["node"],
+                                  "seconds": seconds, **data_size(data)})
+
+    def write(self, directory: str, status: str) -> Path:
+        """Writes the profile to ``directory/<pipeline>-<run_id>.json``."""
+
+        profile = {
+            "pipeline": self.pipeline,
+            "run_id": self.run_id,
+            "started": self.started,
+            "status": status,
+            "wall_seconds": time.perf_counter() - self._start,
+            "nodes": self.nodes,
+            "datasets": self.datasets,
+        }
+        path = Path(directory) / "{}-{}.json".format(self.pipeline, self.run_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(profile, f, indent=2)
+        return path
+
+
+def load_profile(path: str = None, directory: str = PROFILE_DIR) -> Dict[str, Any]:
+    """Reads the profile at ``path``, or the most recent one in ``directory``."""
+
+    if path is None:
+        profiles = sorted(Path(directory).glob("*.json"),
+                          key=lambda p: p.stat().st_mtime)
+        if not profiles:
+            raise FileNotFoundError("No run profiles in {}".format(directory))
+        path = profiles[-1]
+    with open(path) as f:
+        return json.load(f)
+
+
+def summarize(profile: Dict[str, Any], top: int = 5,
+              threshold: float = 0.1) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """The ``top`` slowest nodes and dataset loads/saves of a run profile.
+
+    ``share`` is the fraction of the run's wall time; rows above
+    ``threshold`` are flagged.
+    """
+
+    total = max(profile["wall_seconds"], 1e-9)
+
+    nodes = pd.DataFrame(profile["nodes"], columns=[
+        "node", "status", "wall_seconds", "cpu_seconds", "peak_rss_delta_mb",
+        "load_seconds", "save_seconds"])
+    nodes["share"] = nodes.wall_seconds / total
+    nodes = nodes.sort_values("wall_seconds", ascending=False).head(top)
+
+    datasets = pd.DataFrame(profile["datasets"], columns=[
+        "dataset", "operation", "node", "seconds", "rows", "nnz", "bytes"])
+    datasets["mb"] = datasets.bytes / 2 ** 20
+    datasets["share"] = datasets.seconds / total
+    datasets = datasets.drop(columns="bytes") \
+        .sort_values("seconds", ascending=False) \
+        .head(top)
+
+    for table in (nodes, datasets):
+        table.insert(0, "flag", np.where(table.share >= threshold, "*", ""))
+    return nodes.reset_index(drop=True), datasets.reset_index(drop=True)
@@ -0,0 +1,583 @@
+"""Memoization of node outputs across pipeline runs.
+
+``MemoizingRunner`` runs a pipeline like the ``SequentialRunner``, but first
+looks up every node in a ``NodeCache``. A node is identified by the source
+of the project modules its function uses, the identities of its inputs and
+the values of the parameters it read the last time it ran; when all of them
+match a stored entry, its outputs come from the cache instead.
+
+Inputs produced earlier in the run are identified by the node that produced
+them, so nothing is hashed on the way. Other inputs are identified by their
+dataset's description (which names a version, if any) together with the
+size and modification time of its local files, or the etag or modification
+time the filesystem reports for remote ones. Nothing is loaded just to be
+identified; a node with an input that has no such stamp, like a
+``MemoryDataSet`` fed to the run, always runs. Third party libraries are not
+part of the identity, so the cache should be cleared after upgrading them.
+
+Outputs of a skipped node are only read from the cache once a node that
+runs needs them, and are then handed to that node directly, or at the end
+of the run for persisted datasets that no longer hold them. Outputs that
+are iterators of chunks are spooled to the cache one chunk at a time while
+their dataset saves them. Skipped nodes do not log metrics again.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from collections.abc import Iterator
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+from kedro.io import DataCatalog, MemoryDataSet
+from kedro.pipeline import Pipeline
+from kedro.pipeline.node import Node
+from kedro.runner import SequentialRunner
+from kedro.runner.runner import run_node
+
+CACHE_DIR = "data/09_cache"
+CACHE_MAX_MB = 10240
+CACHE_MAX_ENTRIES = 500
+
+_MISSING = "<missing>"
+
+# What fsspec filesystems report about a remote file that changes with it
+REMOTE_STAMP_KEYS = ["ETag", "etag", "md5Hash", "generation", "LastModified",
+                     "last_modified", "mtime", "updated"]
+
+
+class NodeCache:
+    """Pickled node outputs in ``directory``, evicted least recently used first.
+
+    ``index.json`` describes the entries, whose outputs are stored under
+    ``entries/<fingerprint>/``; ``datasets.json`` remembers which output was
+    last written to each persisted catalog dataset.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_mb: float = CACHE_MAX_MB,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = Path(directory)
+        self.max_bytes = max_mb * 2 ** 20
+        self.max_entries = max_entries
+        self.index = _read_json(self.path / "index.json")
+        self.datasets = _read_json(self.path / "datasets.json")
+        # Entries used by the current run, which are never evicted by it
+        self._pinned = set()
+
+    def lookup(self, base: str, params: Dict[str, Any]) -> Optional[str]:
+        """The fingerprint of an entry for ``base`` that read the same ``params``."""
+
+        for fingerprint, entry in list(self.index.items()):
+            if entry["base"] == base and all(
+                    _value_hash(params, key) == value
+                    for key, value in entry["params"].items()):
+                if not (self.path / "entries" / fingerprint).is_dir():
+                    self.drop(fingerprint)
+                    continue
+                entry["last_used"] = time.time()
+                self._pinned.add(fingerprint)
+                return fingerprint
+        return None
+
+    def store(self, fingerprint: str, node: str, base: str, params: Dict[str, str],
+              outputs: Dict[str, Any]) -> bool:
+        """Pickles ``outputs`` and evicts entries until the cache fits its limits.
+
+        Outputs that were spooled while they were saved are moved in as they are.
+        """
+
+        directory = self.path / "entries" / fingerprint
+        directory.mkdir(parents=True, exist_ok=True)
+        files = {}
+        try:
+            for number, (name, data) in enumerate(outputs.items()):
+                if isinstance(data, _Spool):
+                    files[name] = "{}.chunks".format(number)
+                    data.move(directory / files[name])
+                    continue
+                files[name] = "{}.pkl".format(number)
+                with open(directory / files[name], "wb") as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError) as err:
+            logging.getLogger(__name__).warning(
+                "Not caching node {}, its outputs cannot be pickled: {}".format(
+                    node, err))
+            _discard(outputs.values(), directory)
+            return False
+
+        size = sum(f.stat().st_size for f in directory.iterdir())
+        if size > self.max_bytes:
+            logging.getLogger(__name__).info(
+                "Not caching node {}, its {:.0f} MB of outputs exceed the cache "
+                "size".format(node, size / 2 ** 20))
+            _discard(outputs.values(), directory)
+            return False
+
+        now = time.time()
+        self.index[fingerprint] = {"node": node, "base": base, "params": params,
+                                   "outputs": files, "bytes": size, "created": now,
+                                   "last_used": now}
+        self._pinned.add(fingerprint)
+        self._evict()
+        self.save()
+        return True
+
+    def load(self, fingerprint: str, output: str) -> Any:
+        file = self.index[fingerprint]["outputs"][output]
+        path = self.path / "entries" / fingerprint / file
+        if path.suffix == ".chunks":
+            return _read_chunks(path)
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def drop(self, fingerprint: str) -> None:
+        self.index.pop(fingerprint, None)
+        shutil.rmtree(self.path / "entries" / fingerprint, ignore_errors=True)
+
+    def clear(self, node: str = None) -> int:
+        """Drops every entry, or those of ``node``. Returns how many were dropped."""
+
+        dropped = [fingerprint for fingerprint, entry in self.index.items()
+                   if node is None or entry["node"] == node]
+        for fingerprint in dropped:
+            self.drop(fingerprint)
+        if node is None:
+            self.datasets = {}
+        self.save()
+        return len(dropped)
+
+    def entries(self) -> pd.DataFrame:
+        """One row per entry, most recently used first."""
+
+        entries = pd.DataFrame([
+            {"fingerprint": fingerprint[:12], "node": entry["node"],
+             "outputs": ",".join(entry["outputs"]), "mb": entry["bytes"] / 2 ** 20,
+             "created": pd.Timestamp(entry["created"], unit="s").floor("s"),
+             "last_used": pd.Timestamp(entry["last_used"], unit="s").floor("s")}
+            for fingerprint, entry in self.index.items()],
+            columns=["fingerprint", "node", "outputs", "mb", "created", "last_used"])
+        return entries.sort_values("last_used", ascending=False).reset_index(drop=True)
+
+    def save(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        _write_json(self.path / "index.json", self.index)
+        _write_json(self.path / "datasets.json", self.datasets)
+
+    def _evict(self):
+
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for fingerprint in sorted(self.index, key=lambda f: self.index[f]["last_used"]):
+            if total <= self.max_bytes and len(self.index) <= self.max_entries:
+                break
+            if fingerprint not in self._pinned:
+                total -= self.index[fingerprint]["bytes"]
+                logging.getLogger(__name__).info(
+                    "Evicting the cached outputs of {}".format(
+                        self.index[fingerprint]["node"]))
+                self.drop(fingerprint)
+
+
+class MemoizingRunner(SequentialRunner):
+    """``SequentialRunner`` that skips nodes whose outputs are in a ``NodeCache``.
+
+    Use it with ``kedro run --memoize``, and inspect or clear the cache with
+    ``kedro cache``.
+    """
+
+    def __init__(self, is_async: bool = False, directory: str = CACHE_DIR,
+                 max_mb: float = CACHE_MAX_MB,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        super().__init__(is_async=is_async)
+        self.cache = NodeCache(directory, max_mb, max_entries)
+
+    def _run(self, pipeline: Pipeline, catalog: DataCatalog,
+             run_id: str = None) -> None:
+        nodes = pipeline.nodes
+        done_nodes = set()
+        load_counts = Counter(chain.from_iterable(n.inputs for n in nodes))
+        params = catalog.load("parameters") if "parameters" in catalog.list() else {}
+
+        # Identities of the datasets produced in this run, and the outputs of
+        # skipped nodes that have not been read from the cache yet
+        identities = {}
+        pending = {}
+        skipped = 0
+
+        for exec_index, node in enumerate(nodes):
+            inputs = {name: identities[name] if name in identities
+                      else self._input_identity(catalog, name)
+                      for name in node.inputs if name != "parameters"}
+            base = None
+            if all(identity is not None for identity in inputs.values()):
+                base = _hash(node.name, code_fingerprint(node.func), inputs,
+                             node.outputs)
+
+            fingerprint = base and self.cache.lookup(base, params)
+            if fingerprint:
+                for name in node.outputs:
+                    identities[name] = _hash(fingerprint, name)
+                    pending[name] = fingerprint
+                skipped += 1
+                self._logger.info("Skipped node %s, its outputs are cached as %s",
+                                  node.name, fingerprint[:12])
+            else:
+                try:
+                    loaded = self._materialize(catalog, pending, node.inputs)
+                    fingerprint = self._run_and_store(node, catalog, run_id, base,
+                                                      params, loaded)
+                except Exception:
+                    self._suggest_resume_scenario(pipeline, done_nodes)
+                    raise
+                for name in node.outputs:
+                    identities[name] = fingerprint and _hash(fingerprint, name)
+                    self._remember(catalog, name, identities[name])
+            done_nodes.add(node)
+
+            # decrement load counts and release any data sets we've finished with
+            for data_set in node.inputs:
+                load_counts[data_set] -= 1
+                if load_counts[data_set] < 1 and data_set not in pipeline.inputs():
+                    catalog.release(data_set)
+            for data_set in node.outputs:
+                if load_counts[data_set] < 1 and data_set not in pipeline.outputs():
+                    catalog.release(data_set)
+
+            self._logger.info(
+                "Completed %d out of %d tasks", exec_index + 1, len(nodes)
+            )
+
+        # Free outputs are returned by the run, persisted datasets must hold
+        # what the skipped nodes would have written
+        self._materialize(catalog, pending, [
+            name for name in list(pending)
+            if name in pipeline.outputs()
+            or not isinstance(_dataset(catalog, name), MemoryDataSet)])
+        self.cache.save()
+        self._logger.info("%d of %d nodes came from the cache", skipped, len(nodes))
+
+    def _run_and_store(self, node: Node, catalog: DataCatalog, run_id: str,
+                       base: Optional[str], params: Dict[str, Any],
+                       loaded: Dict[str, Any]) -> Optional[str]:
+
+        # Record which parameters the node reads and what it saves
+        reads = _ParameterReads(params) if base is not None else None
+        spool = self.cache.path / "spool" if base is not None else None
+        recording = _RecordingCatalog(catalog, loaded, reads, spool)
+        try:
+            run_node(node, recording, self._is_async, run_id)
+        except Exception:
+            _discard(recording.saved.values())
+            raise
+        if base is None:
+            return None
+
+        keys = params if reads.read_all else reads.read
+        subset = {key: _value_hash(params, key) for key in sorted(keys)}
+        fingerprint = _hash(base, subset)
+        self.cache.store(fingerprint, node.name, base, subset, recording.saved)
+        return fingerprint
+
+    def _materialize(self, catalog: DataCatalog, pending: Dict[str, str],
+                     names: Iterable[str]) -> Dict[str, Any]:
+
+        # Returns what was read from the cache, so the node that needs it
+        # does not load it from its dataset again
+        loaded = {}
+        for name in names:
+            fingerprint = pending.pop(name, None)
+            if fingerprint is None:
+                continue
+            identity = _hash(fingerprint, name)
+            if self._input_identity(catalog, name) == identity:
+                continue
+            data = self.cache.load(fingerprint, name)
+            catalog.save(name, data)
+            self._remember(catalog, name, identity)
+            # Chunks are used up by the save, the node reads them back
+            if not isinstance(data, Iterator):
+                loaded[name] = data
+        return loaded
+
+    def _input_identity(self, catalog: DataCatalog, name: str) -> Optional[str]:
+
+        if name.startswith("params:"):
+            return _hash(catalog.load(name))
+
+        stamp = _stamp(_dataset(catalog, name))
+        if stamp is None:
+            return None
+        remembered = self.cache.datasets.get(name)
+        if remembered and remembered["stamp"] == stamp:
+            return remembered["identity"]
+        return _hash(name, stamp)
+
+    def _remember(self, catalog: DataCatalog, name: str,
+                  identity: Optional[str]) -> None:
+
+        stamp = _stamp(_dataset(catalog, name))
+        if stamp is not None and identity is not None:
+            self.cache.datasets[name] = {"identity": identity, "stamp": stamp}
+        else:
+            self.cache.datasets.pop(name, None)
+
+
+def code_fingerprint(func) -> str:
+    """Hash of the source of every project module ``func`` uses, directly or not."""
+
+    func = getattr(func, "func", func)
+    module = inspect.getmodule(func)
+    package = module.__name__.split(".")[0]
+
+    seen = {}
+    modules = [module]
+    while modules:
+        module = modules.pop()
+        if module.__name__ in seen or not getattr(module, "__file__", None):
+            continue
+        seen[module.__name__] = _source_hash(module.__file__)
+        for value in vars(module).values():
+            name = getattr(value, "__module__", None)
+            used = value if inspect.ismodule(value) else (
+                sys.modules.get(name) if isinstance(name, str) else None)
+            if used is not None and used.__name__.split(".")[0] == package:
+                modules.append(used)
+    return _hash(getattr(func, "__qualname__", repr(func)), seen)
+
+
+_sources = {}
+
+
+def _source_hash(path):
+
+    stat = Path(path).stat()
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key not in _sources:
+        _sources[key] = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    return _sources[key]
+
+
+class _ParameterReads(dict):
+    """The parameters dict, remembering which keys a node read.
+
+    Anything that walks the whole dict (``dict(params, ...)``, ``**params``,
+    pickling) counts as reading every key.
+    """
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.read = set()
+        self.read_all = False
+
+    def __getitem__(self, key):
+        self.read.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.read.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.read.add(key)
+        return super().__contains__(key)
+
+    def __iter__(self):
+        self.read_all = True
+        return super().__iter__()
+
+    def keys(self):
+        self.read_all = True
+        return super().keys()
+
+    def items(self):
+        self.read_all = True
+        return super().items()
+
+    def values(self):
+        self.read_all = True
+        return super().values()
+
+    def copy(self):
+        self.read_all = True
+        return dict(super().items())
+
+
+class _RecordingCatalog:
+    """The catalog as ``run_node`` sees it when the runner records a node.
+
+    ``loaded`` inputs are handed over without loading them again, and
+    ``parameters`` is the recording dict of the run. Saved outputs are kept
+    in ``saved``; iterators of chunks are spooled to ``spool`` as their
+    dataset consumes them. Everything else goes to ``catalog``.
+    """
+
+    def __init__(self, catalog: DataCatalog, loaded: Dict[str, Any],
+                 parameters: Optional[Dict[str, Any]], spool: Optional[Path]):
+        self.catalog = catalog
+        self.loaded = loaded
+        self.parameters = parameters
+        self.spool = spool
+        self.saved = {}
+
+    def load(self, name: str) -> Any:
+        if name in self.loaded:
+            return self.loaded.pop(name)
+        if name == "parameters" and self.parameters is not None:
+            return self.parameters
+        return self.catalog.load(name)
+
+    def save(self, name: str, data: Any) -> None:
+        if self.spool is not None and isinstance(data, Iterator):
+            data = _Spool(data, self.spool)
+        self.saved[name] = data
+        self.catalog.save(name, data)
+
+    def __getattr__(self, name):
+        return getattr(self.catalog, name)
+
+
+class _Spool(Iterator):
+    """Iterates over ``chunks``, pickling each chunk to a file in ``directory``.
+
+    The file only holds every chunk once the iteration ``finished``; a chunk
+    that cannot be pickled stops the spooling but not the iteration.
+    """
+
+    def __init__(self, chunks: Iterable, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        handle, path = tempfile.mkstemp(suffix=".chunks", dir=str(directory))
+        self.path = Path(path)
+        self.finished = False
+        self.failed = False
+        self._chunks = iter(chunks)
+        self._file = os.fdopen(handle, "wb")
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._file.close()
+            self.finished = True
+            raise
+        if not self.failed:
+            try:
+                pickle.dump(chunk, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            except (pickle.PicklingError, TypeError, AttributeError) as err:
+                logging.getLogger(__name__).warning(
+                    "Not caching chunks that cannot be pickled: {}".format(err))
+                self.discard()
+        return chunk
+
+    def move(self, path: Path) -> None:
+        if not self.finished or self.failed:
+            self.discard()
+            raise TypeError("the chunks of an output were not all saved")
+        self.path.replace(path)
+
+    def discard(self) -> None:
+        self.failed = True
+        self._file.close()
+        if self.path.exists():
+            self.path.unlink()
+
+
+def _read_chunks(path):
+
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _discard(outputs, directory=None):
+
+    for data in outputs:
+        if isinstance(data, _Spool):
+            data.discard()
+    if directory is not None:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _dataset(catalog, name):
+
+    # DataCatalog.datasets names the datasets with non-word characters
+    # replaced, e.g. params:seed as params__seed
+    return getattr(catalog.datasets, re.sub(r"\W+", "__", name), None)
+
+
+def _stamp(dataset):
+
+    # The description of a dataset (with its version) and what changes with
+    # the files behind it: size and modification time of local files, the
+    # etag or modification time the filesystem reports for remote ones
+    if dataset is None or isinstance(dataset, MemoryDataSet):
+        return None
+    try:
+        if hasattr(dataset, "_get_load_path"):
+            path = dataset._get_load_path()
+        else:
+            path = getattr(dataset, "_filepath", None) or \
+                getattr(dataset, "_path", None)
+        if path is None:
+            return None
+
+        if getattr(dataset, "_protocol", "file") == "file":
+            path = Path(str(path))
+            if not path.exists():
+                return None
+            files = sorted(p for p in path.rglob("*") if p.is_file()) \
+                if path.is_dir() else [path]
+            changes = [[str(p), p.stat().st_size, p.stat().st_mtime_ns] for p in files]
+        else:
+            info = dataset._fs.info(str(path))
+            changes = {key: info[key] for key in REMOTE_STAMP_KEYS if key in info}
+            if not changes:
+                return None
+            changes["size"] = info.get("size")
+    except Exception:
+        return None
+    # Object addresses in the description change from run to run
+    description = re.sub(r" at 0x[0-9a-fA-F]+", "", str(dataset))
+    return json.loads(json.dumps([description, str(path), changes], default=str))
+
+
+def _value_hash(params, key):
+
+    return _hash(params[key] if key in dict.keys(params) else _MISSING)
+
+
+def _hash(*values):
+
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(value if isinstance(value, bytes) else
+                      json.dumps(value, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _read_json(path):
+
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path, value):
+
+    temporary = path.with_suffix(".tmp")
+    with open(temporary, "w") as f:
+        json.dump(value, f, indent=2)
+    temporary.replace(path)
@@ -0,0 +1,39 @@
+"""Peak resident memory of the current process, in kB.
+
+On Linux ``reset_peak_rss`` lowers the high-water mark (``VmHWM``) to the
+current RSS, so ``peak_rss`` afterwards is the peak since the reset. The
+mark belongs to the whole process: a reset also discards the peak of any
+other thread that is measuring, so only reset where nothing else runs, as
+``compare_formats`` does by measuring in a fresh process. Elsewhere both
+fall back to ``ru_maxrss``, which cannot be reset.
+"""
+import resource
+
+
+def reset_peak_rss() -> int:
+    """Resets the peak RSS to the current RSS where possible and returns it."""
+
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return _status_kb("VmRSS")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss() -> int:
+    """The peak RSS of the process since it started or was last reset."""
+
+    try:
+        return _status_kb("VmHWM")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _status_kb(field):
+
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise OSError("{} is not reported in /proc/self/status".format(field))
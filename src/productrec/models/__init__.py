@@ -0,0 +1,8 @@
+from .foldin import FoldIn
+from .hashing import order_seeds, splitmix64
+from .index import ItemIndex
+from .itemsets import frequent_itemsets
+from .matrix import DUPLICATE_POLICIES, interaction_matrix
+from .outofcore import OutOfCoreALS
+from .quantize import dequantize_factors, quantize_factors
+from .vocabulary import IdVocabulary
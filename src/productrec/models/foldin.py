@@ -0,0 +1,122 @@
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+import scipy
+import scipy.linalg
+from scipy.sparse import csr_matrix
+
+
+class FoldIn:
+    """Least squares user factors for baskets that were not in training.
+
+    Solves the same system as ``AlternatingLeastSquares.partial_fit_users``,
+    ``(Yt Cu Y + reg * I) x = Yt Cu p``, without touching the model.
+    The regularized Gramian ``YtY + reg * I`` and its Cholesky factorization
+    are computed once when the object is built. Every basket with unit
+    confidences (the binary matrices ``split_data`` produces) is then a
+    single triangular solve, and a whole batch of them is one solve. Rows
+    with other confidences get their own correction term added to the
+    cached Gramian.
+    """
+
+    def __init__(self, item_factors: np.ndarray, regularization: float):
+        self.item_factors = np.asarray(item_factors, dtype=np.float64)
+        self.regularization = regularization
+
+        factors = self.item_factors.shape[1]
+        self.gramian = (self.item_factors.T.dot(self.item_factors) +
+                        regularization * np.eye(factors))
+        self.factorization = scipy.linalg.cho_factor(self.gramian)
+
+    @property
+    def num_items(self) -> int:
+        return self.item_factors.shape[0]
+
+    def solve(self, baskets: Union[csr_matrix, Sequence[int]]) -> np.ndarray:
+        """Returns user factors for ``baskets``.
+
+        ``baskets`` is either a (baskets x items) sparse matrix of confidences,
+        giving one row of factors per basket, or a list of item ids for a
+        single basket, giving a 1-d vector.
+        """
+
+        if not scipy.sparse.issparse(baskets):
+            return self.solve(self._single_basket(baskets))[0]
+
+        baskets = csr_matrix(baskets, dtype=np.float64)
+        rhs = baskets.dot(self.item_factors)
+        user_factors = scipy.linalg.cho_solve(self.factorization, rhs.T).T
+
+        weighted = np.unique(np.repeat(np.arange(baskets.shape[0]),
+                                       np.diff(baskets.indptr))[baskets.data != 1])
+        for row in weighted:
+            start, end = baskets.indptr[row], baskets.indptr[row + 1]
+            factors = self.item_factors[baskets.indices[start:end]]
+            confidence = baskets.data[start:end]
+            system = self.gramian + (factors.T * (confidence - 1)).dot(factors)
+            user_factors[row] = np.linalg.solve(system, rhs[row])
+
+        return user_factors
+
+    def recommend(self, baskets: Union[csr_matrix, Sequence[int]], N: int = 10,
+                  filter_already_liked_items: bool = True, index=None
+                  ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the top ``N`` item ids and scores for each basket.
+
+        With an ``ItemIndex`` the candidates come from an approximate search
+        instead of scoring every item.
+        """
+
+        single = not scipy.sparse.issparse(baskets)
+        if single:
+            baskets = self._single_basket(baskets)
+        baskets = csr_matrix(baskets)
+
+        if index is not None:
+            ids, scores = self._recommend_from_index(baskets, N,
+                                                     filter_already_liked_items,
+                                                     index)
+            if single:
+                return ids[0], scores[0]
+            return ids, scores
+
+        scores = self.solve(baskets).dot(self.item_factors.T)
+        if filter_already_liked_items:
+            rows = np.repeat(np.arange(baskets.shape[0]), np.diff(baskets.indptr))
+            scores[rows, baskets.indices] = -np.inf
+
+        N = min(N, self.num_items)
+        ids = np.argpartition(-scores, N - 1, axis=1)[:, :N]
+        scores = np.take_along_axis(scores, ids, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        ids = np.take_along_axis(ids, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+
+        if single:
+            return ids[0], scores[0]
+        return ids, scores
+
+    def _recommend_from_index(self, baskets, N, filter_already_liked_items, index):
+
+        # Ask for enough extra candidates to survive dropping the basket items
+        extra = int(np.diff(baskets.indptr).max()) if filter_already_liked_items else 0
+        candidates, candidate_scores = index.search(self.solve(baskets), N + extra)
+
+        ids = np.full((baskets.shape[0], N), -1, dtype=np.int64)
+        scores = np.full((baskets.shape[0], N), -np.inf, dtype=np.float32)
+        for row in range(baskets.shape[0]):
+            keep = candidates[row] >= 0
+            if filter_already_liked_items:
+                basket = baskets.indices[baskets.indptr[row]:baskets.indptr[row + 1]]
+                keep &= ~np.isin(candidates[row], basket)
+            kept = np.flatnonzero(keep)[:N]
+            ids[row, :len(kept)] = candidates[row, kept]
+            scores[row, :len(kept)] = candidate_scores[row, kept]
+
+        return ids, scores
+
+    def _single_basket(self, items: Sequence[int]) -> csr_matrix:
+
+        items = np.asarray(items, dtype=np.int64)
+        return csr_matrix((np.ones(len(items)), items, [0, len(items)]),
+                          shape=(1, self.num_items))
@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def order_seeds(order_ids, seed: int) -> np.ndarray:
+    """One 64 bit seed per order, derived from ``seed`` and the order id.
+
+    Random draws keyed on these do not depend on how orders are batched,
+    sharded or ordered, so every worker agrees on the same masks and samples.
+    """
+
+    return splitmix64(np.asarray(order_ids, dtype=np.uint64) +
+                      splitmix64(np.array([seed], dtype=np.uint64)))
+
+
+def splitmix64(values: np.ndarray) -> np.ndarray:
+    """Stateless 64 bit mixer (SplitMix64) applied elementwise."""
+
+    values = values + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
@@ -0,0 +1,116 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class ItemIndex:
+    """Inverted file (IVF) index over item factors for top-k retrieval.
+
+    Items are clustered with k-means into ``lists`` inverted lists. A query
+    is compared against the list centroids first, and only the items in the
+    ``probe`` best lists are scored exactly. Raising ``probe`` trades latency
+    for recall; ``probe == lists`` is an exact search.
+
+    Recommendations rank by inner product, which k-means does not preserve,
+    so the items get one extra coordinate ``sqrt(max_norm^2 - |y|^2)`` before
+    clustering. With a zero in that coordinate for the query, the euclidean
+    distance to an item then orders items the same way as the inner product.
+    """
+
+    def __init__(self, item_factors: np.ndarray, lists: int = None, probe: int = 8,
+                 iterations: int = 10, seed: int = 42):
+        item_factors = np.asarray(item_factors, dtype=np.float32)
+        num_items = item_factors.shape[0]
+
+        self.lists = min(lists or max(1, int(np.sqrt(num_items))), num_items)
+        self.probe = min(probe, self.lists)
+
+        norms = (item_factors ** 2).sum(axis=1)
+        augmented = np.hstack([item_factors,
+                               np.sqrt(norms.max() - norms)[:, None]])
+        centroids, assignment = _kmeans(augmented, self.lists, iterations, seed)
+
+        # Ranking lists by |q - c|^2 is ranking by 2 q.c - |c|^2
+        self.centroids = centroids[:, :-1]
+        self.centroid_norms = (centroids ** 2).sum(axis=1)
+
+        # Store the items grouped by list so each list is a contiguous slice
+        self.item_ids = np.argsort(assignment, kind="stable")
+        self.item_factors = item_factors[self.item_ids]
+        self.offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(assignment, minlength=self.lists))])
+
+    @property
+    def num_items(self) -> int:
+        return self.item_factors.shape[0]
+
+    def search(self, user_factors: np.ndarray, N: int = 10,
+               probe: int = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the approximate top ``N`` item ids and scores per user.
+
+        Rows are padded with id -1 and score -inf when the probed lists hold
+        fewer than ``N`` items.
+        """
+
+        user_factors = np.atleast_2d(np.asarray(user_factors, dtype=np.float32))
+        num_queries = user_factors.shape[0]
+        probe = min(probe or self.probe, self.lists)
+
+        centroid_scores = 2 * user_factors.dot(self.centroids.T) - self.centroid_norms
+        probed = np.argpartition(-centroid_scores, probe - 1, axis=1)[:, :probe]
+
+        # The queries that probe each list, grouped by list
+        queries = np.repeat(np.arange(num_queries), probe)[
+            np.argsort(probed.ravel(), kind="stable")]
+        starts = np.concatenate(
+            [[0], np.cumsum(np.bincount(probed.ravel(), minlength=self.lists))])
+
+        # Positions in self.item_factors until the end, padded with -1 / -inf
+        positions = np.full((num_queries, N), -1, dtype=np.int64)
+        scores = np.full((num_queries, N), -np.inf, dtype=np.float32)
+
+        # One product per list with every query that probes it, merged into
+        # the running top N of those queries
+        for l in range(self.lists):
+            rows = queries[starts[l]:starts[l + 1]]
+            first, last = self.offsets[l], self.offsets[l + 1]
+            if len(rows) == 0 or first == last:
+                continue
+            merged_scores = np.hstack(
+                [scores[rows], user_factors[rows].dot(self.item_factors[first:last].T)])
+            merged = np.hstack(
+                [positions[rows],
+                 np.broadcast_to(np.arange(first, last), (len(rows), last - first))])
+            top = np.argpartition(-merged_scores, N - 1, axis=1)[:, :N]
+            scores[rows] = np.take_along_axis(merged_scores, top, axis=1)
+            positions[rows] = np.take_along_axis(merged, top, axis=1)
+
+        order = np.argsort(-scores, axis=1, kind="stable")
+        scores = np.take_along_axis(scores, order, axis=1)
+        positions = np.take_along_axis(positions, order, axis=1)
+        ids = np.where(positions >= 0, self.item_ids[positions], -1)
+
+        return ids, scores
+
+
+def _kmeans(vectors, clusters, iterations, seed):
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+    norms = (vectors ** 2).sum(axis=1)
+
+    for _ in range(iterations):
+        distances = norms[:, None] - 2 * vectors.dot(centroids.T) + \
+            (centroids ** 2).sum(axis=1)[None, :]
+        assignment = distances.argmin(axis=1)
+
+        counts = np.bincount(assignment, minlength=clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        # Empty clusters keep their previous centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+
+    distances = norms[:, None] - 2 * vectors.dot(centroids.T) + \
+        (centroids ** 2).sum(axis=1)[None, :]
+    return centroids, distances.argmin(axis=1)
@@ -0,0 +1,145 @@
+import heapq
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def frequent_itemsets(orders: csr_matrix, top_n: int = 5, max_len: int = 5,
+                      min_count: int = 2, memory_mb: float = 256
+                      ) -> Dict[int, List[Tuple[Tuple[int, ...], int]]]:
+    """The ``top_n`` most frequent sets of columns of every length up to ``max_len``.
+
+    ``orders`` is an (orders x products) matrix; any stored nonzero counts as a
+    purchase. Returns ``{length: [(product ids, order count), ...]}`` sorted by
+    count.
+
+    Pairs are counted with sparse products of the transposed matrix with
+    itself, in blocks of products sized to ``memory_mb``. Longer sets are
+    mined depth first from the order lists (the vertical layout) of the
+    products, most frequent first. The support threshold of every length
+    starts at ``min_count`` and rises to the count of the ``top_n``-th best set
+    found so far, and any branch that can no longer reach the threshold of a
+    longer length is pruned.
+    """
+
+    orders = csr_matrix(orders, copy=True)
+    orders.eliminate_zeros()
+    orders.data = np.ones_like(orders.data, dtype=np.int32)
+
+    counts = np.bincount(orders.indices, minlength=orders.shape[1])
+    best = {length: [] for length in range(1, max_len + 1)}
+
+    for product in np.argsort(-counts, kind="stable")[:top_n]:
+        if counts[product] > 0:
+            _push(best[1], top_n, (int(product),), int(counts[product]))
+
+    if max_len < 2:
+        return _ranked(best)
+
+    def threshold(length):
+        heap = best[length]
+        return max(min_count, heap[0][0]) if len(heap) == top_n else min_count
+
+    def extension_threshold(length):
+        # A set is only worth extending if a longer set could still make it
+        return min(threshold(longer) for longer in range(length + 1, max_len + 1))
+
+    # Products that appear in at least min_count orders, most frequent first
+    ranked = np.argsort(-counts, kind="stable")
+    ranked = ranked[counts[ranked] >= min_count]
+    frequent = orders[:, ranked]
+    order_lists = frequent.T.tocsr()
+
+    block_size = max(1, int(memory_mb * 2 ** 20 // (max(len(ranked), 1) * 12)))
+    for first in range(0, len(ranked), block_size):
+        last = min(first + block_size, len(ranked))
+        pairs = order_lists[first:last].dot(frequent)
+
+        for rank in range(first, last):
+            start, end = pairs.indptr[rank - first], pairs.indptr[rank - first + 1]
+            later = pairs.indices[start:end] > rank
+            partners = pairs.indices[start:end][later]
+            pair_counts = pairs.data[start:end][later]
+            _push_top(best[2], top_n, (rank,), partners, pair_counts, threshold(2))
+
+            if max_len < 3:
+                continue
+
+            # Depth first into the sets that start with this product, on the
+            # orders that contain it
+            keep = pair_counts >= extension_threshold(2)
+            members = partners[keep][np.argsort(-pair_counts[keep], kind="stable")]
+            if len(members) > 1:
+                lists = order_lists.indptr
+                rows = order_lists.indices[lists[rank]:lists[rank + 1]]
+                _extend((rank,), frequent[rows][:, members], members, best, top_n,
+                        max_len, threshold, extension_threshold)
+
+    # Mining ran on frequency ranks, translate them back to product ids
+    for length in range(2, max_len + 1):
+        best[length] = [(count, tuple(sorted(int(ranked[rank]) for rank in itemset)))
+                        for count, itemset in best[length]]
+    return _ranked(best)
+
+
+def _extend(prefix, projected, members, best, top_n, max_len, threshold,
+            extension_threshold):
+
+    # projected holds the orders that contain every product of prefix and one
+    # column per member, sorted by the count of prefix + member. A sparse
+    # product counts prefix + any two members at once, and each member is
+    # then extended with the members after it.
+    length = len(prefix) + 2
+    counts = projected.T.dot(projected).tocsr()
+    member_counts = counts.diagonal()
+    columns = projected.tocsc()
+
+    for position, member in enumerate(members):
+        # Thresholds only rise, so once a member is too rare to extend, so
+        # are the ones after it
+        if member_counts[position] < extension_threshold(length - 1):
+            break
+
+        start, end = counts.indptr[position], counts.indptr[position + 1]
+        later = counts.indices[start:end] > position
+        others = counts.indices[start:end][later]
+        joined = counts.data[start:end][later]
+        itemset = prefix + (int(member),)
+        _push_top(best[length], top_n, itemset, members[others], joined,
+                  threshold(length))
+
+        if length == max_len:
+            continue
+        keep = joined >= extension_threshold(length)
+        children = others[keep][np.argsort(-joined[keep], kind="stable")]
+        if len(children) > 1:
+            column = slice(columns.indptr[position], columns.indptr[position + 1])
+            rows = columns.indices[column]
+            _extend(itemset, projected[rows][:, children], members[children], best,
+                    top_n, max_len, threshold, extension_threshold)
+
+
+def _push_top(heap, top_n, prefix, products, counts, threshold):
+
+    # Only the top_n extensions of a prefix can enter the heap
+    candidates = np.flatnonzero(counts >= threshold)
+    if len(candidates) > top_n:
+        candidates = candidates[np.argpartition(-counts[candidates], top_n - 1)[:top_n]]
+    for candidate in candidates:
+        _push(heap, top_n, prefix + (int(products[candidate]),), int(counts[candidate]))
+
+
+def _push(heap, top_n, itemset, count):
+
+    if len(heap) < top_n:
+        heapq.heappush(heap, (count, itemset))
+    elif count > heap[0][0]:
+        heapq.heapreplace(heap, (count, itemset))
+
+
+def _ranked(best):
+
+    return {length: [(itemset, count) for count, itemset in
+                     sorted(heap, key=lambda entry: (-entry[0], entry[1]))]
+            for length, heap in best.items() if heap}
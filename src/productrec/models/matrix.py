@@ -0,0 +1,47 @@
+from typing import Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+
+DUPLICATE_POLICIES = ["binary", "sum", "max"]
+
+
+def interaction_matrix(rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int],
+                       values: np.ndarray = None, duplicates: str = "binary",
+                       dtype=np.float32) -> csr_matrix:
+    """Builds the order x product matrix from integer code arrays.
+
+    Repeated (row, col) pairs are combined by ``duplicates``: ``binary``
+    stores a 1 for every pair with a nonzero value, ``sum`` adds the values
+    (e.g. the quantities) and ``max`` keeps the largest one. Pairs that end
+    up zero are dropped. The result is a canonical CSR matrix with sorted,
+    int32 indices.
+    """
+
+    if duplicates not in DUPLICATE_POLICIES:
+        raise ValueError("Unknown duplicate policy: {}".format(duplicates))
+
+    rows = np.asarray(rows, dtype=np.int32)
+    cols = np.asarray(cols, dtype=np.int32)
+    values = np.ones(len(rows), dtype=dtype) if values is None else np.asarray(values)
+
+    if duplicates == "binary":
+        values = values != 0
+    elif duplicates == "max" and len(values):
+        # Sort the pairs and reduce each run of equal pairs to its maximum
+        order = np.lexsort((cols, rows))
+        rows, cols, values = rows[order], cols[order], values[order]
+        starts = np.flatnonzero(
+            np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])])
+        rows, cols = rows[starts], cols[starts]
+        values = np.maximum.reduceat(values, starts)
+
+    # tocsr sums whatever duplicates are left in a single pass
+    matrix = coo_matrix((values.astype(dtype), (rows, cols)), shape=shape).tocsr()
+    matrix.eliminate_zeros()
+    if duplicates == "binary":
+        matrix.data[:] = 1
+
+    matrix.indices = matrix.indices.astype(np.int32, copy=False)
+    matrix.indptr = matrix.indptr.astype(np.int32, copy=False)
+    return matrix
@@ -0,0 +1,260 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from scipy.sparse import csr_matrix
+
+# Rows are initialized in fixed chunks, so the initial factors do not depend
+# on how the memory budget splits the matrix into blocks
+INIT_CHUNK = 65536
+
+
+class OutOfCoreALS:
+    """Implicit ALS for interaction matrices that do not fit in memory.
+
+    ``fit`` copies the confidence matrix (``alpha * user_items``) and its
+    transpose into memory mapped CSR files in ``directory``, one block of rows
+    at a time. Each half step streams blocks of rows through a thread pool and
+    updates them with a few conjugate gradient steps, the same update
+    implicit's CG solver makes. The factors are memory mapped ``.npy`` files
+    in ``directory`` as well.
+
+    Blocks are sized so the arrays a worker allocates for one block stay
+    within ``memory_budget_mb / workers``. Pages of the memory mapped files are
+    file backed, so the OS can drop them under memory pressure.
+    """
+
+    def __init__(self, factors: int, regularization: float, iterations: int,
+                 directory: str, memory_budget_mb: float = 1024, workers: int = None,
+                 cg_steps: int = 3, dtype=np.float32, seed: int = 42):
+        self.factors = factors
+        self.regularization = regularization
+        self.iterations = iterations
+        self.directory = Path(directory)
+        self.memory_budget = memory_budget_mb * 2 ** 20
+        self.workers = workers or os.cpu_count()
+        self.cg_steps = cg_steps
+        self.dtype = np.dtype(dtype)
+        self.seed = seed
+
+        self.user_items = None
+        self.item_users = None
+        self.user_factors = None
+        self.item_factors = None
+
+    def fit(self, user_items: csr_matrix, alpha: float = 1.0,
+            callback: Callable = None) -> None:
+        """Trains on ``user_items``, which may itself be backed by memory maps.
+
+        ``callback(iteration, seconds, loss)`` is called after every
+        iteration like implicit's, with ``loss`` always ``None``.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        num_users, num_items = user_items.shape
+
+        self.user_items = _copy_csr(user_items, self.directory / "user_items", alpha,
+                                    self.dtype, self._blocks(user_items.indptr))
+        self.item_users = _transpose_csr(self.user_items, num_items,
+                                         self.directory / "item_users",
+                                         self._blocks(self.user_items.indptr))
+
+        self.user_factors = self._init_factors("user_factors", num_users)
+        self.item_factors = self._init_factors("item_factors", num_items)
+
+        user_blocks = self._blocks(self.user_items.indptr)
+        item_blocks = self._blocks(self.item_users.indptr)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for iteration in range(self.iterations):
+                start = time.perf_counter()
+                self._half_step(executor, self.user_items, self.user_factors,
+                                self.item_factors, user_blocks)
+                self._half_step(executor, self.item_users, self.item_factors,
+                                self.user_factors, item_blocks)
+                if callback:
+                    callback(iteration, time.perf_counter() - start, None)
+
+        self.user_factors.flush()
+        self.item_factors.flush()
+
+    def _half_step(self, executor, confidence, solved, fixed, blocks):
+
+        gramian = _gramian(fixed, self._blocks_of(len(fixed))) + \
+            self.regularization * np.eye(self.factors)
+        gramian = gramian.astype(self.dtype)
+
+        def solve(block):
+            start, end = block
+            solved[start:end] = _conjugate_gradient(confidence, start, end, solved,
+                                                    fixed, gramian, self.cg_steps)
+
+        # list() re-raises the first exception of any worker
+        list(executor.map(solve, blocks))
+
+    def _init_factors(self, name, rows):
+
+        factors = open_memmap(self.directory / (name + ".npy"), mode="w+",
+                              dtype=self.dtype, shape=(rows, self.factors))
+        rng = np.random.default_rng(self.seed + (name == "item_factors"))
+        for start in range(0, rows, INIT_CHUNK):
+            end = min(start + INIT_CHUNK, rows)
+            factors[start:end] = rng.random((end - start, self.factors),
+                                            dtype=self.dtype) * 0.01
+        return factors
+
+    def _blocks(self, indptr) -> List[Tuple[int, int]]:
+
+        # Per block a worker holds the gathered factors of every nonzero (twice)
+        # plus about six vectors of factors per row for the CG state
+        itemsize = self.dtype.itemsize
+        per_nonzero = 2 * self.factors * itemsize + 3 * 8
+        per_row = 6 * self.factors * itemsize + 16
+        budget = self.memory_budget / self.workers
+
+        cost = np.cumsum(np.diff(indptr) * per_nonzero + per_row)
+        blocks = []
+        start = 0
+        while start < len(cost):
+            base = cost[start - 1] if start else 0
+            end = int(np.searchsorted(cost, base + budget, side="right"))
+            end = max(end, start + 1)
+            blocks.append((start, end))
+            start = end
+        return blocks
+
+    def _blocks_of(self, rows):
+
+        block_rows = max(1, int(self.memory_budget / self.workers /
+                                (self.factors * self.dtype.itemsize)))
+        return [(start, min(start + block_rows, rows))
+                for start in range(0, rows, block_rows)]
+
+
+def _conjugate_gradient(confidence, start, end, solved, fixed, gramian, cg_steps):
+
+    # Minimizes the implicit ALS loss of rows start:end with the other side
+    # fixed: (YtY + Yu^T (Cu - I) Yu + reg I) x = Yu^T Cu p(u), starting from
+    # the current factors, as implicit's CG solver does
+    indptr = np.asarray(confidence.indptr[start:end + 1])
+    first = indptr[0]
+    indptr = indptr - first
+    indices = np.asarray(confidence.indices[first:first + indptr[-1]])
+    data = np.asarray(confidence.data[first:first + indptr[-1]])
+    shape = (end - start, fixed.shape[0])
+    rows = np.repeat(np.arange(end - start), np.diff(indptr))
+    # A view of the memory map, so only the pages of touched rows are read
+    fixed = np.asarray(fixed)
+    gathered = fixed[indices]
+
+    def product(vectors):
+        weights = np.einsum("ij,ij->i", gathered, vectors[rows]) * (data - 1)
+        return vectors.dot(gramian) + \
+            csr_matrix((weights, indices, indptr), shape=shape).dot(fixed)
+
+    x = np.array(solved[start:end])
+    b = csr_matrix((data, indices, indptr), shape=shape).dot(fixed)
+
+    r = b - product(x)
+    p = r.copy()
+    rsold = np.einsum("ij,ij->i", r, r)
+    for _ in range(cg_steps):
+        if not (rsold > 1e-20).any():
+            break
+        Ap = product(p)
+        pAp = np.einsum("ij,ij->i", p, Ap)
+        step = np.divide(rsold, pAp, out=np.zeros_like(rsold), where=pAp > 0)
+        x += step[:, None] * p
+        r -= step[:, None] * Ap
+        rsnew = np.einsum("ij,ij->i", r, r)
+        ratio = np.divide(rsnew, rsold, out=np.zeros_like(rsnew), where=rsold > 0)
+        p = r + ratio[:, None] * p
+        rsold = rsnew
+
+    return x
+
+
+def _gramian(factors, blocks):
+
+    gramian = np.zeros((factors.shape[1], factors.shape[1]))
+    for start, end in blocks:
+        block = np.asarray(factors[start:end], dtype=np.float64)
+        gramian += block.T.dot(block)
+    return gramian
+
+
+def _copy_csr(matrix, path, scale, dtype, blocks):
+
+    path.mkdir(parents=True, exist_ok=True)
+    index_dtype = _index_dtype(matrix.nnz, matrix.shape)
+    indptr = open_memmap(path / "indptr.npy", mode="w+", dtype=index_dtype,
+                         shape=(matrix.shape[0] + 1,))
+    indices = open_memmap(path / "indices.npy", mode="w+", dtype=index_dtype,
+                          shape=(matrix.nnz,))
+    data = open_memmap(path / "data.npy", mode="w+", dtype=dtype, shape=(matrix.nnz,))
+
+    indptr[:] = matrix.indptr
+    for start, end in blocks:
+        first, last = matrix.indptr[start], matrix.indptr[end]
+        indices[first:last] = matrix.indices[first:last]
+        data[first:last] = np.asarray(matrix.data[first:last]) * scale
+
+    return _memmap_csr(indptr, indices, data, matrix.shape)
+
+
+def _transpose_csr(matrix, num_cols, path, blocks):
+
+    # Two passes over the row blocks: count the nonzeros of every column, then
+    # scatter each block into its columns. Blocks go in row order, so the row
+    # indices of every column come out sorted.
+    counts = np.zeros(num_cols, dtype=np.int64)
+    for start, end in blocks:
+        first, last = matrix.indptr[start], matrix.indptr[end]
+        counts += np.bincount(matrix.indices[first:last], minlength=num_cols)
+
+    path.mkdir(parents=True, exist_ok=True)
+    index_dtype = _index_dtype(matrix.nnz, matrix.shape)
+    indptr = open_memmap(path / "indptr.npy", mode="w+", dtype=index_dtype,
+                         shape=(num_cols + 1,))
+    indices = open_memmap(path / "indices.npy", mode="w+", dtype=index_dtype,
+                          shape=(matrix.nnz,))
+    data = open_memmap(path / "data.npy", mode="w+", dtype=matrix.data.dtype,
+                       shape=(matrix.nnz,))
+    indptr[0] = 0
+    indptr[1:] = np.cumsum(counts)
+
+    cursor = np.array(indptr[:-1])
+    for start, end in blocks:
+        first, last = matrix.indptr[start], matrix.indptr[end]
+        cols = np.asarray(matrix.indices[first:last])
+        rows = np.repeat(np.arange(start, end, dtype=index_dtype),
+                         np.diff(np.asarray(matrix.indptr[start:end + 1])))
+
+        order = np.argsort(cols, kind="stable")
+        sorted_cols = cols[order]
+        rank = np.arange(len(cols)) - np.searchsorted(sorted_cols, sorted_cols)
+        positions = cursor[sorted_cols] + rank
+
+        indices[positions] = rows[order]
+        data[positions] = np.asarray(matrix.data[first:last])[order]
+        cursor += np.bincount(cols, minlength=num_cols)
+
+    return _memmap_csr(indptr, indices, data, (num_cols, matrix.shape[0]))
+
+
+def _index_dtype(nnz, shape):
+
+    # scipy wants indptr and indices in one dtype, or it copies them to match
+    return np.int32 if max(nnz, *shape) < 2 ** 31 else np.int64
+
+
+def _memmap_csr(indptr, indices, data, shape):
+
+    # Assigning the arrays directly keeps scipy from copying the memory maps
+    matrix = csr_matrix(shape, dtype=data.dtype)
+    matrix.indptr, matrix.indices, matrix.data = indptr, indices, data
+    return matrix
@@ -0,0 +1,35 @@
+from typing import Dict
+
+import numpy as np
+
+PRECISIONS = ["float64", "float32", "float16", "int8"]
+
+
+def quantize_factors(factors: np.ndarray, precision: str) -> Dict[str, np.ndarray]:
+    """Stores ``factors`` at a lower ``precision`` for serving.
+
+    Returns the converted ``factors`` and, for ``int8``, the per-row
+    ``scales`` that map each row back onto its original range
+    (``factors ~= quantized * scales[:, None]``).
+    """
+
+    factors = np.asarray(factors)
+    if precision not in PRECISIONS:
+        raise ValueError("Unknown precision: {}".format(precision))
+
+    if precision != "int8":
+        return {"factors": factors.astype(precision)}
+
+    scales = np.abs(factors).max(axis=1).astype(np.float32) / 127
+    scales[scales == 0] = 1
+    quantized = np.clip(np.rint(factors / scales[:, None]), -127, 127)
+    return {"factors": quantized.astype(np.int8), "scales": scales}
+
+
+def dequantize_factors(factors: np.ndarray, scales: np.ndarray = None) -> np.ndarray:
+    """Float32 factors back from the output of ``quantize_factors``."""
+
+    factors = np.asarray(factors, dtype=np.float32)
+    if scales is not None:
+        factors = factors * scales[:, None]
+    return factors
@@ -0,0 +1,54 @@
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+ID_COLUMNS = ["order_id", "product_id", "customer_id"]
+
+
+class IdVocabulary:
+    """Maps the raw order, product and customer ids to dense int32 codes.
+
+    The codes are the row and column positions used by every matrix and
+    factor array downstream, so one vocabulary built from the cleaned
+    transactions is shared by splitting, scoring, the model export and the
+    demo. Orders are sorted and products and customers keep the order in
+    which they first appear, which is the layout ``split_data`` always used.
+    """
+
+    def __init__(self, ids: Dict[str, Iterable]):
+        self.ids = {column: pd.Index(values) for column, values in ids.items()}
+
+    @classmethod
+    def from_transactions(cls, transactions: pd.DataFrame) -> "IdVocabulary":
+        ids = {}
+        for column in ID_COLUMNS:
+            if column in transactions:
+                # pd.unique works on the integer codes of categorical columns
+                values = pd.unique(transactions[column])
+                ids[column] = np.asarray(values, dtype=str)
+        ids["order_id"] = np.sort(ids["order_id"])
+        return cls(ids)
+
+    def size(self, column: str) -> int:
+        return len(self.ids[column])
+
+    def encode(self, column: str, values) -> np.ndarray:
+        """int32 codes of ``values``, -1 for ids that are not in the vocabulary."""
+
+        index = self.ids[column]
+        if isinstance(values, pd.Series) and \
+                isinstance(values.dtype, pd.CategoricalDtype):
+            # Look up each category once and broadcast through the codes
+            lookup = index.get_indexer(values.cat.categories.astype(str))
+            lookup = np.append(lookup, -1).astype(np.int32)
+            return lookup[values.cat.codes.to_numpy()]
+        return index.get_indexer(np.asarray(values, dtype=str)).astype(np.int32)
+
+    def decode(self, column: str, codes) -> np.ndarray:
+        return self.ids[column].to_numpy()[np.asarray(codes)]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Fixed width string arrays, e.g. for ``ModelArtifactDataSet``."""
+
+        return {column: ids.to_numpy(dtype=str) for column, ids in self.ids.items()}
@@ -23,7 +23,25 @@ def register_pipelines() -> Dict[str, Pipeline]:
     instacart_pipeline = pipes.create_instacart_pipeline() + implicit_pipeline
     bakery_pipeline = pipes.create_bakery_pipeline() + implicit_pipeline
 
+    # Tuning reuses the train split an earlier run of the dataset saved,
+    # e.g. kedro run --env instacart --pipeline instacart_tuning
+    tuning_pipelines = {
+        "{}_tuning".format(dataset): pipes.create_tuning_pipeline(dataset)
+        for dataset in ["vipin20", "electronics", "brazilian", "ecommerce", "jewelry",
+                        "journey", "retailrocket", "instacart", "bakery"]
+    }
+
+    # The co-occurrence baseline also scores a saved split, next to ALS,
+    # e.g. kedro run --env instacart --pipeline cooccurrence
+    cooccurrence_pipeline = pipes.create_cooccurrence_pipeline()
+
+    # The item index for serving is only built on request: implicit_ann also ranks
+    # the test orders with it, and ann reports its recall for saved factors,
+    # e.g. kedro run --env instacart --pipeline ann
+    indexing_pipeline = pipes.create_indexing_pipeline()
+
     return {
+        **tuning_pipelines,
         "vipin20": vipin20_pipeline,
         "electronics": electronics_pipeline,
         "brazilian": brazilian_pipeine,
@@ -34,5 +52,9 @@ def register_pipelines() -> Dict[str, Pipeline]:
         "instacart": instacart_pipeline,
         "bakery": bakery_pipeline,
         "implicit": implicit_pipeline,
+        "implicit_warm": pipes.create_implicit_pipeline(warm_start=True),
+        "implicit_ann": pipes.create_implicit_pipeline(ann=True),
+        "cooccurrence": cooccurrence_pipeline,
+        "ann": indexing_pipeline,
         "__default__": vipin20_pipeline
     }
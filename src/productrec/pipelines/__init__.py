@@ -8,5 +8,8 @@ from .pipeline import  (
     create_retailrocket_pipeline,
     create_vipin20_pipeline,
     create_implicit_pipeline,
-    create_bakery_pipeline
+    create_bakery_pipeline,
+    create_tuning_pipeline,
+    create_cooccurrence_pipeline,
+    create_indexing_pipeline
 )
@@ -1 +1 @@
-from .nodes import clean_data
\ No newline at end of file
+from .nodes import clean_data, build_vocabulary
\ No newline at end of file
@@ -3,36 +3,74 @@ from typing import Any, Dict, List
 import pandas as pd
 import numpy as np
 import logging
-import wandb
+from productrec import tracking
 
-def clean_data(transactions: pd.DataFrame, params: Dict) -> pd.DataFrame:
+from productrec.models import IdVocabulary
+from productrec.pipelines.profiling import id_codes, profile_counts
 
-    log = logging.getLogger(__name__)
+def clean_data(transactions: pd.DataFrame, product_profile: pd.DataFrame,
+               params: Dict) -> pd.DataFrame:
 
-    wandb.init(
-        project=params["wandb_project"],
-        notes="implicit_pipeline",
-        config=params,
-    )
+    log = logging.getLogger(__name__)
 
     filter_value = params.get("filter_value", 2)
     minimum_order_size = params.get("minimum_order_size", 5)
     maximum_order_size = params.get("maximum_order_size", 20)
 
-    # Need to filter out products that didn't show up in more than some number of orders
-    product_group = transactions.loc[:, ['order_id', 'product_id']].groupby('product_id').count()
- 
-    multi_product = product_group[product_group.order_id >= filter_value].count()
-    single_product = product_group[product_group.order_id < filter_value].count()
-    
-    log.info("Products in at least {} orders: {}".format(filter_value, multi_product['order_id']))
-    log.info("Products in less than {} orders: {}".format(filter_value, single_product['order_id']))
+    if params.get("clean_mode", "kcore") == "kcore":
+        filtered_df = _kcore_filter(transactions, product_profile, filter_value,
+                                    minimum_order_size, maximum_order_size)
+    else:
+        filtered_df = _filter(transactions, product_profile, filter_value,
+                              minimum_order_size, maximum_order_size)
+
+    log.info("Original dataframe length: {}".format(len(transactions)))
+    log.info("Filtered dataframe length: {}".format(len(filtered_df)))
+
+    # nunique only counts ids that are still present, even for categorical columns
+    num_items = filtered_df['product_id'].nunique()
+    num_orders = filtered_df['order_id'].nunique()
+
+    # Sparsity of the order x product matrix, so repeated (order, product)
+    # rows of the filtered frame count once
+    orders, _ = id_codes(filtered_df['order_id'])
+    products, product_ids = id_codes(filtered_df['product_id'])
+    known = (orders >= 0) & (products >= 0)
+    interactions = len(np.unique(orders[known] * len(product_ids) + products[known]))
+    sparsity = 1 - interactions / max(num_orders * num_items, 1)
+    log.info("Number of orders: {}, number of items: {}".format(num_orders, num_items))
+    log.info("Matrix sparsity: {}".format(sparsity))
 
-    product_filter = product_group[product_group.order_id >= filter_value].index.tolist()
-    product_filtered_df = transactions[transactions['product_id'].isin(product_filter)].copy()
+    # Log to the metrics run
+    tracking.log({"sparsity": sparsity, "num_orders": num_orders,
+                  "num_items": num_items})
+
+    # The ids stay categorical, build_vocabulary maps them to dense codes
+    return filtered_df
+
+def _filter(transactions: pd.DataFrame, product_profile: pd.DataFrame,
+            filter_value: int, minimum_order_size: int,
+            maximum_order_size: int) -> pd.DataFrame:
+
+    log = logging.getLogger(__name__)
+
+    # Need to filter out products that didn't show up in more than some number of
+    # orders, using the purchase counts of the profile
+    product_group = product_profile.purchases
+
+    log.info("Products in at least {} orders: {}".format(
+        filter_value, (product_group >= filter_value).sum()))
+    log.info("Products in less than {} orders: {}".format(
+        filter_value, (product_group < filter_value).sum()))
+
+    product_counts = profile_counts(product_profile, transactions['product_id'],
+                                    'purchases')
+    product_filtered_df = transactions[product_counts >= filter_value].copy()
 
     # Need to filter out orders that didn't have at least a minimum number of products
-    order_group = product_filtered_df.loc[:, ['order_id', 'product_id']].groupby('order_id').count()
+    order_group = product_filtered_df.loc[:, ['order_id', 'product_id']] \
+        .groupby('order_id', observed=True) \
+        .count()
     
     multi_order = order_group[(order_group.product_id >= minimum_order_size) & (order_group.product_id <= maximum_order_size)].count()
     single_order = order_group[(order_group.product_id < minimum_order_size) | (order_group.product_id > maximum_order_size)].count()
@@ -43,25 +81,54 @@ def clean_data(transactions: pd.DataFrame, params: Dict) -> pd.DataFrame:
     order_filter = order_group[(order_group.product_id >= minimum_order_size) & (order_group.product_id <= maximum_order_size)].index.tolist()
     filtered_df = product_filtered_df[product_filtered_df['order_id'].isin(order_filter)].copy()
 
-    log.info("Original dataframe length: {}".format(len(transactions)))
-    log.info("Filtered dataframe length: {}".format(len(filtered_df)))
+    return filtered_df
 
-    product_counts = filtered_df['product_id'].value_counts().to_numpy()
-    print('There are', len(product_counts), 'unique products\n')
-    
-    order_counts = filtered_df['order_id'].value_counts()
-    num_orders = len(order_counts)
-    num_items = len(product_counts)
-    sparsity = 1 - len(transactions) / (num_orders * num_items)
-    log.info("Number of orders: {}, number of items: {}".format(num_orders, num_items))
-    print(f'matrix sparsity: {sparsity:f}')
-    log.info("Matrix sparsity: {}".format(sparsity))
-    
-    # Log to wandb
-    wandb.log({"sparsity": sparsity})
+def _kcore_filter(transactions: pd.DataFrame, product_profile: pd.DataFrame,
+                  filter_value: int, minimum_order_size: int,
+                  maximum_order_size: int) -> pd.DataFrame:
 
-    filtered_df['product_id'] = filtered_df['product_id'].astype(str)
-    filtered_df['order_id'] = filtered_df['order_id'].astype(str)
+    log = logging.getLogger(__name__)
 
-    return filtered_df
+    # Dropping orders can push products back under filter_value (and the other
+    # way around), so both filters repeat until neither removes a row
+    products, _ = id_codes(transactions['product_id'])
+    orders, _ = id_codes(transactions['order_id'])
+
+    # Missing ids have the code -1 and are dropped, as the groupby would
+    rows = np.flatnonzero((products >= 0) & (orders >= 0))
+    products, orders = products[rows], orders[rows]
+    num_products = products.max() + 1 if len(products) else 0
+    num_orders = orders.max() + 1 if len(orders) else 0
+
+    # The first round takes the product counts from the profile
+    product_counts = profile_counts(product_profile, transactions['product_id'],
+                                    'purchases')[rows]
+
+    rounds = 0
+    while True:
+        rounds += 1
+        keep = product_counts >= filter_value
+        order_size = np.bincount(orders[keep], minlength=num_orders)[orders]
+        keep &= (order_size >= minimum_order_size) & (order_size <= maximum_order_size)
+
+        if keep.all():
+            break
+
+        rows, products, orders = rows[keep], products[keep], orders[keep]
+        product_counts = np.bincount(products, minlength=num_products)[products]
+        log.info("k-core round {}: {} rows left".format(rounds, len(rows)))
+
+    log.info("k-core filtering converged after {} rounds".format(rounds))
+
+    return transactions.iloc[rows]
+
+def build_vocabulary(clean_transactions: pd.DataFrame) -> IdVocabulary:
+
+    log = logging.getLogger(__name__)
+
+    vocabulary = IdVocabulary.from_transactions(clean_transactions)
+    for column, ids in vocabulary.ids.items():
+        log.info("Vocabulary size of {}: {}".format(column, len(ids)))
+
+    return vocabulary
 
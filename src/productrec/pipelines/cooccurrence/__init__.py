@@ -0,0 +1 @@
+from .nodes import build_cooccurrence
\ No newline at end of file
@@ -0,0 +1,81 @@
+from typing import Dict
+
+import numpy as np
+import scipy
+from scipy.sparse import csr_matrix
+import logging
+import time
+from productrec import tracking
+
+SIMILARITIES = ["cosine", "lift", "jaccard"]
+
+def build_cooccurrence(product_train: scipy.sparse.csr_matrix,
+                       params: Dict) -> csr_matrix:
+
+    log = logging.getLogger(__name__)
+
+    similarity = params.get("cooccurrence_similarity", "cosine")
+    if similarity not in SIMILARITIES:
+        raise ValueError("Unknown cooccurrence_similarity: {}".format(similarity))
+    min_count = params.get("cooccurrence_min_count", 2)
+    memory_mb = params.get("cooccurrence_memory_mb", 512)
+
+    # Binary order x product matrix X and its transpose, whatever the
+    # duplicate policy put in the training matrix
+    orders = csr_matrix(product_train, dtype=np.float32, copy=True)
+    orders.eliminate_zeros()
+    orders.data[:] = 1
+    items = orders.T.tocsr()
+
+    num_items = orders.shape[1]
+    num_orders = int((np.diff(orders.indptr) > 0).sum())
+    item_counts = np.diff(items.indptr).astype(np.float32)
+    neighbors = min(params.get("cooccurrence_neighbors", 100), num_items)
+
+    # XtX is computed for a block of products at a time. A block holds its
+    # dense counts, their normalized copy and the top-k ids, about 16 bytes
+    # per product pair.
+    block_items = max(1, int(memory_mb * 2 ** 20 // (num_items * 16)))
+    log.info("Co-occurrence of {} products with {} similarity in blocks of {}".format(
+        num_items, similarity, block_items))
+
+    start = time.perf_counter()
+    rows, cols, values = [], [], []
+    for first in range(0, num_items, block_items):
+        last = min(first + block_items, num_items)
+        counts = items[first:last].dot(orders).toarray()
+        counts[np.arange(last - first), np.arange(first, last)] = 0
+
+        scores = _normalize(counts, item_counts[first:last], item_counts, num_orders,
+                            similarity)
+        scores[counts < min_count] = 0
+
+        top = np.argpartition(-scores, neighbors - 1, axis=1)[:, :neighbors]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        keep = top_scores > 0
+        rows.append(np.broadcast_to(np.arange(first, last)[:, None], top.shape)[keep])
+        cols.append(top[keep])
+        values.append(top_scores[keep])
+
+    item_neighbors = csr_matrix((np.concatenate(values),
+                                 (np.concatenate(rows), np.concatenate(cols))),
+                                shape=(num_items, num_items), dtype=np.float32)
+    duration = time.perf_counter() - start
+
+    log.info("Kept {} neighbors in {:.1f}s".format(item_neighbors.nnz, duration))
+    tracking.log({"cooccurrence_time": duration})
+
+    return item_neighbors
+
+def _normalize(counts, block_counts, item_counts, num_orders, similarity):
+
+    # counts[i, j] is the number of orders with both products, block_counts
+    # and item_counts the number of orders with each product
+    if similarity == "cosine":
+        denominator = np.sqrt(block_counts[:, None] * item_counts[None, :])
+    elif similarity == "lift":
+        denominator = block_counts[:, None] * item_counts[None, :] / num_orders
+    else:
+        denominator = block_counts[:, None] + item_counts[None, :] - counts
+
+    return np.divide(counts, denominator, out=np.zeros_like(counts), where=counts > 0)
@@ -0,0 +1 @@
+from .nodes import build_item_index, report_index_recall
\ No newline at end of file
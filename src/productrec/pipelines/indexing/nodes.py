@@ -0,0 +1,80 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import logging
+import time
+from productrec import tracking
+
+from productrec.models import ItemIndex
+
+def build_item_index(item_vecs: np.ndarray, params: Dict) -> ItemIndex:
+
+    log = logging.getLogger(__name__)
+
+    start = time.perf_counter()
+    index = ItemIndex(item_vecs,
+                      lists=params.get("ann_lists"),
+                      probe=params.get("ann_probe", 8),
+                      iterations=params.get("ann_iterations", 10),
+                      seed=params.get("seed", 42))
+    duration = time.perf_counter() - start
+
+    log.info("Built item index with {} lists over {} items in {:.2f}s".format(
+        index.lists, index.num_items, duration))
+    tracking.log({"index_build_time": duration})
+
+    return index
+
+def report_index_recall(item_index: ItemIndex, user_vecs: np.ndarray,
+                        item_vecs: np.ndarray, params: Dict) -> Dict:
+
+    log = logging.getLogger(__name__)
+
+    k = params.get("ann_recall_k", 10)
+    probes = params.get("ann_recall_probes", [1, 2, 4, 8, 16, 32])
+
+    # Use the factors of a sample of training orders as queries. Rows of the
+    # test orders are empty in train and have zero factors, so skip those.
+    trained = np.flatnonzero(np.any(np.asarray(user_vecs) != 0, axis=1))
+    num_queries = min(params.get("ann_recall_queries", 1000), len(trained))
+    rng = np.random.default_rng(params.get("seed", 42))
+    queries = np.asarray(user_vecs[rng.choice(trained, num_queries,
+                                              replace=False)], dtype=np.float32)
+    item_vecs = np.asarray(item_vecs, dtype=np.float32)
+    k = min(k, len(item_vecs))
+
+    start = time.perf_counter()
+    scores = queries.dot(item_vecs.T)
+    exact = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    exact_time = (time.perf_counter() - start) / num_queries
+
+    report = {
+        "k": k,
+        "queries": num_queries,
+        "lists": item_index.lists,
+        "exact_ms_per_query": exact_time * 1000,
+        "probes": []
+    }
+
+    for probe in probes:
+        if probe > item_index.lists:
+            continue
+        start = time.perf_counter()
+        approximate, _ = item_index.search(queries, N=k, probe=probe)
+        search_time = (time.perf_counter() - start) / num_queries
+
+        found = (approximate[:, :, None] == exact[:, None, :]).any(axis=2)
+        recall = found.sum(axis=1).mean() / k
+
+        log.info("Index recall@{} with probe {}: {:.4f} ({:.3f} ms/query)".format(
+            k, probe, recall, search_time * 1000))
+        report["probes"].append({
+            "probe": probe,
+            "recall": float(recall),
+            "ms_per_query": search_time * 1000
+        })
+
+    tracking.log({"index_recall_probe_{}".format(entry["probe"]): entry["recall"]
+               for entry in report["probes"]})
+
+    return report
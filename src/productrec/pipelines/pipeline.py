@@ -12,11 +12,15 @@ from .transform import (
     transform_bakery
 )
 
-from .cleaning import clean_data
+from .cleaning import clean_data, build_vocabulary
 from .splitting import split_data
-from .training import train_implicit
-from .scoring import score_confusion
-from .reporting import report
+from .training import train_implicit, train_implicit_warm, export_model
+from .scoring import score_confusion, score_neighbors
+from .indexing import build_item_index, report_index_recall
+from .reporting import report, plot_sparsity
+from .profiling import profile_transactions
+from .tuning import tune_hyperparameters
+from .cooccurrence import build_cooccurrence
 
 def create_electronics_pipeline(**kwargs):
     return Pipeline(
@@ -126,38 +130,140 @@ def create_bakery_pipeline(**kwargs):
         ]
     )
 
-def create_implicit_pipeline(**kwargs):
+def create_implicit_pipeline(warm_start=False, ann=False, **kwargs):
+
+    # Warm starting continues from previous_model_artifact for a few iterations
+    if warm_start:
+        train_node = node(
+            train_implicit_warm,
+            ["train", "test", "test_heldout", "id_vocabulary",
+                "previous_model_artifact", "parameters"],
+            ["user_factors", "item_factors", "product_train", "warm_start_report"],
+            name="train_implicit"
+        )
+    else:
+        train_node = node(
+            train_implicit,
+            ["train", "parameters"],
+            ["user_factors", "item_factors", "product_train", "training_curve"],
+            name="train_implicit"
+        )
+
+    # With ann the item index is saved and the test orders are ranked with it,
+    # as recommendations would be served
+    score_inputs = ["train", "test", "test_heldout", "user_factors", "item_factors",
+                    "parameters"]
+    index_nodes = []
+    if ann:
+        index_nodes.append(node(
+            build_item_index,
+            ["item_factors", "parameters"],
+            "item_index",
+            name="build_item_index"
+        ))
+        score_inputs.append("item_index")
+
     return Pipeline(
         [
+            node(
+                profile_transactions,
+                "transactions",
+                ["order_profile", "product_profile", "customer_profile",
+                    "order_products"],
+                name="profile_transactions"
+            ),
             node(report,
-                ["transactions", "parameters"],
+                ["transactions", "order_profile", "product_profile", "customer_profile",
+                    "order_products", "parameters"],
                 None,
                 name="report",
             ),
             node(
                 clean_data,
-                ["transactions", "parameters"],
+                ["transactions", "product_profile", "parameters"],
                 "clean_transactions",
                 name="clean_data"
             ),
+            node(
+                build_vocabulary,
+                "clean_transactions",
+                "id_vocabulary",
+                name="build_vocabulary"
+            ),
             node(
                 split_data,
-                ["clean_transactions", "parameters"],
-                ["train", "test"],
+                ["clean_transactions", "id_vocabulary", "parameters"],
+                ["train", "test", "test_heldout"],
                 name="split_data"
             ),
             node(
-                train_implicit,
-                ["train", "parameters"],
-                ["user_factors", "item_factors", "product_train"],
-                name="train_implicit"
+                plot_sparsity,
+                ["train", "test", "test_heldout", "parameters"],
+                None,
+                name="plot_sparsity"
+            ),
+            train_node,
+            node(
+                export_model,
+                ["user_factors", "item_factors", "product_train", "id_vocabulary",
+                    "parameters"],
+                "model_artifact",
+                name="export_model"
             ),
+            *index_nodes,
             node(
                 score_confusion,
-                ["train", "test",
-                    "user_factors", "item_factors", "parameters"],
+                score_inputs,
                 "score",
                 name="score_implicit"
             )
         ]
     )
+
+def create_cooccurrence_pipeline(**kwargs):
+    return Pipeline(
+        [
+            node(
+                build_cooccurrence,
+                ["train", "parameters"],
+                "item_neighbors",
+                name="build_cooccurrence"
+            ),
+            node(
+                score_neighbors,
+                ["train", "test", "test_heldout", "item_neighbors", "parameters"],
+                "cooccurrence_score",
+                name="score_cooccurrence"
+            )
+        ]
+    )
+
+def create_indexing_pipeline(**kwargs):
+    return Pipeline(
+        [
+            node(
+                build_item_index,
+                ["item_factors", "parameters"],
+                "item_index",
+                name="build_item_index"
+            ),
+            node(
+                report_index_recall,
+                ["item_index", "user_factors", "item_factors", "parameters"],
+                "index_recall",
+                name="report_index_recall"
+            )
+        ]
+    )
+
+def create_tuning_pipeline(dataset, **kwargs):
+    return Pipeline(
+        [
+            node(
+                tune_hyperparameters,
+                ["train", "parameters"],
+                "{}_hyperparameters".format(dataset),
+                name="tune_hyperparameters"
+            )
+        ]
+    )
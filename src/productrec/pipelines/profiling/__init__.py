@@ -0,0 +1 @@
+from .nodes import profile_transactions, profile_counts, id_codes
\ No newline at end of file
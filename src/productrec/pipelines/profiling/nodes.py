@@ -0,0 +1,105 @@
+from typing import Any, List, Tuple
+
+import pandas as pd
+import numpy as np
+import logging
+
+from productrec.models import interaction_matrix
+
+def profile_transactions(transactions: pd.DataFrame) -> List[Any]:
+    """Per-order, per-product and per-customer counts of ``transactions``.
+
+    Every id column is turned into integer codes once and all counts are
+    bincounts over those codes. Returns three small tables keyed by id:
+
+    * orders: ``products`` (distinct), ``purchases`` (rows) and ``quantity``
+    * products: ``orders`` (distinct), ``purchases`` and ``quantity``
+    * customers: ``orders`` (distinct), ``purchases`` and ``quantity``
+
+    and the binary order x product matrix of the same codes, whose rows and
+    columns follow the order and product tables.
+
+    Rows with a missing id are left out of the counts of that id.
+    """
+
+    log = logging.getLogger(__name__)
+
+    orders, order_ids = id_codes(transactions['order_id'])
+    products, product_ids = id_codes(transactions['product_id'])
+    if 'customer_id' in transactions:
+        customers, customer_ids = id_codes(transactions['customer_id'])
+    else:
+        customers, customer_ids = np.full(len(transactions), -1), np.array([])
+    if 'quantity' in transactions:
+        quantity = transactions['quantity'].to_numpy()
+    else:
+        quantity = np.ones(len(transactions), dtype=np.int64)
+
+    num_orders, num_products = len(order_ids), len(product_ids)
+
+    # Distinct (order, product) and (customer, order) pairs as single int64 keys
+    known = (orders >= 0) & (products >= 0)
+    pairs = np.unique(orders[known] * num_products + products[known])
+    with_customer = (customers >= 0) & (orders >= 0)
+    customer_orders = np.unique(customers[with_customer] * num_orders +
+                                orders[with_customer])
+
+    order_profile = _profile('order_id', order_ids, orders, quantity,
+                             products=pairs // max(num_products, 1))
+    product_profile = _profile('product_id', product_ids, products, quantity,
+                               orders=pairs % max(num_products, 1))
+    customer_profile = _profile('customer_id', customer_ids, customers, quantity,
+                                orders=customer_orders // max(num_orders, 1))
+
+    # The profiles drop ids without purchases, so the pairs are renumbered to
+    # the rows of the order and product tables
+    order_rows = _profile_rows(orders, num_orders)
+    product_rows = _profile_rows(products, num_products)
+    order_products = interaction_matrix(
+        order_rows[pairs // max(num_products, 1)],
+        product_rows[pairs % max(num_products, 1)],
+        (len(order_profile), len(product_profile)))
+
+    log.info("Profiled {} purchases of {} orders, {} products and {} customers"
+             .format(len(transactions), len(order_profile), len(product_profile),
+                     len(customer_profile)))
+
+    return [order_profile, product_profile, customer_profile, order_products]
+
+def id_codes(ids: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Integer codes of ``ids`` and the id of every code; missing ids get -1."""
+
+    # Categorical ids already carry integer codes, anything else is factorized once
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        return ids.cat.codes.to_numpy().astype(np.int64), ids.cat.categories.to_numpy()
+    codes, uniques = pd.factorize(ids)
+    return codes.astype(np.int64), np.asarray(uniques)
+
+def profile_counts(profile: pd.DataFrame, ids: pd.Series, column: str) -> np.ndarray:
+    """``profile[column]`` for the id of every row of ``ids``, 0 for unknown ids."""
+
+    codes, uniques = id_codes(ids)
+    counts = pd.Series(profile[column].to_numpy(),
+                       index=profile.iloc[:, 0].to_numpy()) \
+        .reindex(uniques, fill_value=0) \
+        .to_numpy()
+    return np.where(codes >= 0, counts[codes], 0)
+
+def _profile(column, ids, codes, quantity, **distinct):
+
+    known = codes >= 0
+    profile = pd.DataFrame({column: ids})
+    for name, distinct_codes in distinct.items():
+        profile[name] = np.bincount(distinct_codes, minlength=len(ids))
+    profile['purchases'] = np.bincount(codes[known], minlength=len(ids))
+    profile['quantity'] = np.bincount(codes[known], weights=quantity[known],
+                                      minlength=len(ids)).astype(quantity.dtype)
+
+    # Categories without a single purchase are not part of the data
+    return profile[profile.purchases > 0].reset_index(drop=True)
+
+def _profile_rows(codes, num_ids):
+
+    # Row of every code in its profile, which only keeps purchased ids
+    purchased = np.bincount(codes[codes >= 0], minlength=num_ids) > 0
+    return np.cumsum(purchased) - 1
@@ -1 +1 @@
-from .nodes import report
\ No newline at end of file
+from .nodes import report, plot_sparsity
\ No newline at end of file
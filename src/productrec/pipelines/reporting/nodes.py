@@ -3,27 +3,27 @@ from typing import Any, Dict, List
 import pandas as pd
 import numpy as np
 import logging
-import wandb
-from matplotlib import pyplot as plt
-from mlxtend.frequent_patterns import apriori, association_rules
-from mlxtend.preprocessing import TransactionEncoder
+import time
+from scipy.sparse import csr_matrix
 
-def report(transactions: pd.DataFrame, params: Dict) -> pd.DataFrame:
+from productrec import tracking
+from productrec.models import frequent_itemsets
+
+def report(transactions: pd.DataFrame, order_profile: pd.DataFrame,
+           product_profile: pd.DataFrame, customer_profile: pd.DataFrame,
+           order_products: csr_matrix, params: Dict) -> pd.DataFrame:
 
     log = logging.getLogger(__name__)
 
-    wandb.init(
-        project=params["wandb_project"],
-        notes="implicit_pipeline",
-        config=params,
-    )
+    report_start = time.perf_counter()
+    plot_points = params.get("report_plot_points", 1000)
 
-    # Log basic statistics for the transactions
-    order_count = len(pd.unique(transactions['order_id']))
-    customer_count = len(pd.unique(transactions['customer_id']))
-    product_count = len(pd.unique(transactions["product_id"]))
+    # Log basic statistics for the transactions, all counts come from the profile
+    order_count = len(order_profile)
+    customer_count = len(customer_profile)
+    product_count = len(product_profile)
     purchase_count = len(transactions)
-    wandb.log({
+    tracking.log({
         "order_count": order_count,
         "customer_count": customer_count,
         "product_count": product_count,
@@ -31,42 +31,36 @@ def report(transactions: pd.DataFrame, params: Dict) -> pd.DataFrame:
     })
 
     # Log some graphs for customers
-    user_counts = transactions \
-        .drop_duplicates(['customer_id', 'order_id']) \
-        .groupby('customer_id')['order_id'] \
-        .count() \
+    user_counts = customer_profile \
+        .set_index('customer_id')['orders'] \
         .sort_values(ascending=False)
 
     user_df = user_counts \
         .reset_index() \
-        .rename(columns={"customer_id":"Customer", "order_id":"Orders"})
+        .rename(columns={"customer_id":"Customer", "orders":"Orders"})
 
-    customer_table = wandb.Table(dataframe=user_df[:10])
-    wandb.log({"top_10_customer_by_orders": customer_table})
+    tracking.log_table("top_10_customer_by_orders", user_df[:10])
 
-    plt.plot(user_counts.values) 
-    wandb.log({
-        "orders_by_customers_plot": plt
-    })
+    # The figures are drawn by the tracking run's plot worker from a few
+    # precomputed points, never from the full series
+    tracking.log_plot("orders_by_customers_plot", _draw_counts,
+                      *_downsample(user_counts.to_numpy(), plot_points),
+                      xlabel="Customer rank", ylabel="Orders")
 
     # Log some graphs for products
-    product_counts = transactions \
-        .drop_duplicates(['product_id', 'order_id']) \
-        .groupby('product_id')['order_id'] \
-        .count() \
+    product_counts = product_profile \
+        .set_index('product_id')['orders'] \
         .sort_values(ascending=False)
 
     product_df = product_counts \
         .reset_index() \
-        .rename(columns={"product_id":"Product", "order_id":"Orders"})
+        .rename(columns={"product_id":"Product", "orders":"Orders"})
 
-    product_table = wandb.Table(dataframe=product_df[:10])
-    wandb.log({"top_10_product_by_orders": product_table})
+    tracking.log_table("top_10_product_by_orders", product_df[:10])
 
-    plt.plot(product_counts.values) 
-    wandb.log({
-        "products_by_orders_plot": plt
-    })
+    tracking.log_plot("products_by_orders_plot", _draw_counts,
+                      *_downsample(product_counts.to_numpy(), plot_points),
+                      xlabel="Product rank", ylabel="Orders")
 
     # Break down products based on # orders vs total count of orders
     quantiles, bins = pd.qcut(x=user_counts, q=5, retbins=True, duplicates='drop')
@@ -76,24 +70,19 @@ def report(transactions: pd.DataFrame, params: Dict) -> pd.DataFrame:
     for i in range(1,len(bins)):
         batches.append(bins[i] - bins[i-1])
         
-    fig1, ax1 = plt.subplots(figsize=(10, 8))
     log.info(batches)
-    plt.pie(batches, autopct='%1.1f%%')
-
-    fig1.gca().set_title("Breakdown of customers into 20% blocks by order count")
-    wandb.log({"customer_breakdown": wandb.Image(plt)})
+    tracking.log_plot("customer_breakdown", _draw_breakdown, batches,
+                      "Breakdown of customers into 20% blocks by order count")
 
-    product_counts = transactions \
-        .groupby(transactions.product_id)['order_id'] \
-        .count(). \
-        sort_values(ascending=False)
+    product_counts = product_profile \
+        .set_index('product_id')['purchases'] \
+        .sort_values(ascending=False)
 
     product_df = product_counts \
         .reset_index() \
-        .rename(columns={"product_id":"Product", "quantity":"Quantity"})
+        .rename(columns={"product_id":"Product", "purchases":"Purchases"})
 
-    product_table = wandb.Table(dataframe=product_df[:10])
-    wandb.log({"top_10_products_by_orders": product_table})
+    tracking.log_table("top_10_products_by_orders", product_df[:10])
 
     # Break down products based on # orders vs total count of orders
     quantiles, bins = pd.qcut(x=product_counts, q=5, retbins=True, duplicates='drop')
@@ -103,58 +92,115 @@ def report(transactions: pd.DataFrame, params: Dict) -> pd.DataFrame:
     for i in range(1,len(bins)):
         batches.append(bins[i] - bins[i-1])
         
-    fig1, ax1 = plt.subplots(figsize=(10, 8))
-    plt.pie(batches, autopct='%1.1f%%')
-
-    fig1.gca().set_title("Breakdown of products into 20% blocks by order count")
-    wandb.log({"product_breakdown": wandb.Image(plt)})
-
-    # Now for some mlxtend action
-    grouped = transactions.groupby('order_id').agg({"product_id": lambda x: list(x)})
-    temp = grouped['product_id'].values
-
-    te = TransactionEncoder()
-
-    try:
-        oht_ary = te.fit(temp).transform(temp, sparse=True)
-        sparse_df = pd.DataFrame.sparse.from_spmatrix(oht_ary, columns=te.columns_)
-        sparse_df.columns = [str(i) for i in sparse_df.columns]
-        top_sets = apriori(sparse_df, min_support=0.1, use_colnames=True, verbose=1, max_len=5)
-        top_sets['length'] = top_sets['itemsets'].apply(lambda x: len(x))
-
-        set1 = top_sets[top_sets['length'] == 1].sort_values('support', ascending=False).reset_index()[:5][['support','itemsets']]
-        set1['itemsets'] = set1['itemsets'].apply(lambda x: str(x))
-        log.info(set1)
-        if(len(set1) > 0):
-            support_table = wandb.Table(dataframe=set1)
-            wandb.log({"top_5_product_singles": support_table})
-
-        set2 = top_sets[top_sets['length'] == 2].sort_values('support', ascending=False).reset_index()[:5][['support','itemsets']]
-        set2['itemsets'] = set2['itemsets'].apply(lambda x: str(x))
-        log.info(set2)
-        if(len(set2) > 0):
-            support_table = wandb.Table(dataframe=set2)
-            wandb.log({"top_5_product_pairs": support_table})
-
-        set3 = top_sets[top_sets['length'] == 3].sort_values('support', ascending=False).reset_index()[:5][['support','itemsets']]
-        set3['itemsets'] = set3['itemsets'].apply(lambda x: str(x))
-        log.info(set3)
-        if(len(set3) > 0):
-            support_table = wandb.Table(dataframe=set3)
-            wandb.log({"top_5_product_triples": support_table})
-
-        set4 = top_sets[top_sets['length'] == 4].sort_values('support', ascending=False).reset_index()[:5][['support','itemsets']]
-        set4['itemsets'] = set4['itemsets'].apply(lambda x: str(x))
-        log.info(set4)
-        if(len(set4) > 0):
-            support_table = wandb.Table(dataframe=set4)
-            wandb.log({"top_5_product_quads": support_table})
-
-        set5 = top_sets[top_sets['length'] == 5].sort_values('support', ascending=False).reset_index()[:5][['support','itemsets']]
-        set5['itemsets'] = set5['itemsets'].apply(lambda x: str(x))
-        log.info(set5)
-        if(len(set5) > 0):
-            support_table = wandb.Table(dataframe=set5)
-            wandb.log({"top_5_product_quints": support_table})
-    except RuntimeError as err:
-        log.info("Something went wrong with the mlxtend: {}".format(err))
\ No newline at end of file
+    tracking.log_plot("product_breakdown", _draw_breakdown, batches,
+                      "Breakdown of products into 20% blocks by order count")
+
+    # Most frequent product sets of every length, mined from the binary order
+    # x product matrix. The support threshold of each length rises to the
+    # count of its top_n-th set, so the tables are filled on every dataset
+    # without enumerating everything above a fixed min_support. The matrix
+    # comes from the profile, its columns follow the product table.
+    product_ids = product_profile.product_id.to_numpy()
+
+    top_n = params.get("itemset_top_n", 5)
+    start = time.perf_counter()
+    top_sets = frequent_itemsets(order_products, top_n=top_n,
+                                 max_len=params.get("itemset_max_len", 5),
+                                 min_count=params.get("itemset_min_count", 2))
+    log.info("Mined frequent product sets in {:.1f}s"
+             .format(time.perf_counter() - start))
+
+    names = ["singles", "pairs", "triples", "quads", "quints"]
+    for length, itemsets in top_sets.items():
+        set_df = pd.DataFrame({
+            "support": [count / order_count for _, count in itemsets],
+            "itemsets": [str(frozenset(str(product_ids[product])
+                                       for product in itemset))
+                         for itemset, _ in itemsets],
+        })
+        log.info(set_df)
+        name = names[length - 1] if length <= len(names) else "{}_sets".format(length)
+        tracking.log_table("top_{}_product_{}".format(top_n, name), set_df)
+
+    # Rendering happens in the background and logs its own render_seconds
+    tracking.log({"report_seconds": time.perf_counter() - report_start})
+
+def plot_sparsity(train: csr_matrix, test: csr_matrix, test_heldout: csr_matrix,
+                  params: Dict) -> None:
+
+    log = logging.getLogger(__name__)
+
+    if not params.get("sparsity_plot", True):
+        log.info("Skipping the sparsity plot")
+        return
+
+    # Bin the nonzeros of all orders into a fixed size image, instead of
+    # drawing a marker for every one of them. Test orders that are also in
+    # train (leave_k_out) only add their held out products.
+    bins = params.get("sparsity_bins", 512)
+    num_rows = train.shape[0]
+    row_bins = min(bins, num_rows)
+    col_bins = min(bins, train.shape[1])
+
+    histogram = np.zeros(row_bins * col_bins, dtype=np.int64)
+    _bin_nonzeros(histogram, train, num_rows, row_bins, col_bins)
+    _bin_nonzeros(histogram, test, num_rows, row_bins, col_bins,
+                  rows=np.diff(train.indptr) == 0)
+    _bin_nonzeros(histogram, test_heldout, num_rows, row_bins, col_bins)
+    histogram = histogram.reshape(row_bins, col_bins)
+
+    tracking.log_plot("Sparcity Plot", _draw_sparsity, histogram, train.shape)
+
+def _downsample(sorted_counts, points):
+
+    # Log-spaced ranks keep the head of a long-tailed distribution in full
+    # detail and thin out the tail, which is mostly repeated values
+    if len(sorted_counts) <= points:
+        ranks = np.arange(len(sorted_counts))
+    else:
+        ranks = np.geomspace(1, len(sorted_counts), points).astype(np.int64)
+        ranks = np.unique(ranks) - 1
+    return ranks + 1, sorted_counts[ranks]
+
+def _draw_counts(figure, ranks, counts, xlabel, ylabel):
+
+    ax = figure.subplots()
+    ax.plot(ranks, counts)
+    ax.set_xscale('log')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+
+def _draw_breakdown(figure, batches, title):
+
+    figure.set_size_inches(10, 8)
+    ax = figure.subplots()
+    ax.pie(batches, autopct='%1.1f%%')
+    ax.set_title(title)
+
+def _draw_sparsity(figure, histogram, shape):
+
+    figure.set_size_inches(10, 10)
+    ax = figure.subplots()
+    ax.imshow(np.log1p(histogram), aspect='auto', cmap='Greys', interpolation='nearest',
+              extent=(0, shape[1], shape[0], 0))
+    ax.set_xlabel("Product")
+    ax.set_ylabel("Order")
+    ax.set_title("Purchases per {} x {} block (log scale)".format(*histogram.shape))
+
+def _bin_nonzeros(histogram, matrix, num_rows, row_bins, col_bins, rows=None,
+                  block_size=65536):
+
+    # Expand the row of each nonzero one block of rows at a time, so memory
+    # stays bounded by the largest block rather than the whole matrix. Only
+    # the rows in the boolean mask `rows` are counted, if it is given.
+    row_lengths = np.diff(matrix.indptr)
+    for start in range(0, matrix.shape[0], block_size):
+        stop = min(start + block_size, matrix.shape[0])
+        block_rows = np.repeat(np.arange(start, stop, dtype=np.int64),
+                               row_lengths[start:stop])
+        cols = matrix.indices[matrix.indptr[start]:matrix.indptr[stop]].astype(np.int64)
+        cells = (block_rows * row_bins // num_rows * col_bins +
+                 cols * col_bins // matrix.shape[1])
+        weights = None if rows is None else rows[block_rows]
+        histogram += np.bincount(cells, weights=weights,
+                                 minlength=len(histogram)).astype(np.int64)
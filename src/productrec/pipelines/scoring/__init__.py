@@ -1 +1 @@
-from .nodes import score_confusion
\ No newline at end of file
+from .nodes import score_confusion, score_neighbors
\ No newline at end of file
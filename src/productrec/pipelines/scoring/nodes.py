@@ -3,20 +3,29 @@ from typing import Any, Dict, List
 import pandas as pd
 import numpy as np
 import implicit
-import random
 import scipy
 from sklearn import metrics
 import logging
 from scipy.sparse import coo_matrix, csr_matrix
-import wandb
+from productrec import tracking
 import time
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from productrec.models import (FoldIn, ItemIndex, dequantize_factors, order_seeds,
+                               quantize_factors, splitmix64)
+
+RANKING_METRICS = ["precision", "recall", "ndcg", "map", "auc"]
 
 def score_confusion(
                 product_train: scipy.sparse.csr_matrix, 
                 product_test: scipy.sparse.csr_matrix, 
+                test_heldout: scipy.sparse.csr_matrix,
                 user_vecs: List, 
                 item_vecs: List, 
-                params: Dict) -> Dict:
+                params: Dict,
+                item_index: ItemIndex = None) -> Dict:
 
     log = logging.getLogger(__name__)
 
@@ -28,61 +37,135 @@ def score_confusion(
     log.info(params)
     log.info("Size of product_train: {}".format(product_train.shape))
     log.info("Size of product_test: {}".format(product_test.shape))
+    log.info("Held out test products: {}".format(test_heldout.nnz))
     log.info("Size of user_vecs: {}".format(len(user_vecs)))
     log.info("Size of item_vecs: {}".format(len(item_vecs)))
 
+    # The loop's model must have the dtype of the factors, e.g. precision float64
     model = implicit.als.AlternatingLeastSquares(factors=factors,
                                         regularization=regularization,
-                                        iterations=iterations, use_gpu=False)
+                                        iterations=iterations, use_gpu=False,
+                                        dtype=np.asarray(item_vecs).dtype)
 
 
     model.user_factors = user_vecs
     model.item_factors = item_vecs
 
+    score_mode = params.get("score_mode", "batched")
+    log.info("Scoring test orders in {} mode".format(score_mode))
+
+    ranking = _ranking_params(params)
+
+    # The loop only counts the confusion of the model's own top k
+    if score_mode == "loop" and (ranking["metrics"] or item_index is not None):
+        log.warning("score_mode loop only computes the confusion counts, "
+                    "ranking_metrics and the item index are ignored")
+
+    # With an item index the top k come from it, as they would when serving
+    if item_index is not None and score_mode != "loop":
+        log.info("Ranking test orders with the item index")
+
+    def score_items(item_factors, index=None):
+        if score_mode == "loop":
+            return score_model(model, product_test, test_heldout)
+        elif score_mode == "batched":
+            return score_model_batched(item_factors, product_test, test_heldout,
+                                       regularization, seed=seed,
+                                       batch_size=params.get("score_batch_size", 1024),
+                                       index=index, **ranking)
+        elif score_mode == "parallel":
+            return score_model_parallel(item_factors, product_test, test_heldout,
+                                        regularization, seed=seed,
+                                        batch_size=params.get("score_batch_size", 1024),
+                                        workers=params.get("score_workers"),
+                                        index=index, **ranking)
+        raise ValueError("Unknown score_mode: {}".format(score_mode))
+
     start = time.perf_counter()
-    score = score_model(model, product_test, test_size=0.1, seed=seed)
+    score = score_items(item_vecs, item_index)
     duration = time.perf_counter() - start
 
+    # How much quality each storage format of the item factors gives up against
+    # full precision: the trained factors upcast to float64 are the reference,
+    # and every format is ranked exactly, so only the factors differ
+    if score_mode != "loop" and params.get("serving_precision_compare", False):
+        reference = score_items(np.asarray(item_vecs, dtype=np.float64))
+        trained = params.get("precision", "float32")
+        formats = [trained] + [precision for precision in
+                               params.get("serving_precisions", [])
+                               if precision != trained]
+
+        score["serving_precision_delta"] = {}
+        for precision in formats:
+            quantized = quantize_factors(item_vecs, precision)
+            if "scales" in quantized:
+                factors = dequantize_factors(quantized["factors"], quantized["scales"])
+            else:
+                factors = quantized["factors"]
+            reduced = score_items(factors)
+            delta = {metric: reduced[metric] - value
+                     for metric, value in reference.items() if metric in reduced}
+            log.info("Score delta for {} item factors: {}".format(precision, delta))
+            score["serving_precision_delta"][precision] = delta
+
     log.info("Score: {}".format(score))
-    wandb.log(score)
-    wandb.log({"score_time": duration})
+    tracking.log(score)
+    tracking.log({"score_time": duration})
 
     return score
-    
-def score_model(model, test_orders, test_size=0.1, seed=42):
 
-    skipped = 0
+def score_neighbors(product_train: scipy.sparse.csr_matrix,
+                    product_test: scipy.sparse.csr_matrix,
+                    test_heldout: scipy.sparse.csr_matrix,
+                    item_neighbors: scipy.sparse.csr_matrix,
+                    params: Dict) -> Dict:
+
+    log = logging.getLogger(__name__)
+
+    log.info("Size of product_test: {}".format(product_test.shape))
+    log.info("Held out test products: {}".format(test_heldout.nnz))
+    log.info("Item neighbors: {}".format(item_neighbors.nnz))
+
+    # The loop mode needs factors, so everything but parallel scores batched
+    parallel = params.get("score_mode") == "parallel"
+    workers = params.get("score_workers") if parallel else 1
+
+    start = time.perf_counter()
+    score = score_neighbors_batched(item_neighbors, product_test, test_heldout,
+                                    seed=params['seed'],
+                                    batch_size=params.get("score_batch_size", 1024),
+                                    workers=workers, **_ranking_params(params))
+    duration = time.perf_counter() - start
+
+    log.info("Score: {}".format(score))
+    tracking.log(score)
+    tracking.log({"score_time": duration})
+
+    return score
     
+def score_model(model, test_orders, test_heldout):
+
     tplist = []
     tnlist = []
     fplist = []
     fnlist = []
 
-    random.seed(seed) 
+    orders, observed, order_ids = _scored_orders(test_orders, test_heldout)
 
-    for row in test_orders:
+    for row in range(orders.shape[0]):
 
         TP = FP = FN = TN = 0
 
         # Get the list of nonzero products
-        nonzero = row.nonzero()[1]
+        nonzero = orders[row].indices
         order_size = len(nonzero)
-        
-        # Need to skip if there aren't multiple products
-        if order_size < 2:
-            skipped+=1
-            continue
-
-        temp = row.copy()
-        if test_size > 0:
-            mask_count = max(1, int(order_size * test_size))
-            mask_list = random.sample(list(nonzero), mask_count)
-            temp[np.zeros(mask_count), mask_list] = 0
-            temp.eliminate_zeros()
 
+        # Fold in the products that were not held out
+        basket = observed[row]
         new_id = model.user_factors.shape[0]
-        model.partial_fit_users([new_id], temp.astype('double'))
-        recs, prob = model.recommend(new_id, temp, N=order_size, filter_already_liked_items=False)
+        model.partial_fit_users([new_id], basket.astype('double'))
+        recs, prob = model.recommend(new_id, basket, N=order_size,
+                                     filter_already_liked_items=False)
         for rec in recs:
             if rec in nonzero:
                 TP+=1
@@ -100,8 +183,6 @@ def score_model(model, test_orders, test_size=0.1, seed=42):
         fplist.append(FP)
         fnlist.append(FN)
         
-    count = test_orders.shape[0] - skipped
-    
     true_positive = np.mean(tplist)
     false_positive = np.mean(fplist)
     false_negative = np.mean(fnlist)
@@ -117,4 +198,318 @@ def score_model(model, test_orders, test_size=0.1, seed=42):
         'true_negative':true_negative,
         'sensitivity':sensitivity,
         'specificity':specificity
-    }
\ No newline at end of file
+    }
+
+def score_model_batched(item_factors, test_orders, test_heldout, regularization,
+                        seed=42, batch_size=1024, metrics=(), k_values=(),
+                        negatives=100, index=None):
+    """Vectorized equivalent of ``score_model``.
+
+    Folds the observed part of every test order in with a single solve and
+    ranks the orders block by block against their held out products, which
+    gives the same confusion counts as the loop. Any requested ranking
+    ``metrics`` are computed from the same ranking, which comes from
+    ``index`` when an ``ItemIndex`` is given.
+    """
+
+    test_orders, observed, order_ids = _scored_orders(test_orders, test_heldout)
+
+    fold_in = FoldIn(item_factors, regularization)
+    user_factors = fold_in.solve(observed)
+
+    totals = Counter()
+    for start in range(0, test_orders.shape[0], batch_size):
+        end = min(start + batch_size, test_orders.shape[0])
+        totals.update(evaluate_block(user_factors[start:end], fold_in.item_factors,
+                                     test_orders[start:end], observed[start:end],
+                                     order_ids[start:end], seed=seed,
+                                     metrics=metrics, k_values=k_values,
+                                     negatives=negatives, index=index))
+
+    return _summarize(totals, test_orders.shape[0], metrics, k_values)
+
+def score_model_parallel(item_factors, test_orders, test_heldout, regularization,
+                         seed=42, batch_size=1024, workers=None, metrics=(),
+                         k_values=(), negatives=100, index=None):
+    """Sharded version of ``score_model_batched``.
+
+    Each ``batch_size`` block is folded in and ranked by one thread. The AUC
+    negatives are hashed from the order rows, so the result does not depend
+    on ``workers``.
+    """
+
+    test_orders, observed, order_ids = _scored_orders(test_orders, test_heldout)
+
+    fold_in = FoldIn(item_factors, regularization)
+
+    def score_block(start):
+        end = min(start + batch_size, test_orders.shape[0])
+        block = observed[start:end]
+        user_factors = fold_in.solve(block)
+
+        return evaluate_block(user_factors, fold_in.item_factors,
+                              test_orders[start:end], block,
+                              order_ids[start:end], seed=seed, metrics=metrics,
+                              k_values=k_values, negatives=negatives, index=index)
+
+    workers = workers or os.cpu_count()
+    totals = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for block_totals in executor.map(score_block,
+                                         range(0, test_orders.shape[0], batch_size)):
+            totals.update(block_totals)
+
+    return _summarize(totals, test_orders.shape[0], metrics, k_values)
+
+def score_neighbors_batched(item_neighbors, test_orders, test_heldout, seed=42,
+                            batch_size=1024, workers=None, metrics=(), k_values=(),
+                            negatives=100):
+    """``score_model_batched`` for an item-item model.
+
+    The score of an item for an order is the sum of its similarity to the
+    observed products of the order, so a block of orders is scored with one
+    sparse product against the (items x items) ``item_neighbors`` matrix.
+    """
+
+    test_orders, observed, order_ids = _scored_orders(test_orders, test_heldout)
+    item_neighbors = csr_matrix(item_neighbors)
+
+    def score_block(start):
+        end = min(start + batch_size, test_orders.shape[0])
+        block = observed[start:end]
+        scores = block.dot(item_neighbors).toarray()
+
+        return evaluate_scores(scores, test_orders[start:end], block,
+                               order_ids[start:end], seed=seed, metrics=metrics,
+                               k_values=k_values, negatives=negatives)
+
+    workers = workers or os.cpu_count()
+    totals = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for block_totals in executor.map(score_block,
+                                         range(0, test_orders.shape[0], batch_size)):
+            totals.update(block_totals)
+
+    return _summarize(totals, test_orders.shape[0], metrics, k_values)
+
+def evaluate_block(user_factors, item_factors, orders, observed, order_ids, seed=42,
+                   metrics=(), k_values=(), negatives=100, index=None):
+    """Rank all items for a block of orders once and score that ranking.
+
+    ``orders`` holds the full test baskets and ``observed`` the part that was
+    folded in. The confusion counts follow ``score_model``: the top
+    ``order_size`` items, unfiltered, against the whole basket. The ranking
+    metrics skip the observed items and look for the held out ones. Returns
+    per-metric sums over the block.
+
+    With an ``ItemIndex`` the ranking comes from its approximate search
+    instead of scoring every item; the AUC still scores its sampled items
+    exactly.
+    """
+
+    if index is None:
+        return evaluate_scores(user_factors.dot(item_factors.T), orders, observed,
+                               order_ids, seed=seed, metrics=metrics,
+                               k_values=k_values, negatives=negatives)
+
+    top, _ = index.search(user_factors, N=_depth(orders, observed, metrics, k_values,
+                                                 index.num_items))
+
+    def pair_scores(rows, items):
+        return np.einsum("rf,rnf->rn", user_factors[rows], item_factors[items])
+
+    return _evaluate_ranking(top, pair_scores, index.num_items, orders, observed,
+                             order_ids, seed, metrics, k_values, negatives)
+
+def evaluate_scores(scores, orders, observed, order_ids, seed=42, metrics=(),
+                    k_values=(), negatives=100):
+    """``evaluate_block`` for a dense (orders x items) block of any model's scores."""
+
+    num_items = scores.shape[1]
+    top_n = _depth(orders, observed, metrics, k_values, num_items)
+
+    top = np.argpartition(-scores, top_n - 1, axis=1)[:, :top_n]
+    ranking = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1,
+                         kind="stable")
+    top = np.take_along_axis(top, ranking, axis=1)
+
+    def pair_scores(rows, items):
+        return scores[rows[:, None], items]
+
+    return _evaluate_ranking(top, pair_scores, num_items, orders, observed, order_ids,
+                             seed, metrics, k_values, negatives)
+
+def _depth(orders, observed, metrics, k_values, num_items):
+
+    # Deep enough for the confusion counts and for max(k) unobserved items
+    depth = np.diff(orders.indptr)
+    if [metric for metric in metrics if metric != "auc"] and k_values:
+        depth = np.maximum(depth, max(k_values) + np.diff(observed.indptr))
+    return min(int(depth.max()), num_items)
+
+def _evaluate_ranking(top, pair_scores, num_items, orders, observed, order_ids, seed,
+                      metrics, k_values, negatives):
+
+    # top holds the ranked item ids of every order, padded with -1 by an
+    # approximate search, and pair_scores(rows, items) the scores of
+    # items[i, j] for order rows[i]
+    top_n = top.shape[1]
+    order_sizes = np.diff(orders.indptr)
+    observed_sizes = np.diff(observed.indptr)
+    heldout_sizes = order_sizes - observed_sizes
+    ranked_metrics = [metric for metric in metrics if metric != "auc"]
+    positions = np.arange(top_n)[None, :]
+    found = top >= 0
+
+    in_order = _contains(orders, top) & found
+    recommended = np.minimum(order_sizes, num_items)
+    hits = (in_order & (positions < recommended[:, None])).sum(axis=1)
+
+    totals = dict(zip(["true_positive", "false_positive", "false_negative",
+                       "true_negative"],
+                      _confusion_counts(hits, recommended, orders, num_items)))
+
+    evaluated = heldout_sizes > 0
+    totals["evaluated"] = int(evaluated.sum())
+
+    if ranked_metrics and k_values:
+        in_observed = _contains(observed, top) & found
+        relevant = in_order & ~in_observed & evaluated[:, None]
+        # Position of each item once the observed items are dropped
+        rank = np.maximum(positions - np.cumsum(in_observed, axis=1), 0)
+        discounts = 1 / np.log2(np.arange(top_n + 1) + 2)
+        ideal = np.concatenate([[1], np.cumsum(discounts)])
+        heldout = np.maximum(heldout_sizes, 1)
+
+        for k in k_values:
+            hit_k = relevant & (rank < k)
+            num_hits = hit_k.sum(axis=1)
+
+            if "precision" in metrics:
+                totals["precision@{}".format(k)] = (num_hits / k).sum()
+            if "recall" in metrics:
+                totals["recall@{}".format(k)] = (num_hits / heldout).sum()
+            if "ndcg" in metrics:
+                gains = (hit_k * discounts[rank]).sum(axis=1)
+                ideal_gains = ideal[np.minimum(heldout, min(k, top_n))]
+                totals["ndcg@{}".format(k)] = (gains / ideal_gains).sum()
+            if "map" in metrics:
+                precision = np.cumsum(hit_k, axis=1) / (rank + 1)
+                average = (hit_k * precision).sum(axis=1) / np.minimum(heldout, k)
+                totals["map@{}".format(k)] = average.sum()
+
+    if "auc" in metrics and negatives > 0:
+        totals.update(_sampled_auc(pair_scores, num_items, orders, observed,
+                                   order_ids, seed, negatives))
+
+    return totals
+
+def _sampled_auc(pair_scores, num_items, orders, observed, order_ids, seed, negatives):
+
+    # Compare every held out item with the same `negatives` random items that
+    # are not in the order. The sample is hashed from the order id, so it is
+    # the same however the orders are batched.
+    heldout = csr_matrix(orders - observed)
+    heldout.eliminate_zeros()
+    heldout_rows = np.repeat(np.arange(orders.shape[0]), np.diff(heldout.indptr))
+
+    stream = order_seeds(order_ids, seed) ^ np.uint64(0xD1B54A32D192ED03)
+    sampled = splitmix64(stream[:, None] + np.arange(negatives, dtype=np.uint64))
+    sampled = (sampled % np.uint64(num_items)).astype(np.int64)
+    valid = ~_contains(orders, sampled)
+
+    negative_scores = pair_scores(np.arange(orders.shape[0]), sampled)[heldout_rows]
+    positive_scores = pair_scores(heldout_rows, heldout.indices[:, None])
+    valid = valid[heldout_rows]
+
+    wins = ((positive_scores > negative_scores) & valid).sum(axis=1)
+    ties = ((positive_scores == negative_scores) & valid).sum(axis=1)
+    auc = (wins + 0.5 * ties) / np.maximum(valid.sum(axis=1), 1)
+
+    per_order = np.bincount(heldout_rows, weights=auc, minlength=orders.shape[0])
+    counts = np.bincount(heldout_rows, minlength=orders.shape[0])
+    scored = counts > 0
+    return {"auc": (per_order[scored] / counts[scored]).sum(),
+            "auc_evaluated": int(scored.sum())}
+
+def _contains(matrix, items):
+
+    # For each row i, whether items[i, j] is stored in row i of the matrix.
+    # Uses a sorted search over (row, item) keys rather than Python lookups.
+    num_items = matrix.shape[1]
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    keys = np.sort(rows.astype(np.int64) * num_items + matrix.indices)
+    if len(keys) == 0:
+        return np.zeros(items.shape, dtype=bool)
+
+    queries = np.arange(matrix.shape[0], dtype=np.int64)[:, None] * num_items + items
+    position = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+    return keys[position] == queries
+
+def _ranking_params(params):
+
+    return {
+        "metrics": params.get("ranking_metrics", RANKING_METRICS),
+        "k_values": params.get("ranking_k", [5, 10, 20]),
+        "negatives": params.get("auc_negatives", 100),
+    }
+
+def _summarize(totals, count, metrics, k_values):
+
+    counts = np.array([totals["true_positive"], totals["false_positive"],
+                       totals["false_negative"], totals["true_negative"]])
+    score = _confusion_scores(counts, count)
+
+    evaluated = max(totals["evaluated"], 1)
+    for metric in ["precision", "recall", "ndcg", "map"]:
+        if metric in metrics:
+            for k in k_values:
+                name = "{}@{}".format(metric, k)
+                score[name] = totals[name] / evaluated
+    if "auc" in metrics:
+        score["auc"] = totals["auc"] / max(totals["auc_evaluated"], 1)
+
+    return score
+
+def _scored_orders(test_orders, test_heldout):
+
+    # Only orders with held out products are scored. Returns the full orders,
+    # their observed part and their rows, which are the order codes.
+    observed = csr_matrix(test_orders, copy=True)
+    observed.eliminate_zeros()
+    heldout = csr_matrix(test_heldout, copy=True)
+    heldout.eliminate_zeros()
+    order_ids = np.flatnonzero((np.diff(heldout.indptr) > 0) &
+                               (np.diff(observed.indptr) > 0))
+    observed = observed[order_ids]
+    orders = observed + heldout[order_ids]
+    orders.sort_indices()
+    return orders, observed, order_ids
+
+def _confusion_counts(hits, recommended, orders, num_items):
+
+    order_sizes = np.diff(orders.indptr)
+
+    true_positive = hits
+    false_positive = recommended - hits
+    false_negative = order_sizes - hits
+    true_negative = num_items - true_positive - false_positive - false_negative
+
+    return np.array([true_positive.sum(), false_positive.sum(),
+                     false_negative.sum(), true_negative.sum()], dtype=np.int64)
+
+def _confusion_scores(counts, count):
+
+    true_positive, false_positive, false_negative, true_negative = counts / count
+
+    sensitivity = true_positive / (true_positive + false_negative)
+    specificity = true_negative / (true_negative + false_positive)
+
+    return {
+        'true_positive':true_positive,
+        'false_positive':false_positive,
+        'false_negative':false_negative,
+        'true_negative':true_negative,
+        'sensitivity':sensitivity,
+        'specificity':specificity
+    }
@@ -1 +1 @@
-from .nodes import split_data
\ No newline at end of file
+from .nodes import split_data, holdout_products, select_rows
\ No newline at end of file
@@ -2,43 +2,153 @@ from typing import Any, Dict, List
 
 import pandas as pd
 import numpy as np
-import random
-from matplotlib import pyplot as plt
-import implicit
-import scipy
-from sklearn import metrics
-from sklearn.model_selection import train_test_split
-from pandas.api.types import CategoricalDtype
+from scipy.sparse import csr_matrix
 import logging
-import wandb
 
-def split_data(transactions: pd.DataFrame, params: Dict) -> Any:
+from productrec.models import IdVocabulary, interaction_matrix, order_seeds, splitmix64
+
+SPLIT_STRATEGIES = ["random", "leave_k_out", "temporal", "customer"]
+
+def split_data(transactions: pd.DataFrame, id_vocabulary: IdVocabulary,
+               params: Dict) -> Any:
 
     log = logging.getLogger(__name__)
 
     seed = params.get("seed", 42)
     test_size = params.get("test_size", 0.2)
+    strategy = params.get("split_strategy", "random")
+
+    log.info("Splitting data with the {} strategy, a seed of {} and test_size of {}"
+             .format(strategy, seed, test_size))
+
+    # Rows are order codes and columns product codes from the shared vocabulary
+    rows = id_vocabulary.encode("order_id", transactions.order_id)
+    cols = id_vocabulary.encode("product_id", transactions.product_id)
+    quantity = transactions.quantity.to_numpy() # All of our purchases
+
+    # Binary preferences by default, or the summed / largest quantity per pair
+    shape = (id_vocabulary.size("order_id"), id_vocabulary.size("product_id"))
+    duplicates = params.get("duplicate_policy", "binary")
+    purchases_sparse = interaction_matrix(rows, cols, shape, values=quantity,
+                                          duplicates=duplicates)
+    log.info("Purchase matrix shape: {}, nonzeros: {}".format(
+        purchases_sparse.shape, purchases_sparse.nnz))
+
+    # Every output keeps the full shape, so row i is always order code i and
+    # the trained user factors line up with the vocabulary
+    order_sizes = np.diff(purchases_sparse.indptr)
+    if strategy == "leave_k_out":
+        # Every order with more than k products trains on the rest of them
+        holdout_k = params.get("holdout_k", 1)
+        mask_counts = np.where(order_sizes > holdout_k, holdout_k, 0)
+        observed, heldout = holdout_products(purchases_sparse, mask_counts, seed)
+        train = observed
+    else:
+        test_orders = _test_orders(strategy, transactions, id_vocabulary, rows,
+                                   test_size, seed, params)
+
+        # A single product order has nothing left to observe once a product is
+        # held out, so it goes back to train. The customer split drops it
+        # instead, since that would put a test customer into train.
+        single = test_orders & (order_sizes == 1)
+        if strategy == "customer":
+            log.info("Dropping {} single product orders of test customers".format(
+                int(single.sum())))
+        else:
+            test_orders &= order_sizes >= 2
+            log.info("Moved {} single product test orders to train".format(
+                int(single.sum())))
+
+        holdout_fraction = params.get("holdout_fraction", 0.1)
+        mask_counts = np.maximum(1, (order_sizes * holdout_fraction).astype(np.int64))
+        mask_counts[~test_orders | (order_sizes < 2)] = 0
+        observed, heldout = holdout_products(purchases_sparse, mask_counts, seed)
+        train = select_rows(purchases_sparse, ~test_orders)
+
+    test = select_rows(observed, mask_counts > 0)
+
+    log.info("Train orders: {}, test orders: {}, held out products: {}".format(
+        int((np.diff(train.indptr) > 0).sum()), int((mask_counts > 0).sum()),
+        heldout.nnz))
+
+    return [train, test, heldout]
+
+def holdout_products(orders: csr_matrix, mask_counts: np.ndarray,
+                     seed: int = 42) -> List[csr_matrix]:
+    """Splits ``orders`` into observed and held out products.
+
+    Row i loses ``mask_counts[i]`` of its products. Every product gets a key
+    hashed from (seed, order, position) and the lowest keys of each row are
+    held out, so the masks are reproducible and the same for any subset of rows.
+    """
+
+    order_sizes = np.diff(orders.indptr)
+    row_ids = np.repeat(np.arange(orders.shape[0]), order_sizes)
+    positions = np.arange(orders.nnz) - orders.indptr[row_ids]
+
+    keys = splitmix64(order_seeds(row_ids, seed) + positions.astype(np.uint64))
+
+    # Rank of every product within its row by key
+    ranked = np.lexsort((keys, row_ids))
+    rank = np.empty(orders.nnz, dtype=np.int64)
+    rank[ranked] = positions
+
+    held = rank < np.asarray(mask_counts)[row_ids]
+    return [_keep_entries(orders, ~held), _keep_entries(orders, held)]
+
+def select_rows(matrix: csr_matrix, rows: np.ndarray) -> csr_matrix:
+    """Copy of ``matrix`` with the rows outside the boolean mask ``rows`` emptied."""
+
+    row_lengths = np.diff(matrix.indptr) * rows
+    keep = np.repeat(rows, np.diff(matrix.indptr))
+    indptr = np.concatenate([[0], np.cumsum(row_lengths)]).astype(matrix.indptr.dtype)
+    return csr_matrix((matrix.data[keep], matrix.indices[keep], indptr),
+                      shape=matrix.shape)
+
+def _keep_entries(matrix, keep):
+
+    row_ids = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    row_lengths = np.bincount(row_ids[keep], minlength=matrix.shape[0])
+    indptr = np.concatenate([[0], np.cumsum(row_lengths)]).astype(matrix.indptr.dtype)
+    return csr_matrix((matrix.data[keep], matrix.indices[keep], indptr),
+                      shape=matrix.shape)
+
+def _test_orders(strategy, transactions, id_vocabulary, rows, test_size, seed, params):
+
+    num_orders = id_vocabulary.size("order_id")
+    rng = np.random.default_rng(seed)
+    test_orders = np.zeros(num_orders, dtype=bool)
+
+    if strategy == "random":
+        test_count = int(round(num_orders * test_size))
+        test_orders[rng.choice(num_orders, test_count, replace=False)] = True
+
+    elif strategy == "temporal":
+        # The latest test_size fraction of the orders, by their first timestamp
+        column = params.get("timestamp_column", "timestamp")
+        if column not in transactions:
+            raise ValueError("The temporal split needs a {} column in the transactions"
+                             .format(column))
+        order_times = pd.Series(pd.to_datetime(transactions[column]).to_numpy()) \
+            .groupby(rows).min() \
+            .reindex(np.arange(num_orders))
+        by_time = np.argsort(order_times.to_numpy(), kind="stable")
+        test_orders[by_time[num_orders - int(round(num_orders * test_size)):]] = True
+
+    elif strategy == "customer":
+        # All orders of a random test_size fraction of the customers
+        if "customer_id" not in id_vocabulary.ids:
+            raise ValueError("The customer split needs a customer_id column in the "
+                             "transactions")
+        customers = id_vocabulary.encode("customer_id", transactions.customer_id)
+        num_customers = id_vocabulary.size("customer_id")
+        test_customers = np.zeros(num_customers, dtype=bool)
+        test_count = int(round(num_customers * test_size))
+        test_customers[rng.choice(num_customers, test_count, replace=False)] = True
+        known = customers >= 0
+        test_orders[rows[known][test_customers[customers[known]]]] = True
+
+    else:
+        raise ValueError("Unknown split_strategy: {}".format(strategy))
 
-    log.info("Splitting data based on a seed of {} and test_size of {}".format(seed, test_size))
-
-    transaction_list = list(np.sort(transactions.order_id.unique())) # Get our unique customers
-    item_list = list(transactions.product_id.unique()) # Get our unique products that were purchased
-    quantity_list = list(transactions.quantity) # All of our purchases
-
-    rows = transactions.order_id.astype(CategoricalDtype(categories=transaction_list, ordered=True)).cat.codes 
-    # Get the associated row indices
-    cols = transactions.product_id.astype(CategoricalDtype(categories=item_list, ordered=True)).cat.codes 
-    # Get the associated column indices
-    purchases_sparse = scipy.sparse.csr_matrix((quantity_list, (rows, cols)), shape=(len(transaction_list), len(item_list)))
-    log.info('Original purchases matrix shape: {}'.format(purchases_sparse.shape))
-    purchases_sparse[purchases_sparse != 0] = 1 # Store the test set as a binary preference matrix
-    purchases_sparse.sum_duplicates()
-    log.info("Purchase matrix shape after summing duplicates: {}".format(purchases_sparse.shape))
-
-    plt.figure(figsize=(10, 10))
-    plt.spy(purchases_sparse, markersize=1, aspect='auto')
-    wandb.log({"Sparcity Plot": plt})
-    
-    train, test = train_test_split(purchases_sparse, test_size=test_size, random_state=seed) # Split the data into training and test sets
-
-    return [train, test]
\ No newline at end of file
+    return test_orders
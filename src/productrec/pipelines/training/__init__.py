@@ -1 +1 @@
-from .nodes import train_implicit
\ No newline at end of file
+from .nodes import build_model, train_implicit, train_implicit_warm, export_model
\ No newline at end of file
@@ -9,35 +9,394 @@ import scipy
 from sklearn import metrics
 from pandas.api.types import CategoricalDtype
 import time
-import wandb
+import logging
+from collections import Counter
+from productrec import tracking
 
-def train_implicit(product_train: scipy.sparse.csr_matrix, params: Dict) -> Any:
+from productrec.models import FoldIn, IdVocabulary, OutOfCoreALS, quantize_factors
+from productrec.pipelines.scoring.nodes import (RANKING_METRICS, evaluate_block,
+                                                score_model_batched)
+from productrec.pipelines.splitting import holdout_products
+
+def build_model(params: Dict, num_threads: int = 0,
+                use_gpu: bool = implicit.gpu.HAS_CUDA
+                ) -> implicit.als.AlternatingLeastSquares:
 
-    alpha = params['alpha']    
     factors = params['factors']
     regularization = params['regularization']
     iterations = params['iterations']
     seed = params.get("seed", 42)
+    precision = params.get("precision", "float32")
 
-    model = implicit.als.AlternatingLeastSquares(factors=factors,
+    return implicit.als.AlternatingLeastSquares(factors=factors,
                                         regularization=regularization,
                                         iterations=iterations, 
+                                        dtype=np.dtype(precision),
+                                        num_threads=num_threads,
+                                        use_gpu=use_gpu,
                                         random_state=seed )
 
+def train_implicit(product_train: scipy.sparse.csr_matrix, params: Dict) -> Any:
+
+    alpha = params['alpha']
+    precision = params.get("precision", "float32")
+
+    if params.get("out_of_core", False):
+        return _train_out_of_core(product_train, params)
+
+    model = build_model(params)
+
+    # implicit solves in the dtype of the factors, so there is no point in
+    # handing it a double matrix when training in single precision
+    weighted_train = (product_train * alpha).astype(precision)
+
+    # With early stopping, one product of a sample of training orders is held
+    # out and `iterations` becomes an upper bound
+    fit_train = weighted_train
+    early_stopping = None
+    if params.get("early_stopping", False):
+        fit_train, early_stopping = _early_stopping(model, weighted_train, params)
 
     start = time.perf_counter()
-    model.fit((product_train * alpha).astype('double'), show_progress=False)
+    try:
+        model.fit(fit_train, show_progress=False, callback=early_stopping)
+    except StopTraining:
+        pass
     duration = time.perf_counter() - start
 
-    wandb.log({"train_time": duration})
-    
+    tracking.log({"train_time": duration})
+
     if implicit.gpu.HAS_CUDA:
         model = model.to_cpu()
-        wandb.log({"gpu": True})
+        tracking.log({"gpu": True})
     else:
-        wandb.log({"gpu": False})
-    
+        tracking.log({"gpu": False})
+
+    training_curve = {"checkpoints": []}
+    if early_stopping is not None:
+        early_stopping.restore_best(model)
+        training_curve = early_stopping.curve()
+        logging.getLogger(__name__).info(
+            "Stopped after {} iterations, best {} of {} at iteration {}".format(
+                training_curve["stopped_iteration"], training_curve["metric"],
+                training_curve["best_value"], training_curve["best_iteration"]))
+        tracking.log({"best_iteration": training_curve["best_iteration"]})
+
+    user_vecs = model.user_factors.astype(precision, copy=False)
+    item_vecs = model.item_factors.astype(precision, copy=False)
+
+    # Test orders have empty rows in the training matrix, so their factors are
+    # just the random initialization. Zero them rather than export noise.
+    user_vecs[np.diff(product_train.indptr) == 0] = 0
+
+    return [user_vecs, item_vecs, weighted_train, training_curve]
+
+def _train_out_of_core(product_train, params):
+
+    log = logging.getLogger(__name__)
+
+    # The weighted matrix, its transpose and the factors are memory mapped
+    # files, and the half steps run in blocks sized to the memory budget.
+    # product_train is memory mapped too and only read one block at a time,
+    # and the factors are saved from their pages by MemmapArrayDataSet.
+    model = OutOfCoreALS(factors=params['factors'],
+                         regularization=params['regularization'],
+                         iterations=params['iterations'],
+                         directory=params.get("out_of_core_dir",
+                                              "data/06_models/out_of_core"),
+                         memory_budget_mb=params.get("out_of_core_memory_mb", 1024),
+                         workers=params.get("out_of_core_workers"),
+                         dtype=np.dtype(params.get("precision", "float32")),
+                         seed=params.get("seed", 42))
+    if params.get("early_stopping", False):
+        log.warning("Early stopping keeps copies of the factors in memory, "
+                    "ignoring it out of core")
+
+    start = time.perf_counter()
+    model.fit(product_train, alpha=params['alpha'])
+    duration = time.perf_counter() - start
+
+    log.info("Trained out of core in {:.1f}s within {} MB on {} workers".format(
+        duration, params.get("out_of_core_memory_mb", 1024), model.workers))
+    tracking.log({"train_time": duration, "gpu": False, "out_of_core": True})
+
+    user_vecs = model.user_factors
+    user_vecs[np.diff(product_train.indptr) == 0] = 0
+    user_vecs.flush()
+
+    return [user_vecs, model.item_factors, model.user_items, {"checkpoints": []}]
+
+class StopTraining(Exception):
+    """Raised by the fit callback to end ALS training early."""
+
+class EarlyStopping:
+    """``fit`` callback that stops ALS once a validation metric stops improving.
+
+    Every ``every`` iterations the trained factors of the validation orders
+    rank all items, and ``metric`` (e.g. ``ndcg@10``) is measured on their
+    held out products. After ``patience`` checkpoints without an improvement
+    of more than ``min_delta`` it raises ``StopTraining``. The factors of the
+    best checkpoint are kept so ``restore_best`` can put them back.
+    """
+
+    def __init__(self, model, orders, observed, rows, metric="ndcg@10", every=5,
+                 patience=3, min_delta=0.0, seed=42, batch_size=1024):
+        self.model = model
+        self.orders = orders
+        self.observed = observed
+        self.rows = rows
+        self.metric = metric
+        self.every = every
+        self.patience = patience
+        self.min_delta = min_delta
+        self.seed = seed
+        self.batch_size = batch_size
+
+        self.checkpoints = []
+        self.best_value = -np.inf
+        self.best_iteration = 0
+        self.best_factors = None
+        self.waiting = 0
+        self.start = time.perf_counter()
+
+    def __call__(self, iteration, elapsed, loss):
+        iteration += 1
+        if iteration % self.every:
+            return
+
+        evaluation_start = time.perf_counter()
+        user_factors = _to_numpy(self.model.user_factors)
+        item_factors = _to_numpy(self.model.item_factors)
+        value = self.evaluate(user_factors[self.rows], item_factors)
+        self.checkpoints.append({
+            "iteration": iteration,
+            "seconds": evaluation_start - self.start,
+            "evaluation_seconds": time.perf_counter() - evaluation_start,
+            "value": value,
+        })
+
+        if value > self.best_value + self.min_delta:
+            self.best_value = value
+            self.best_iteration = iteration
+            self.best_factors = (user_factors.copy(), item_factors.copy())
+            self.waiting = 0
+        else:
+            self.waiting += 1
+            if self.waiting >= self.patience:
+                raise StopTraining()
+
+    def evaluate(self, user_factors, item_factors):
+        name, _, k = self.metric.partition("@")
+        totals = Counter()
+        for start in range(0, len(self.rows), self.batch_size):
+            end = min(start + self.batch_size, len(self.rows))
+            totals.update(evaluate_block(
+                user_factors[start:end], item_factors, self.orders[start:end],
+                self.observed[start:end], self.rows[start:end], seed=self.seed,
+                metrics=[name], k_values=[int(k)] if k else [], negatives=100))
+        if name == "auc":
+            return float(totals["auc"] / max(totals["auc_evaluated"], 1))
+        return float(totals[self.metric] / max(totals["evaluated"], 1))
+
+    def restore_best(self, model):
+        if self.best_factors is not None:
+            model.user_factors, model.item_factors = self.best_factors
+
+    def curve(self):
+        return {
+            "metric": self.metric,
+            "every": self.every,
+            "patience": self.patience,
+            "best_iteration": self.best_iteration,
+            "best_value": self.best_value if self.checkpoints else None,
+            "stopped_iteration":
+                self.checkpoints[-1]["iteration"] if self.checkpoints else 0,
+            "checkpoints": self.checkpoints,
+        }
+
+def _early_stopping(model, weighted_train, params):
+
+    seed = params.get("seed", 42)
+    rng = np.random.default_rng(seed)
+
+    # Leave one product out of a sample of the orders that have at least two
+    candidates = np.flatnonzero(np.diff(weighted_train.indptr) >= 2)
+    count = min(params.get("early_stopping_orders", 2000), len(candidates))
+    rows = np.sort(rng.choice(candidates, count, replace=False))
+    mask_counts = np.zeros(weighted_train.shape[0], dtype=np.int64)
+    mask_counts[rows] = 1
+    observed, _ = holdout_products(weighted_train, mask_counts, seed)
+
+    callback = EarlyStopping(model, weighted_train[rows], observed[rows], rows,
+                             metric=params.get("early_stopping_metric", "ndcg@10"),
+                             every=params.get("early_stopping_every", 5),
+                             patience=params.get("early_stopping_patience", 3),
+                             min_delta=params.get("early_stopping_min_delta", 0.0),
+                             seed=seed)
+    return observed, callback
+
+def _to_numpy(factors):
+
+    # Factors of a gpu model live in implicit.gpu.Matrix
+    return factors.to_numpy() if hasattr(factors, "to_numpy") else factors
+
+def train_implicit_warm(product_train: scipy.sparse.csr_matrix,
+                        product_test: scipy.sparse.csr_matrix,
+                        test_heldout: scipy.sparse.csr_matrix,
+                        id_vocabulary: IdVocabulary, previous_model: Dict,
+                        params: Dict) -> Any:
+
+    log = logging.getLogger(__name__)
+
+    alpha = params['alpha']
+    precision = params.get("precision", "float32")
+    warm_iterations = params.get("warm_start_iterations", 5)
+
+    weighted_train = (product_train * alpha).astype(precision)
+
+    # The factors are set up front, so this trains on the cpu
+    start = time.perf_counter()
+    user_init, item_init, report = warm_start_factors(
+        previous_model, id_vocabulary, weighted_train, params)
+    model = build_model(dict(params, iterations=warm_iterations), use_gpu=False)
+    model.user_factors = user_init.astype(precision)
+    model.item_factors = item_init.astype(precision)
+    model.fit(weighted_train, show_progress=False)
+    duration = time.perf_counter() - start
+
+    log.info("Warm started from {known_orders} known orders and {known_products} "
+             "known products, {new_orders} new orders and {new_products} new "
+             "products".format(**report))
+    tracking.log({"train_time": duration, "gpu": False})
+
     user_vecs = model.user_factors
     item_vecs = model.item_factors
+    user_vecs[np.diff(product_train.indptr) == 0] = 0
+
+    report.update({"iterations": warm_iterations, "warm_seconds": duration})
+
+    # What warm starting saves, and what it costs in quality, against training
+    # the same data from scratch for the full number of iterations
+    if params.get("warm_start_compare", True):
+        cold = build_model(params)
+        start = time.perf_counter()
+        cold.fit(weighted_train, show_progress=False)
+        cold_duration = time.perf_counter() - start
+        if implicit.gpu.HAS_CUDA:
+            cold = cold.to_cpu()
+
+        warm_score = _holdout_score(item_vecs, product_test, test_heldout, params)
+        cold_score = _holdout_score(cold.item_factors, product_test, test_heldout,
+                                    params)
+        report.update({
+            "cold_iterations": params["iterations"],
+            "cold_seconds": cold_duration,
+            "seconds_saved": cold_duration - duration,
+            "warm": warm_score,
+            "cold": cold_score,
+            "drift": {metric: warm_score[metric] - cold_score[metric]
+                      for metric in warm_score},
+        })
+        log.info("Warm start took {:.1f}s against {:.1f}s cold, "
+                 "metric drift: {}".format(duration, cold_duration, report["drift"]))
+        tracking.log({"warm_start_seconds_saved": report["seconds_saved"]})
+
+    return [user_vecs, item_vecs, weighted_train, report]
+
+def warm_start_factors(previous_model: Dict, id_vocabulary: IdVocabulary,
+                       weighted_train: scipy.sparse.csr_matrix, params: Dict) -> Any:
+    """Initial factors for ``weighted_train`` from a previous model artifact.
+
+    Orders and products the previous model knows keep their factors, matched
+    through the ids it was exported with. New products are folded in from the
+    known orders that bought them and new orders from their products. Anything
+    left gets the small random values implicit starts from.
+    """
+
+    factors = params['factors']
+    regularization = params['regularization']
+    rng = np.random.default_rng(params.get("seed", 42))
+    num_orders, num_items = weighted_train.shape
+
+    previous_users = np.asarray(previous_model["user_factors"], dtype=np.float64)
+    previous_items = np.asarray(previous_model["item_factors"], dtype=np.float64)
+    if previous_items.shape[1] != factors:
+        raise ValueError("Cannot warm start {} factors from a model with {}".format(
+            factors, previous_items.shape[1]))
+
+    item_rows = pd.Index(previous_model["product_ids"]) \
+        .get_indexer(id_vocabulary.ids["product_id"])
+    order_rows = pd.Index(previous_model["order_ids"]) \
+        .get_indexer(id_vocabulary.ids["order_id"])
+
+    known_items = item_rows >= 0
+    item_factors = rng.random((num_items, factors)) * 0.01
+    item_factors[known_items] = previous_items[item_rows[known_items]]
+
+    # Test orders of the previous run were exported with zero factors
+    user_factors = np.zeros((num_orders, factors))
+    known_orders = order_rows >= 0
+    user_factors[known_orders] = previous_users[order_rows[known_orders]]
+    known_orders &= np.any(user_factors != 0, axis=1)
+
+    bought_items = np.diff(weighted_train.tocsc().indptr) > 0
+    new_items = np.flatnonzero(~known_items & bought_items)
+    if len(new_items):
+        buyers = weighted_train.T.tocsr()[new_items]
+        folded = FoldIn(user_factors, regularization).solve(buyers)
+        bought = buyers.dot(known_orders.astype(np.float64)) > 0
+        item_factors[new_items[bought]] = folded[bought]
+
+    new_orders = np.flatnonzero(~known_orders & (np.diff(weighted_train.indptr) > 0))
+    if len(new_orders):
+        user_factors[new_orders] = FoldIn(item_factors, regularization) \
+            .solve(weighted_train[new_orders])
+
+    report = {
+        "known_orders": int(known_orders.sum()),
+        "new_orders": len(new_orders),
+        "known_products": int(known_items.sum()),
+        "new_products": len(new_items),
+    }
+    return user_factors, item_factors, report
+
+def _holdout_score(item_vecs, product_test, test_heldout, params):
+
+    return score_model_batched(item_vecs, product_test, test_heldout,
+                               params['regularization'],
+                               seed=params.get("seed", 42),
+                               batch_size=params.get("score_batch_size", 1024),
+                               metrics=params.get("ranking_metrics", RANKING_METRICS),
+                               k_values=params.get("ranking_k", [5, 10, 20]),
+                               negatives=params.get("auc_negatives", 100))
+
+def export_model(user_vecs: np.ndarray, item_vecs: np.ndarray,
+                 product_train: scipy.sparse.csr_matrix, id_vocabulary: IdVocabulary,
+                 params: Dict) -> Dict:
+
+    # Bundle the factors and training matrix for ModelArtifactDataSet, which
+    # writes the arrays as raw .npy files and everything else to its manifest
+    artifact = {
+        "user_factors": np.asarray(user_vecs),
+        "item_factors": np.asarray(item_vecs),
+        "product_train": product_train,
+        "params": {
+            key: params.get(key)
+            for key in ["alpha", "factors", "regularization", "iterations", "seed",
+                        "precision"]
+        },
+    }
+
+    # The raw ids of every factor row, e.g. product_ids[i] for item_factors[i]
+    for column, ids in id_vocabulary.to_arrays().items():
+        artifact[column + "s"] = ids
+
+    # Smaller copies of the item factors for serving, e.g. item_factors_int8
+    # with its per-row item_scales_int8
+    for precision in params.get("serving_precisions", []):
+        quantized = quantize_factors(item_vecs, precision)
+        artifact["item_factors_" + precision] = quantized["factors"]
+        if "scales" in quantized:
+            artifact["item_scales_" + precision] = quantized["scales"]
 
-    return [user_vecs, item_vecs, product_train*alpha]
\ No newline at end of file
+    return artifact
@@ -15,9 +15,11 @@ def transform_brazilian(transactions: pd.DataFrame, products: pd.DataFrame, cust
 
     transactions = transactions.merge(customers, on='order_id')
     transactions['quantity'] = 1
+    transactions['timestamp'] = pd.to_datetime(transactions['order_purchase_timestamp'])
 
     products["description"] = products["product_category_name"] + str(products["product_description_lenght"])
 
     products = products[["product_id", "description"]].drop_duplicates()
-    transactions = transactions[["order_id", "product_id", "customer_id", "price", "quantity"]]
+    transactions = transactions[["order_id", "product_id", "customer_id", "price",
+                                 "quantity", "timestamp"]]
     return [ transactions, products ]
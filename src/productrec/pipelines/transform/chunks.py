@@ -0,0 +1,15 @@
+from typing import Callable, Iterable, Iterator, Union
+
+import pandas as pd
+
+Frames = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+def map_chunks(data: Frames,
+               transform: Callable[[pd.DataFrame], pd.DataFrame]) -> Frames:
+
+    # Raw datasets loaded with a chunksize arrive as an iterator of DataFrames.
+    # Transform those lazily, one chunk at a time, so the output can be written
+    # incrementally and only one chunk is ever held in memory.
+    if isinstance(data, pd.DataFrame):
+        return transform(data)
+    return (transform(chunk) for chunk in data)
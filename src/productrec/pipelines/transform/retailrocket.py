@@ -2,11 +2,19 @@ from typing import Any, Dict, List
 
 import pandas as pd
 
+from .chunks import map_chunks
+
 def transform_retailrocket(events: pd.DataFrame) -> List[pd.DataFrame]:
-    transactions = events[events.event == "transaction"].copy()
-    transactions['order_id'] = transactions.transactionid.astype(str)
-    transactions['customer_id'] = transactions.visitorid.astype(str)
-    transactions['product_id'] = transactions.itemid.astype(str)
+    return map_chunks(events, _transform_events)
+
+def _transform_events(events: pd.DataFrame) -> pd.DataFrame:
+    transactions = events.loc[events.event == "transaction",
+                              ["transactionid", "visitorid", "itemid"]]
+    transactions = transactions.astype(str).rename(columns={
+        "transactionid": "order_id",
+        "visitorid": "customer_id",
+        "itemid": "product_id"
+    })
     transactions['quantity'] = 1
     transactions['price'] = 1
     return transactions[["order_id", "product_id", "customer_id", "quantity", "price"]]
@@ -0,0 +1 @@
+from .nodes import tune_hyperparameters
\ No newline at end of file
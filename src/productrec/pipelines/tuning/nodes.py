@@ -0,0 +1,158 @@
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+import implicit
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import scipy
+from threadpoolctl import threadpool_limits
+
+from productrec import tracking
+from productrec.pipelines.training import build_model
+from productrec.pipelines.scoring.nodes import score_model_batched
+from productrec.pipelines.splitting import holdout_products, select_rows
+
+SEARCH_STRATEGIES = ["grid", "random", "halving"]
+TUNED_PARAMETERS = ["alpha", "factors", "regularization", "iterations"]
+
+def tune_hyperparameters(product_train: scipy.sparse.csr_matrix, params: Dict) -> Dict:
+
+    log = logging.getLogger(__name__)
+
+    search = params.get("tuning_search", "random")
+    metric = params.get("tuning_metric", "ndcg@10")
+    space = params.get("tuning_space", {key: [params[key]] for key in TUNED_PARAMETERS})
+    workers = params.get("tuning_workers") or os.cpu_count()
+    threads = params.get("tuning_threads_per_trial", 1)
+    rng = np.random.default_rng(params.get("seed", 42))
+
+    log.info("Tuning {} with {} search on {} workers x {} threads".format(
+        metric, search, workers, threads))
+
+    # Trials are scored on a validation split of the training orders, so the
+    # test orders stay unseen until the tuned model is scored
+    split = _validation_split(product_train, params)
+
+    # Every worker gets the split once and trains with its own thread budget,
+    # so workers x threads should not exceed the cores of the machine
+    context = get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(*split, threads)) as executor:
+
+        def run_trials(candidates):
+            configs = [dict(params, **candidate) for candidate in candidates]
+            trials = list(executor.map(_run_trial, configs, itertools.repeat(metric)))
+            for candidate, config, trial in zip(candidates, configs, trials):
+                # Parameters the space leaves out keep their configured value
+                trial.update({key: config[key] for key in TUNED_PARAMETERS})
+                log.info("Trial {}: {} = {:.5f} in {:.1f}s".format(
+                    candidate, metric, trial["score"], trial["seconds"]))
+            return trials
+
+        if search == "grid":
+            trials = run_trials(_grid(space))
+        elif search == "random":
+            trials = run_trials(_sample(space, params.get("tuning_trials", 20), rng))
+        elif search == "halving":
+            trials = _successive_halving(run_trials, space, params, rng)
+        else:
+            raise ValueError("Unknown tuning_search: {}".format(search))
+
+    best = max(trials, key=lambda trial: trial["score"])
+    log.info("Best {} of {:.5f} with {}".format(
+        metric, best["score"], {key: best[key] for key in TUNED_PARAMETERS}))
+
+    # The trials go to the metrics run, the dataset only gets the parameters
+    tracking.log_table("tuning_trials", pd.DataFrame(trials))
+    tracking.log({"tuning_metric": metric, "tuning_best_score": best["score"]})
+
+    return {key: best[key] for key in TUNED_PARAMETERS}
+
+def _validation_split(product_train, params):
+
+    seed = params.get("seed", 42)
+    rng = np.random.default_rng(seed)
+
+    # Leave one product out of a sample of the training orders that have at
+    # least two, as early stopping does, and train on the rest
+    candidates = np.flatnonzero(np.diff(product_train.indptr) >= 2)
+    count = min(params.get("tuning_validation_orders", 5000), len(candidates))
+    rows = rng.choice(candidates, count, replace=False)
+    mask_counts = np.zeros(product_train.shape[0], dtype=np.int64)
+    mask_counts[rows] = 1
+    observed, heldout = holdout_products(product_train, mask_counts, seed)
+    return observed, select_rows(observed, mask_counts > 0), heldout
+
+def _successive_halving(run_trials, space, params, rng):
+
+    # Start many configurations on a small iteration budget, keep the best
+    # 1 / halving_factor of them and multiply their budget, until one is left
+    # or the budget reaches the largest iterations in the space
+    factor = params.get("tuning_halving_factor", 3)
+    budget = params.get("tuning_halving_min_iterations", 5)
+    max_budget = max(space.get("iterations", [params["iterations"]]))
+    others = {key: values for key, values in space.items() if key != "iterations"}
+
+    candidates = _sample(others, params.get("tuning_trials", 20), rng)
+    trials = []
+    while True:
+        rung = run_trials([dict(candidate, iterations=budget)
+                           for candidate in candidates])
+        trials.extend(rung)
+
+        keep = max(1, len(rung) // factor)
+        if len(rung) == 1 or budget >= max_budget:
+            return trials
+
+        ranked = sorted(rung, key=lambda trial: trial["score"], reverse=True)[:keep]
+        candidates = [{key: trial[key] for key in others} for trial in ranked]
+        budget = min(budget * factor, max_budget)
+
+def _grid(space):
+
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+
+def _sample(space, count, rng):
+
+    # Distinct random configurations, or the whole grid if it is smaller
+    grid = _grid(space)
+    if count >= len(grid):
+        return grid
+    return [grid[i] for i in rng.choice(len(grid), count, replace=False)]
+
+_split = {}
+
+def _init_worker(product_train, product_test, test_heldout, threads):
+
+    _split.update(train=product_train, test=product_test, heldout=test_heldout,
+                  threads=threads)
+    # Caps the BLAS pools used by numpy and scipy in this worker
+    threadpool_limits(threads)
+
+def _run_trial(params, metric):
+
+    name, _, k = metric.partition("@")
+    start = time.perf_counter()
+
+    model = build_model(params, num_threads=_split["threads"])
+    precision = params.get("precision", "float32")
+    model.fit((_split["train"] * params["alpha"]).astype(precision),
+              show_progress=False)
+    if implicit.gpu.HAS_CUDA:
+        model = model.to_cpu()
+
+    score = score_model_batched(model.item_factors, _split["test"], _split["heldout"],
+                                params["regularization"], seed=params.get("seed", 42),
+                                batch_size=params.get("score_batch_size", 1024),
+                                metrics=[name], k_values=[int(k)] if k else [],
+                                negatives=params.get("auc_negatives", 100))
+
+    return {"score": float(score[metric]), "seconds": time.perf_counter() - start}
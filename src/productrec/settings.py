@@ -14,10 +14,16 @@
 #
 
 """Project settings."""
-from productrec.hooks import ProjectHooks
+from productrec.hooks import InstrumentationHooks, MetricsHooks, ProjectHooks
+
+# Write a per-node time, memory and dataset size profile of every run to
+# data/08_reporting/profiles, summarized by `kedro profile-summary`
+PROFILE_NODES = True
 
 # Instantiate and list your project hooks here
-HOOKS = (ProjectHooks(),)
+HOOKS = (ProjectHooks(), MetricsHooks()) + (
+    (InstrumentationHooks(),) if PROFILE_NODES else ()
+)
 
 # List the installed plugins for which to disable auto-registry
 # DISABLE_HOOKS_FOR_PLUGINS = ("kedro-viz",)
@@ -0,0 +1,296 @@
+"""Buffered metrics logging for pipeline runs.
+
+Nodes call ``log``, ``log_table``, ``log_figure`` and ``log_plot``. They only
+append to an in-memory queue; a background thread writes the entries in batches to every
+backend of the active run, so a slow or unreachable tracking service never
+blocks the node doing the work. ``MetricsHooks`` opens one run per pipeline
+execution. Outside a run (or in the worker processes of a parallel runner)
+the calls do nothing.
+"""
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+_run = None
+
+
+def set_node(name: str) -> None:
+    """Attributes what is logged from now on to the node ``name``."""
+
+    if _run is not None:
+        _run.node = name
+
+
+def log(values: Dict[str, Any]) -> None:
+    """Logs a dict of scalars (or nested dicts of them) to the active run."""
+
+    if _run is not None:
+        _run.put("scalars", None, dict(values))
+
+
+def log_table(name: str, dataframe: pd.DataFrame) -> None:
+    """Logs a copy of ``dataframe`` to the active run."""
+
+    if _run is not None:
+        _run.put("table", name, dataframe.copy())
+
+
+def log_figure(name: str, figure) -> None:
+    """Logs a matplotlib figure to the active run as a PNG and closes it.
+
+    The figure is rendered here, since matplotlib is not thread safe; only
+    the PNG bytes go through the queue.
+    """
+
+    from matplotlib import pyplot as plt
+
+    if _run is not None:
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format="png")
+        _run.put("image", name, buffer.getvalue())
+    plt.close(figure)
+
+
+def log_plot(name: str, draw: Callable, *args, **kwargs) -> None:
+    """Renders ``draw(figure, *args, **kwargs)`` to the active run, off-thread.
+
+    ``draw`` gets a fresh matplotlib ``Figure`` that is not registered with
+    pyplot, so it is freed as soon as its PNG is written. Pass it small,
+    precomputed data. The render time is logged as ``render_seconds/<name>``.
+    """
+
+    if _run is not None:
+        _run.render(name, draw, args, kwargs)
+
+
+def start_run(name: str, config: Dict[str, Any], backends: List[str] = ("local",),
+              directory: str = "data/08_reporting/metrics", batch_size: int = 100,
+              flush_seconds: float = 5.0) -> "MetricsSink":
+    """Opens the run the module level functions log to, closing any open one."""
+
+    global _run
+    finish_run()
+    sinks = []
+    for backend in backends:
+        try:
+            sinks.append(BACKENDS[backend](name=name, config=config,
+                                           directory=directory))
+        except ImportError as err:
+            logging.getLogger(__name__).warning(
+                "Skipping the {} metrics backend: {}".format(backend, err))
+    _run = MetricsSink(sinks, batch_size=batch_size, flush_seconds=flush_seconds)
+    return _run
+
+
+def finish_run() -> None:
+    """Flushes everything logged to the active run and closes it."""
+
+    global _run
+    if _run is not None:
+        _run.close()
+        _run = None
+
+
+class MetricsSink:
+    """Queues of logged entries, one per backend, each drained by a thread.
+
+    Entries are handed to a backend in batches of ``batch_size``, or whatever
+    arrived within ``flush_seconds``, so a slow backend only delays itself. A
+    backend that raises is dropped with a warning.
+    """
+
+    def __init__(self, backends: List, batch_size: int = 100,
+                 flush_seconds: float = 5.0):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.node = None
+        self.step = 0
+        self._lock = threading.Lock()
+        self._plots = ThreadPoolExecutor(max_workers=1,
+                                         thread_name_prefix="metrics-plots")
+        self._queues = []
+        self._threads = []
+        for backend in backends:
+            entries = queue.Queue()
+            thread = threading.Thread(target=self._drain, args=(backend, entries),
+                                      name="metrics-{}".format(type(backend).__name__),
+                                      daemon=True)
+            thread.start()
+            self._queues.append(entries)
+            self._threads.append(thread)
+
+    def put(self, kind: str, name: str, value: Any, node: str = None) -> None:
+        with self._lock:
+            self.step += 1
+            entry = {"kind": kind, "name": name, "value": value, "step": self.step,
+                     "node": node or self.node, "time": time.time()}
+        for entries in self._queues:
+            entries.put(entry)
+
+    def render(self, name: str, draw: Callable, args: tuple, kwargs: Dict) -> None:
+        self._plots.submit(self._render, name, draw, args, kwargs, self.node)
+
+    def close(self) -> None:
+        # Plots still being rendered go out with the rest of the run
+        self._plots.shutdown(wait=True)
+        for entries in self._queues:
+            entries.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _render(self, name, draw, args, kwargs, node):
+
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        start = time.perf_counter()
+        try:
+            figure = Figure()
+            FigureCanvasAgg(figure)
+            draw(figure, *args, **kwargs)
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format="png")
+        except Exception as err:
+            logging.getLogger(__name__).warning(
+                "Could not render {}: {}".format(name, err))
+            return
+        seconds = time.perf_counter() - start
+        self.put("image", name, buffer.getvalue(), node=node)
+        self.put("scalars", None, {"render_seconds/{}".format(name): seconds},
+                 node=node)
+
+    def _drain(self, backend, entries):
+
+        batch = []
+        working = True
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            try:
+                entry = entries.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                entry = False
+
+            if entry:
+                batch.append(entry)
+            full = len(batch) >= self.batch_size
+            if entry is None or full or time.monotonic() >= deadline:
+                if batch and working:
+                    working = self._call(backend, "write", batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_seconds
+            if entry is None:
+                if working:
+                    self._call(backend, "close")
+                return
+
+    def _call(self, backend, method, *args):
+
+        try:
+            getattr(backend, method)(*args)
+            return True
+        except Exception as err:
+            logging.getLogger(__name__).warning(
+                "Dropping the {} metrics backend: {}".format(
+                    type(backend).__name__, err))
+            return False
+
+
+class LocalBackend:
+    """Writes a run to ``directory/name``, fully offline.
+
+    Scalars go to ``metrics.jsonl``, one line per ``log`` call, tables to
+    ``tables/<name>.<step>.parquet`` and figures to ``images/<name>.<step>.png``.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any], directory: str):
+        self.path = Path(directory) / name
+        (self.path / "tables").mkdir(parents=True, exist_ok=True)
+        (self.path / "images").mkdir(parents=True, exist_ok=True)
+        with open(self.path / "config.json", "w") as f:
+            json.dump(config, f, indent=2, default=_to_json)
+        self._scalars = open(self.path / "metrics.jsonl", "a")
+
+    def write(self, batch: List[Dict]) -> None:
+        for entry in batch:
+            name = _file_name(entry["name"])
+            if entry["kind"] == "scalars":
+                line = dict(entry["value"], _step=entry["step"], _node=entry["node"],
+                            _time=entry["time"])
+                self._scalars.write(json.dumps(line, default=_to_json) + "\n")
+            elif entry["kind"] == "table":
+                table = entry["value"]
+                table.columns = [str(column) for column in table.columns]
+                table.to_parquet(
+                    self.path / "tables" / "{}.{}.parquet".format(name, entry["step"]))
+            elif entry["kind"] == "image":
+                image = self.path / "images" / "{}.{}.png".format(name, entry["step"])
+                image.write_bytes(entry["value"])
+        self._scalars.flush()
+
+    def close(self) -> None:
+        self._scalars.close()
+
+
+class WandbBackend:
+    """Sends a run to Weights & Biases; the project comes from ``wandb_project``.
+
+    The run is created with the first batch, on the flush thread, so even
+    ``wandb.init`` waiting on the network does not hold up the pipeline.
+    """
+
+    def __init__(self, name: str, config: Dict[str, Any], directory: str):
+        import wandb
+
+        self.wandb = wandb
+        self.name = name
+        self.config = config
+        self.run = None
+
+    def write(self, batch: List[Dict]) -> None:
+        from PIL import Image
+
+        if self.run is None:
+            self.run = self.wandb.init(project=self.config.get("wandb_project"),
+                                       name=self.name, notes="implicit_pipeline",
+                                       config=self.config, reinit=True)
+        for entry in batch:
+            if entry["kind"] == "scalars":
+                values = entry["value"]
+            elif entry["kind"] == "table":
+                values = {entry["name"]: self.wandb.Table(dataframe=entry["value"])}
+            else:
+                image = Image.open(io.BytesIO(entry["value"]))
+                values = {entry["name"]: self.wandb.Image(image)}
+            self.run.log(values)
+
+    def close(self) -> None:
+        if self.run is not None:
+            self.run.finish()
+
+
+BACKENDS = {"local": LocalBackend, "wandb": WandbBackend}
+
+
+def _file_name(name):
+
+    if not name:
+        return name
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+
+
+def _to_json(value):
+
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,58 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from kedro.io.core import DataSetError
+
+from productrec.extras.datasets import ChunkedParquetDataSet
+
+
+@pytest.fixture
+def transactions():
+    return pd.DataFrame({
+        "order_id": ["o{}".format(row // 3) for row in range(12)],
+        "product_id": ["p{}".format(row % 5) for row in range(12)],
+        "quantity": range(12),
+    })
+
+
+@pytest.fixture
+def data_set(tmp_path):
+    return ChunkedParquetDataSet(filepath=str(tmp_path / "transactions.parquet"),
+                                 categorical=["order_id", "product_id"],
+                                 dtypes={"quantity": "int32"})
+
+
+class TestChunkedParquetDataSet:
+    def test_round_trip(self, data_set, transactions):
+        data_set.save(transactions)
+        loaded = data_set.load()
+
+        pd.testing.assert_frame_equal(loaded.astype({"order_id": str,
+                                                     "product_id": str,
+                                                     "quantity": int}),
+                                      transactions)
+        assert loaded["order_id"].dtype == "category"
+        assert loaded["quantity"].dtype == "int32"
+
+    def test_chunks_become_row_groups(self, tmp_path, data_set, transactions):
+        # Later chunks hold more categories, so pandas picks other index types
+        data_set.save(transactions.iloc[start:start + 4] for start in range(0, 12, 4))
+
+        parquet = pq.ParquetFile(str(tmp_path / "transactions.parquet"))
+        assert parquet.num_row_groups == 3
+        assert parquet.schema_arrow.field("product_id").type == \
+            pa.dictionary(pa.int32(), pa.string())
+        pd.testing.assert_frame_equal(data_set.load().astype(str),
+                                      transactions.astype(str))
+
+    def test_loads_selected_columns(self, tmp_path, transactions):
+        filepath = str(tmp_path / "transactions.parquet")
+        ChunkedParquetDataSet(filepath=filepath).save(transactions)
+        data_set = ChunkedParquetDataSet(filepath=filepath,
+                                         load_args={"columns": ["product_id"]})
+        assert list(data_set.load().columns) == ["product_id"]
+
+    def test_no_chunks(self, data_set):
+        with pytest.raises(DataSetError):
+            data_set.save(iter([]))
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from productrec.extras.datasets import MemmapArrayDataSet
+
+
+def _mapped(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = array.base
+    return array is not None
+
+
+@pytest.fixture
+def data_set(tmp_path):
+    return MemmapArrayDataSet(path=str(tmp_path / "array"))
+
+
+class TestMemmapArrayDataSet:
+    def test_dense_round_trip(self, data_set):
+        array = np.arange(12, dtype=np.float32).reshape(3, 4)
+        data_set.save(array)
+        loaded = data_set.load()
+
+        np.testing.assert_array_equal(loaded, array)
+        assert loaded.dtype == array.dtype
+        assert _mapped(loaded)
+
+    def test_sparse_round_trip(self, data_set):
+        matrix = sparse_random(50, 20, density=0.1, format="csr", dtype=np.float32,
+                               random_state=0)
+        data_set.save(matrix)
+        loaded = data_set.load()
+
+        assert loaded.shape == matrix.shape
+        assert (loaded != matrix).nnz == 0
+        assert all(_mapped(getattr(loaded, part))
+                   for part in ("data", "indices", "indptr"))
+
+    def test_saves_memory_maps(self, data_set, tmp_path):
+        source = np.lib.format.open_memmap(str(tmp_path / "source.npy"), mode="w+",
+                                           dtype=np.float64, shape=(100, 8))
+        source[:] = np.random.default_rng(0).random((100, 8))
+        data_set.save(source)
+
+        np.testing.assert_array_equal(data_set.load(), source)
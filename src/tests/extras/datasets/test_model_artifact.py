@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+from kedro.io.core import DataSetError
+from scipy.sparse import random as sparse_random
+
+from productrec.extras.datasets import ModelArtifactDataSet
+
+
+@pytest.fixture
+def artifact():
+    rng = np.random.default_rng(0)
+    return {
+        "user_factors": rng.random((30, 8), dtype=np.float32),
+        "item_factors": rng.random((20, 8)),
+        "product_train": sparse_random(30, 20, density=0.1, format="csr",
+                                       random_state=0),
+        "params": {"factors": 8, "regularization": 0.1},
+        "products": ["p{}".format(product) for product in range(20)],
+    }
+
+
+@pytest.fixture
+def data_set(tmp_path):
+    return ModelArtifactDataSet(path=str(tmp_path / "model"))
+
+
+class TestModelArtifactDataSet:
+    @pytest.mark.parametrize("mmap_mode", ["r", None])
+    def test_round_trip(self, tmp_path, artifact, mmap_mode):
+        data_set = ModelArtifactDataSet(path=str(tmp_path / "model"),
+                                        mmap_mode=mmap_mode)
+        assert not data_set.exists()
+        data_set.save(artifact)
+        assert data_set.exists()
+        loaded = data_set.load()
+
+        assert loaded.keys() == artifact.keys()
+        for name in ["user_factors", "item_factors"]:
+            np.testing.assert_array_equal(loaded[name], artifact[name])
+            assert loaded[name].dtype == artifact[name].dtype
+            assert isinstance(loaded[name], np.memmap) == (mmap_mode is not None)
+        assert (loaded["product_train"] != artifact["product_train"]).nnz == 0
+        assert loaded["params"] == artifact["params"]
+        assert loaded["products"] == artifact["products"]
+
+    def test_missing_artifact(self, data_set):
+        with pytest.raises(DataSetError):
+            data_set.load()
+
+    def test_rejects_object_arrays(self, data_set):
+        with pytest.raises(DataSetError):
+            data_set.save({"ids": np.array(["a", None], dtype=object)})
+
+    def test_detects_mismatched_arrays(self, tmp_path, artifact, data_set):
+        data_set.save(artifact)
+        np.save(tmp_path / "model" / "item_factors.npy", np.zeros((3, 8)))
+
+        with pytest.raises(DataSetError):
+            data_set.load()
+
+    def test_manifest_lists_the_arrays(self, tmp_path, artifact, data_set):
+        data_set.save(artifact)
+        with open(tmp_path / "model" / "manifest.json", encoding="utf-8") as manifest:
+            manifest = json.load(manifest)
+
+        assert set(manifest["arrays"]) == {"user_factors", "item_factors"}
+        assert set(manifest["sparse"]) == {"product_train"}
+        assert not list((tmp_path / "model").glob("*.tmp"))
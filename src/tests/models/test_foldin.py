@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from implicit.cpu.als import AlternatingLeastSquares
+from scipy.sparse import random as sparse_random
+
+from productrec.models import FoldIn
+
+
+@pytest.fixture
+def item_factors():
+    return np.random.default_rng(0).normal(size=(40, 8))
+
+
+@pytest.fixture
+def baskets():
+    matrix = sparse_random(30, 40, density=0.15, format="csr", random_state=2)
+    matrix.data[:] = 1
+    # Some rows carry confidences other than one
+    matrix.data[::4] = 3
+    return matrix
+
+
+def _partial_fit_users(item_factors, baskets):
+    model = AlternatingLeastSquares(factors=8, regularization=0.1, dtype=np.float64,
+                                    use_cg=False, num_threads=1)
+    model.item_factors = item_factors.copy()
+    model.user_factors = np.zeros((0, 8))
+    model.partial_fit_users(np.arange(baskets.shape[0]), baskets)
+    return model
+
+
+class TestFoldIn:
+    def test_matches_partial_fit_users(self, item_factors, baskets):
+        model = _partial_fit_users(item_factors, baskets)
+        np.testing.assert_allclose(FoldIn(item_factors, 0.1).solve(baskets),
+                                   model.user_factors, atol=1e-10)
+
+    def test_single_basket(self, item_factors, baskets):
+        fold_in = FoldIn(item_factors, 0.1)
+        items = [3, 7, 11]
+        np.testing.assert_allclose(fold_in.solve(items),
+                                   fold_in.solve(fold_in._single_basket(items))[0])
+
+    def test_recommend_matches_model(self, item_factors, baskets):
+        model = _partial_fit_users(item_factors, baskets)
+        ids, scores = FoldIn(item_factors, 0.1).recommend(baskets, N=5)
+
+        for row in range(baskets.shape[0]):
+            expected_ids, expected_scores = model.recommend(row, baskets[row], N=5)
+            np.testing.assert_array_equal(ids[row], expected_ids)
+            np.testing.assert_allclose(scores[row], expected_scores)
+            assert not np.isin(ids[row], baskets[row].indices).any()
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from productrec.models import ItemIndex
+
+
+@pytest.fixture
+def item_factors():
+    return np.random.default_rng(0).normal(size=(200, 8)).astype(np.float32)
+
+
+@pytest.fixture
+def user_factors():
+    return np.random.default_rng(1).normal(size=(20, 8)).astype(np.float32)
+
+
+class TestItemIndex:
+    def test_exact_at_full_probe(self, item_factors, user_factors):
+        index = ItemIndex(item_factors, lists=10)
+        ids, scores = index.search(user_factors, N=10, probe=index.lists)
+
+        exact = user_factors.dot(item_factors.T)
+        expected = np.argsort(-exact, axis=1, kind="stable")[:, :10]
+        np.testing.assert_array_equal(ids, expected)
+        np.testing.assert_allclose(scores, np.take_along_axis(exact, expected, axis=1),
+                                   rtol=1e-5)
+
+    def test_lists_partition_the_items(self, item_factors):
+        index = ItemIndex(item_factors, lists=10)
+        assert index.offsets[-1] == index.num_items == len(item_factors)
+        np.testing.assert_array_equal(np.sort(index.item_ids), np.arange(200))
+        np.testing.assert_array_equal(index.item_factors, item_factors[index.item_ids])
+
+    def test_pads_short_results(self, item_factors, user_factors):
+        index = ItemIndex(item_factors[:5], lists=1)
+        ids, scores = index.search(user_factors, N=8)
+        assert (ids[:, 5:] == -1).all()
+        assert np.isneginf(scores[:, 5:]).all()
+        assert (np.sort(ids[:, :5], axis=1) == np.arange(5)).all()
@@ -0,0 +1,46 @@
+from collections import Counter
+from itertools import combinations
+
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from productrec.models import frequent_itemsets
+
+
+@pytest.fixture
+def orders():
+    matrix = sparse_random(300, 15, density=0.3, format="csr", random_state=3)
+    matrix.data[:] = 1
+    return matrix
+
+
+def _brute_force(orders, max_len, min_count):
+    counts = {length: Counter() for length in range(1, max_len + 1)}
+    for row in range(orders.shape[0]):
+        products = tuple(sorted(orders[row].indices))
+        for length in counts:
+            counts[length].update(combinations(products, length))
+    return {length: {itemset: count for itemset, count in found.items()
+                     if count >= min_count or length == 1}
+            for length, found in counts.items()}
+
+
+class TestFrequentItemsets:
+    @pytest.mark.parametrize("memory_mb", [256, 1e-4])
+    def test_matches_brute_force(self, orders, memory_mb):
+        found = frequent_itemsets(orders, top_n=5, max_len=4, min_count=2,
+                                  memory_mb=memory_mb)
+        expected = _brute_force(orders, max_len=4, min_count=2)
+
+        for length, itemsets in found.items():
+            counts = [count for _, count in itemsets]
+            assert counts == sorted(expected[length].values(), reverse=True)[:5]
+            for itemset, count in itemsets:
+                assert len(itemset) == length
+                assert expected[length][tuple(sorted(itemset))] == count
+
+    def test_max_len_one(self, orders):
+        found = frequent_itemsets(orders, top_n=3, max_len=1)
+        counts = np.bincount(orders.indices, minlength=orders.shape[1])
+        assert [count for _, count in found[1]] == sorted(counts, reverse=True)[:3]
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from productrec.models import interaction_matrix
+
+ROWS = np.array([0, 0, 1, 0, 2, 2])
+COLS = np.array([1, 1, 2, 3, 0, 0])
+VALUES = np.array([2, 3, 1, 4, 5, -5])
+
+
+class TestInteractionMatrix:
+    @pytest.mark.parametrize("duplicates, expected", [
+        ("binary", [[0, 1, 0, 1], [0, 0, 1, 0], [1, 0, 0, 0]]),
+        ("sum", [[0, 5, 0, 4], [0, 0, 1, 0], [0, 0, 0, 0]]),
+        ("max", [[0, 3, 0, 4], [0, 0, 1, 0], [5, 0, 0, 0]]),
+    ])
+    def test_duplicate_policies(self, duplicates, expected):
+        matrix = interaction_matrix(ROWS, COLS, (3, 4), values=VALUES,
+                                    duplicates=duplicates)
+        np.testing.assert_array_equal(matrix.toarray(), expected)
+
+        # Zeros are dropped and the result is canonical
+        assert (matrix.data != 0).all()
+        assert matrix.has_canonical_format
+        assert matrix.indices.dtype == matrix.indptr.dtype == np.int32
+
+    def test_defaults_to_ones(self):
+        matrix = interaction_matrix(ROWS, COLS, (3, 4), duplicates="sum")
+        assert matrix[0, 1] == 2
+        assert matrix.dtype == np.float32
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            interaction_matrix(ROWS, COLS, (3, 4), duplicates="mean")
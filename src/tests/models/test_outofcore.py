@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from implicit.cpu.als import AlternatingLeastSquares
+from scipy.sparse import random as sparse_random
+
+from productrec.models import OutOfCoreALS
+
+
+@pytest.fixture
+def user_items():
+    matrix = sparse_random(60, 30, density=0.2, format="csr", random_state=1)
+    matrix.data[:] = 1
+    return matrix
+
+
+def _model(directory, iterations, **kwargs):
+    return OutOfCoreALS(factors=8, regularization=0.1, iterations=iterations,
+                        directory=str(directory), dtype=np.float64, **kwargs)
+
+
+class TestOutOfCoreALS:
+    def test_matches_in_memory_als(self, tmp_path, user_items):
+        # Both start from the factors OutOfCoreALS initializes
+        initial = _model(tmp_path / "initial", iterations=0)
+        initial.fit(user_items, alpha=5)
+
+        # A tiny budget splits the matrix into many blocks over two workers
+        model = _model(tmp_path / "model", iterations=4, memory_budget_mb=0.01,
+                       workers=2)
+        model.fit(user_items, alpha=5)
+        assert len(model._blocks(model.user_items.indptr)) > 1
+
+        reference = AlternatingLeastSquares(factors=8, regularization=0.1, iterations=4,
+                                            dtype=np.float64, num_threads=1)
+        reference.user_factors = np.array(initial.user_factors)
+        reference.item_factors = np.array(initial.item_factors)
+        reference.fit((user_items * 5).tocsr(), show_progress=False)
+
+        np.testing.assert_allclose(model.user_factors, reference.user_factors,
+                                   atol=1e-6)
+        np.testing.assert_allclose(model.item_factors, reference.item_factors,
+                                   atol=1e-6)
+
+    def test_files_back_the_factors(self, tmp_path, user_items):
+        model = _model(tmp_path, iterations=1)
+        model.fit(user_items)
+
+        assert isinstance(model.user_factors, np.memmap)
+        assert isinstance(model.item_factors, np.memmap)
+        assert (tmp_path / "user_factors.npy").exists()
+        assert (model.item_users != user_items.T).nnz == 0
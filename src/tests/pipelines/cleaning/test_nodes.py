@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productrec.pipelines.cleaning import clean_data
+from productrec.pipelines.profiling import profile_transactions
+
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(0)
+    num_orders = 300
+    sizes = rng.integers(1, 9, num_orders)
+    orders = np.repeat(np.arange(num_orders), sizes)
+    # Skewed popularity leaves many products near the threshold
+    popularity = 1 / np.arange(1, 81)
+    products = np.concatenate(
+        [rng.choice(80, size, replace=False, p=popularity / popularity.sum())
+         for size in sizes])
+    return pd.DataFrame({
+        "order_id": ["o{:04d}".format(order) for order in orders],
+        "product_id": ["p{:03d}".format(product) for product in products],
+    })
+
+
+def _params(clean_mode):
+    return {"clean_mode": clean_mode, "filter_value": 4, "minimum_order_size": 3,
+            "maximum_order_size": 6}
+
+
+def _reference_kcore(transactions, params):
+    # Alternate both groupby filters until neither removes a row
+    while True:
+        product_counts = transactions.groupby("product_id")["order_id"] \
+            .transform("count")
+        kept = transactions[product_counts >= params["filter_value"]]
+        order_sizes = kept.groupby("order_id")["product_id"].transform("count")
+        kept = kept[(order_sizes >= params["minimum_order_size"]) &
+                    (order_sizes <= params["maximum_order_size"])]
+        if len(kept) == len(transactions):
+            return kept
+        transactions = kept
+
+
+def _violations(cleaned, params):
+    product_counts = cleaned.groupby("product_id", observed=True).size()
+    order_sizes = cleaned.groupby("order_id", observed=True).size()
+    return ((product_counts < params["filter_value"]).sum() +
+            ((order_sizes < params["minimum_order_size"]) |
+             (order_sizes > params["maximum_order_size"])).sum())
+
+
+class TestCleanData:
+    def test_kcore_matches_reference(self, transactions):
+        params = _params("kcore")
+        _, product_profile, _, _ = profile_transactions(transactions)
+        cleaned = clean_data(transactions, product_profile, params)
+
+        pd.testing.assert_frame_equal(cleaned, _reference_kcore(transactions, params))
+        assert _violations(cleaned, params) == 0
+        assert len(cleaned)
+
+    def test_single_pass_leaves_violations(self, transactions):
+        # The case k-core filtering exists for
+        params = _params("single")
+        _, product_profile, _, _ = profile_transactions(transactions)
+        cleaned = clean_data(transactions, product_profile, params)
+        assert _violations(cleaned, params) > 0
+
+    def test_categorical_ids(self, transactions):
+        params = _params("kcore")
+        categorical = transactions.astype("category")
+        _, product_profile, _, _ = profile_transactions(categorical)
+        cleaned = clean_data(categorical, product_profile, params)
+
+        pd.testing.assert_frame_equal(cleaned.astype(str),
+                                      _reference_kcore(transactions, params))
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from productrec.pipelines.cooccurrence import build_cooccurrence
+from productrec.pipelines.scoring import score_neighbors
+
+SIMILARITIES = ["cosine", "lift", "jaccard"]
+
+
+@pytest.fixture
+def train():
+    matrix = sparse_random(300, 30, density=0.15, format="csr", random_state=0)
+    # Quantities, which only count as a purchase
+    matrix.data = np.ceil(matrix.data * 3)
+    return matrix
+
+
+def _dense_similarity(train, similarity, min_count):
+    orders = (train.toarray() > 0).astype(np.float64)
+    counts = orders.T.dot(orders)
+    np.fill_diagonal(counts, 0)
+    item_counts = orders.sum(axis=0)
+    num_orders = (orders.sum(axis=1) > 0).sum()
+
+    if similarity == "cosine":
+        scores = counts / np.sqrt(np.outer(item_counts, item_counts))
+    elif similarity == "lift":
+        scores = counts / (np.outer(item_counts, item_counts) / num_orders)
+    else:
+        scores = counts / (item_counts[:, None] + item_counts[None, :] - counts)
+    scores[counts < min_count] = 0
+    return np.nan_to_num(scores)
+
+
+def _params(**params):
+    return dict({"cooccurrence_min_count": 2, "cooccurrence_neighbors": 100,
+                 "cooccurrence_memory_mb": 256, "seed": 42}, **params)
+
+
+class TestBuildCooccurrence:
+    @pytest.mark.parametrize("similarity", SIMILARITIES)
+    def test_matches_dense_similarity(self, train, similarity):
+        # A tiny memory budget makes blocks of a few products
+        neighbors = build_cooccurrence(
+            train, _params(cooccurrence_similarity=similarity,
+                           cooccurrence_memory_mb=0.001))
+        np.testing.assert_allclose(neighbors.toarray(),
+                                   _dense_similarity(train, similarity, 2), rtol=1e-5)
+
+    def test_keeps_the_top_neighbors(self, train):
+        neighbors = build_cooccurrence(train, _params(cooccurrence_neighbors=5))
+        dense = _dense_similarity(train, "cosine", 2)
+
+        assert np.diff(neighbors.indptr).max() == 5
+        for row in range(dense.shape[0]):
+            kept = neighbors[row].data
+            np.testing.assert_allclose(np.sort(kept),
+                                       np.sort(dense[row])[-len(kept):], rtol=1e-5)
+
+    def test_unknown_similarity(self, train):
+        with pytest.raises(ValueError):
+            build_cooccurrence(train, _params(cooccurrence_similarity="dice"))
+
+
+class TestScoreNeighbors:
+    def test_parallel_matches_batched(self, train):
+        neighbors = build_cooccurrence(train, _params())
+        test = train[:100]
+        heldout = test.copy()
+        heldout.data[::2] = 0
+        test = test - heldout
+
+        params = _params(score_batch_size=16, ranking_metrics=["ndcg", "auc"],
+                         ranking_k=[5])
+        batched = score_neighbors(train, test, heldout, neighbors, params)
+        parallel = score_neighbors(train, test, heldout, neighbors,
+                                   dict(params, score_mode="parallel", score_workers=4))
+
+        assert batched == parallel
+        assert 0 < batched["ndcg@5"] <= 1
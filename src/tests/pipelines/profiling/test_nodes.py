@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from productrec.pipelines.profiling import (profile_transactions, profile_counts,
+                                            id_codes)
+
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(0)
+    num_orders = 200
+    sizes = rng.integers(1, 6, num_orders)
+    orders = np.repeat(np.arange(num_orders), sizes)
+    products = rng.integers(0, 40, len(orders))
+    return pd.DataFrame({
+        "order_id": ["o{:04d}".format(order) for order in orders],
+        "product_id": ["p{:03d}".format(product) for product in products],
+        "customer_id": ["c{:02d}".format(order % 30) for order in orders],
+        "quantity": rng.integers(1, 4, len(orders)),
+    })
+
+
+def _reference(transactions, key, distinct):
+    # The same counts with one groupby per column
+    grouped = transactions.dropna(subset=[key]).groupby(key, sort=False)
+    return pd.DataFrame({
+        key: list(grouped.groups),
+        distinct: grouped[distinct].nunique().to_numpy(),
+        "purchases": grouped.size().to_numpy(),
+        "quantity": grouped["quantity"].sum().to_numpy(),
+    })
+
+
+def _sorted(profile):
+    return profile.sort_values(profile.columns[0]).reset_index(drop=True)
+
+
+class TestProfileTransactions:
+
+    @pytest.mark.parametrize("key,distinct,position", [
+        ("order_id", "product_id", 0),
+        ("product_id", "order_id", 1),
+        ("customer_id", "order_id", 2),
+    ])
+    def test_matches_groupby(self, transactions, key, distinct, position):
+        profile = profile_transactions(transactions)[position]
+        expected = _reference(transactions, key, distinct) \
+            .rename(columns={distinct: profile.columns[1]})
+        pd.testing.assert_frame_equal(_sorted(profile), _sorted(expected),
+                                      check_dtype=False)
+
+    def test_categorical_ids(self, transactions):
+        categorical = transactions.astype({"order_id": "category",
+                                           "product_id": "category",
+                                           "customer_id": "category"})
+        # Unused categories are not part of the profile
+        categorical["product_id"] = categorical.product_id \
+            .cat.add_categories(["unused"])
+        for profile, expected in zip(profile_transactions(categorical)[:3],
+                                     profile_transactions(transactions)[:3]):
+            profile[profile.columns[0]] = profile.iloc[:, 0].astype(str)
+            pd.testing.assert_frame_equal(_sorted(profile), _sorted(expected),
+                                          check_dtype=False)
+
+    def test_missing_ids(self, transactions):
+        transactions.loc[:9, "product_id"] = None
+        transactions = transactions.drop(columns="customer_id")
+        order_profile, product_profile, customer_profile, _ = \
+            profile_transactions(transactions)
+
+        assert product_profile.purchases.sum() == len(transactions) - 10
+        assert order_profile.purchases.sum() == len(transactions)
+        assert customer_profile.empty
+
+    def test_order_products(self, transactions):
+        transactions.loc[:9, "product_id"] = None
+        order_profile, product_profile, _, order_products = \
+            profile_transactions(transactions)
+
+        assert order_products.shape == (len(order_profile), len(product_profile))
+        assert order_products.data.tolist() == [1] * order_products.nnz
+        np.testing.assert_array_equal(order_products.getnnz(axis=1),
+                                      order_profile.products)
+        np.testing.assert_array_equal(order_products.getnnz(axis=0),
+                                      product_profile.orders)
+
+        known = transactions.dropna()
+        rows = pd.Index(order_profile.order_id).get_indexer(known.order_id)
+        cols = pd.Index(product_profile.product_id).get_indexer(known.product_id)
+        assert (order_products[rows, cols] == 1).all()
+
+
+class TestIdCodes:
+
+    def test_strings(self):
+        codes, ids = id_codes(pd.Series(["b", "a", None, "b"]))
+        assert codes.tolist() == [0, 1, -1, 0]
+        assert ids.tolist() == ["b", "a"]
+
+    def test_categorical(self):
+        series = pd.Series(["b", "a", None, "b"], dtype="category")
+        codes, ids = id_codes(series)
+        assert codes.tolist() == [1, 0, -1, 1]
+        assert ids.tolist() == ["a", "b"]
+
+
+class TestProfileCounts:
+
+    def test_unknown_ids(self):
+        profile = pd.DataFrame({"product_id": ["a", "b"], "orders": [3, 5]})
+        counts = profile_counts(profile, pd.Series(["b", "c", None, "a"]), "orders")
+        assert counts.tolist() == [5, 0, 0, 3]
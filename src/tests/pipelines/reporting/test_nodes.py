@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+
+from productrec import tracking
+from productrec.pipelines.profiling import profile_transactions
+from productrec.pipelines.reporting import report
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    tables = {}
+    monkeypatch.setattr(tracking, "log_table",
+                        lambda name, dataframe: tables.__setitem__(name, dataframe))
+    monkeypatch.setattr(tracking, "log_plot", lambda *args, **kwargs: None)
+    return tables
+
+
+@pytest.fixture
+def transactions():
+    baskets = [["a", "b", "c"], ["a", "b"], ["a", "b"], ["b", "c"], ["d"], ["a"]]
+    return pd.DataFrame({
+        "order_id": ["o{}".format(order) for order, basket in enumerate(baskets)
+                     for _ in basket],
+        "product_id": [product for basket in baskets for product in basket],
+        "customer_id": ["c{}".format(order % 2) for order, basket in enumerate(baskets)
+                        for _ in basket],
+    })
+
+
+class TestReport:
+
+    def test_itemsets_from_the_profile(self, transactions, tables):
+        report(transactions, *profile_transactions(transactions),
+               {"itemset_top_n": 2, "itemset_max_len": 2, "itemset_min_count": 1})
+
+        singles = tables["top_2_product_singles"]
+        assert singles.itemsets.tolist() == ["frozenset({'a'})", "frozenset({'b'})"]
+        assert singles.support.tolist() == pytest.approx([4 / 6, 4 / 6])
+        pairs = tables["top_2_product_pairs"]
+        assert pairs.itemsets.iloc[0] in ("frozenset({'a', 'b'})",
+                                          "frozenset({'b', 'a'})")
+        assert pairs.support.iloc[0] == pytest.approx(3 / 6)
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from implicit.cpu.als import AlternatingLeastSquares
+from scipy.sparse import csr_matrix
+from scipy.sparse import random as sparse_random
+
+from productrec.models import ItemIndex
+from productrec.pipelines.scoring.nodes import (
+    score_confusion,
+    score_model,
+    score_model_batched,
+    score_model_parallel,
+)
+
+
+@pytest.fixture
+def model():
+    train = sparse_random(80, 40, density=0.15, format="csr", random_state=0)
+    train.data[:] = 1
+    model = AlternatingLeastSquares(factors=8, regularization=0.1, iterations=5,
+                                    dtype=np.float64, use_cg=False, random_state=0,
+                                    num_threads=1)
+    model.fit(train, show_progress=False)
+    return model
+
+
+@pytest.fixture
+def test_split():
+    # Every order gets about a third of its products held out
+    orders = sparse_random(50, 40, density=0.2, format="coo", random_state=1)
+    heldout = np.random.default_rng(0).random(orders.nnz) < 0.3
+
+    def part(mask):
+        return csr_matrix((np.ones(mask.sum()), (orders.row[mask], orders.col[mask])),
+                          shape=orders.shape)
+
+    return part(~heldout), part(heldout)
+
+
+class TestScoreModel:
+    def test_batched_matches_loop(self, model, test_split):
+        # score_model folds users into the model, so score it last
+        batched = score_model_batched(model.item_factors, *test_split,
+                                      model.regularization, batch_size=7)
+        parallel = score_model_parallel(model.item_factors, *test_split,
+                                        model.regularization, batch_size=7,
+                                        workers=3)
+        loop = score_model(model, *test_split)
+
+        assert batched.keys() == loop.keys()
+        for name, value in loop.items():
+            assert batched[name] == pytest.approx(value)
+            assert parallel[name] == pytest.approx(value)
+
+    def test_parallel_does_not_depend_on_workers(self, model, test_split):
+        params = dict(batch_size=5, metrics=["auc", "ndcg"], k_values=[5],
+                      negatives=10)
+        one = score_model_parallel(model.item_factors, *test_split,
+                                   model.regularization, workers=1, **params)
+        many = score_model_parallel(model.item_factors, *test_split,
+                                    model.regularization, workers=4, **params)
+        assert one == many
+
+
+class TestScoreConfusion:
+    def _score(self, model, test_split, item_index=None, **params):
+        params = dict({"factors": 8, "regularization": 0.1, "iterations": 5,
+                       "seed": 42}, **params)
+        return score_confusion(test_split[0], *test_split, model.user_factors,
+                               model.item_factors, params, item_index)
+
+    def test_loop_warns_about_ranking_metrics(self, model, test_split, caplog):
+        score = self._score(model, test_split, score_mode="loop",
+                            ranking_metrics=["ndcg"], ranking_k=[5])
+        assert "ndcg@5" not in score
+        assert "ranking_metrics and the item index are ignored" in caplog.text
+
+    def test_ranks_with_the_item_index(self, model, test_split):
+        params = {"ranking_metrics": ["ndcg"], "ranking_k": [5]}
+        exact = self._score(model, test_split, **params)
+
+        # Searching every list is exact, searching one is not
+        index = ItemIndex(model.item_factors, lists=8, probe=8)
+        assert self._score(model, test_split, index, **params) == pytest.approx(exact)
+        index.probe = 1
+        assert self._score(model, test_split, index, **params)["ndcg@5"] != \
+            pytest.approx(exact["ndcg@5"])
+
+    def test_serving_precisions_are_opt_in(self, model, test_split):
+        assert "serving_precision_delta" not in self._score(model, test_split)
+
+    def test_serving_precision_delta(self, model, test_split):
+        score = self._score(model, test_split, precision="float64",
+                            serving_precisions=["float16", "int8"],
+                            serving_precision_compare=True)
+        deltas = score["serving_precision_delta"]
+
+        assert list(deltas) == ["float64", "float16", "int8"]
+        # The trained float64 factors are the reference themselves
+        assert all(delta == 0 for delta in deltas["float64"].values())
+        assert deltas["int8"].keys() == {
+            metric for metric in score if metric != "serving_precision_delta"}
+
+    def test_loop_without_ranking_metrics(self, model, test_split, caplog):
+        score = self._score(model, test_split, score_mode="loop", ranking_metrics=[])
+        batched = self._score(model, test_split, ranking_metrics=[])
+        assert score.keys() == batched.keys()
+        assert "ignored" not in caplog.text
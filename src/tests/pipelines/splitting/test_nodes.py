@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+
+from productrec.models import IdVocabulary
+from productrec.pipelines.splitting import holdout_products, split_data
+
+STRATEGIES = ["random", "temporal", "customer"]
+
+
+@pytest.fixture
+def transactions():
+    rng = np.random.default_rng(0)
+    num_orders = 400
+    sizes = rng.integers(1, 8, num_orders)
+    orders = np.repeat(np.arange(num_orders), sizes)
+    products = np.concatenate(
+        [rng.choice(50, size, replace=False) for size in sizes])
+    return pd.DataFrame({
+        "order_id": ["o{:04d}".format(order) for order in orders],
+        "product_id": ["p{:03d}".format(product) for product in products],
+        "customer_id": ["c{:03d}".format(order // 4) for order in orders],
+        "timestamp": pd.Timestamp("2021-01-01") + pd.to_timedelta(orders, unit="h"),
+        "quantity": 1,
+    })
+
+
+@pytest.fixture
+def vocabulary(transactions):
+    return IdVocabulary.from_transactions(transactions)
+
+
+def _params(strategy, seed=42):
+    return {"split_strategy": strategy, "seed": seed, "test_size": 0.3,
+            "holdout_fraction": 0.3, "holdout_k": 1}
+
+
+def _purchases(transactions, vocabulary):
+    # The binary order x product matrix split_data starts from
+    rows = vocabulary.encode("order_id", transactions.order_id)
+    cols = vocabulary.encode("product_id", transactions.product_id)
+    purchases = np.zeros((vocabulary.size("order_id"), vocabulary.size("product_id")))
+    purchases[rows, cols] = 1
+    return purchases
+
+
+def _nonempty(matrix):
+    return np.asarray(matrix.sum(axis=1)).ravel() > 0
+
+
+class TestSplitData:
+    @pytest.mark.parametrize("strategy", STRATEGIES)
+    def test_partitions_orders(self, transactions, vocabulary, strategy):
+        train, test, heldout = split_data(transactions, vocabulary, _params(strategy))
+        purchases = _purchases(transactions, vocabulary)
+        assert train.shape == test.shape == heldout.shape == purchases.shape
+
+        train_rows, test_rows = _nonempty(train), _nonempty(test)
+        assert not (train_rows & test_rows).any()
+        assert (_nonempty(heldout) == test_rows).all()
+
+        # Test orders are split into observed and held out products
+        np.testing.assert_array_equal((test + heldout).toarray()[test_rows],
+                                      purchases[test_rows])
+        np.testing.assert_array_equal(train.toarray()[train_rows],
+                                      purchases[train_rows])
+        assert (test.multiply(heldout)).nnz == 0
+        assert (np.asarray(test.sum(axis=1)).ravel()[test_rows] >= 1).all()
+
+        # Every order is used, except single product orders of test customers
+        missing = purchases.sum(axis=1) > 0
+        missing &= ~train_rows & ~test_rows
+        if strategy == "customer":
+            assert (purchases[missing].sum(axis=1) == 1).all()
+        else:
+            assert not missing.any()
+
+    def test_leave_k_out(self, transactions, vocabulary):
+        train, test, heldout = split_data(transactions, vocabulary,
+                                          _params("leave_k_out"))
+        purchases = _purchases(transactions, vocabulary)
+
+        np.testing.assert_array_equal((train + heldout).toarray(), purchases)
+        sizes = purchases.sum(axis=1)
+        np.testing.assert_array_equal(np.asarray(heldout.sum(axis=1)).ravel(),
+                                      np.where(sizes > 1, 1, 0))
+        np.testing.assert_array_equal(test.toarray(),
+                                      train.toarray() * (sizes > 1)[:, None])
+
+    @pytest.mark.parametrize("strategy", STRATEGIES + ["leave_k_out"])
+    def test_same_seed_same_split(self, transactions, vocabulary, strategy):
+        first = split_data(transactions, vocabulary, _params(strategy))
+        second = split_data(transactions, vocabulary, _params(strategy))
+        other = split_data(transactions, vocabulary, _params(strategy, seed=7))
+
+        for a, b in zip(first, second):
+            assert (a != b).nnz == 0
+        assert any((a != b).nnz for a, b in zip(first, other))
+
+    def test_unknown_strategy(self, transactions, vocabulary):
+        with pytest.raises(ValueError):
+            split_data(transactions, vocabulary, _params("stratified"))
+
+
+class TestHoldoutProducts:
+    def test_masks_do_not_depend_on_other_rows(self, transactions, vocabulary):
+        purchases = csr_matrix(_purchases(transactions, vocabulary))
+        mask_counts = np.full(purchases.shape[0], 1)
+
+        _, heldout = holdout_products(purchases, mask_counts, seed=3)
+        _, subset = holdout_products(purchases[:100], mask_counts[:100], seed=3)
+        assert (heldout[:100] != subset).nnz == 0
@@ -0,0 +1,183 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from scipy.sparse import random as sparse_random
+
+from productrec.models import FoldIn, IdVocabulary
+from productrec.pipelines.training import train_implicit, train_implicit_warm
+from productrec.pipelines.training.nodes import (
+    EarlyStopping,
+    StopTraining,
+    _early_stopping,
+    warm_start_factors,
+)
+
+FACTORS = 4
+
+
+def _params(**params):
+    return dict({"alpha": 1, "factors": FACTORS, "regularization": 0.1,
+                 "iterations": 4, "seed": 42, "warm_start_iterations": 2,
+                 "ranking_metrics": ["ndcg"], "ranking_k": [5]}, **params)
+
+
+@pytest.fixture
+def previous_model():
+    rng = np.random.default_rng(0)
+    user_factors = rng.normal(size=(20, FACTORS))
+    # A test order of the previous run, exported with zero factors
+    user_factors[5] = 0
+    return {
+        "user_factors": user_factors,
+        "item_factors": rng.normal(size=(10, FACTORS)),
+        "order_ids": np.array(["o{:02d}".format(order) for order in range(20)]),
+        "product_ids": np.array(["p{:02d}".format(product) for product in range(10)]),
+    }
+
+
+@pytest.fixture
+def vocabulary():
+    # Shuffled against the previous model, with one new order and product
+    rng = np.random.default_rng(1)
+    return IdVocabulary({
+        "order_id": rng.permutation(["o{:02d}".format(order) for order in range(21)]),
+        "product_id": rng.permutation(
+            ["p{:02d}".format(product) for product in range(11)]),
+    })
+
+
+@pytest.fixture
+def train():
+    matrix = sparse_random(21, 11, density=0.4, format="csr", random_state=2)
+    matrix.data[:] = 1
+    return matrix
+
+
+class FakeModel:
+    def __init__(self):
+        self.user_factors = np.zeros((3, FACTORS))
+        self.item_factors = np.zeros((5, FACTORS))
+
+
+class ScriptedStopping(EarlyStopping):
+    """Reports the given metric values instead of evaluating the factors."""
+
+    def __init__(self, model, values, **kwargs):
+        super().__init__(model, None, None, np.arange(3), **kwargs)
+        self.values = iter(values)
+
+    def evaluate(self, user_factors, item_factors):
+        return next(self.values)
+
+
+class TestEarlyStopping:
+    def test_stops_after_patience(self):
+        model = FakeModel()
+        callback = ScriptedStopping(model, [0.1, 0.3, 0.2, 0.3, 0.25], every=2,
+                                    patience=3)
+
+        with pytest.raises(StopTraining):
+            for iteration in range(20):
+                # The factors of the iteration, so the best one can be told apart
+                model.user_factors = np.full((3, FACTORS), float(iteration))
+                callback(iteration, 0.0, None)
+
+        # Checkpoints every other iteration, the last three without improvement
+        assert iteration == 9
+        curve = callback.curve()
+        assert [checkpoint["iteration"] for checkpoint in curve["checkpoints"]] == \
+            [2, 4, 6, 8, 10]
+        assert curve["best_iteration"] == 4 and curve["best_value"] == 0.3
+        assert curve["stopped_iteration"] == 10
+
+        callback.restore_best(model)
+        assert (model.user_factors == 3).all()
+
+    def test_min_delta(self):
+        callback = ScriptedStopping(FakeModel(), [0.1, 0.15, 0.19], every=1,
+                                    patience=2, min_delta=0.1)
+        with pytest.raises(StopTraining):
+            for iteration in range(3):
+                callback(iteration, 0.0, None)
+        assert callback.best_iteration == 1
+
+    def test_holds_out_one_product(self, train):
+        observed, callback = _early_stopping(
+            FakeModel(), train, _params(early_stopping_orders=5))
+
+        sizes = np.diff(train.indptr) - np.diff(observed.indptr)
+        assert sizes.sum() == 5 and sizes.max() == 1
+        np.testing.assert_array_equal(callback.rows, np.flatnonzero(sizes))
+        assert (callback.orders != train[callback.rows]).nnz == 0
+
+    def test_train_implicit(self, train):
+        *_, curve = train_implicit(train, _params(iterations=20, early_stopping=True,
+                                                  early_stopping_every=2,
+                                                  early_stopping_patience=2,
+                                                  early_stopping_orders=10))
+        assert curve["metric"] == "ndcg@10"
+        assert 2 <= curve["stopped_iteration"] <= 20
+        assert curve["best_iteration"] in [checkpoint["iteration"]
+                                           for checkpoint in curve["checkpoints"]]
+
+    def test_off_by_default(self, train):
+        *_, curve = train_implicit(train, _params())
+        assert curve == {"checkpoints": []}
+
+
+class TestWarmStartFactors:
+    def test_keeps_known_factors(self, previous_model, vocabulary, train):
+        users, items, report = warm_start_factors(previous_model, vocabulary, train,
+                                                  _params())
+
+        for row, product in enumerate(vocabulary.ids["product_id"]):
+            if product != "p10":
+                np.testing.assert_array_equal(
+                    items[row], previous_model["item_factors"][int(product[1:])])
+        for row, order in enumerate(vocabulary.ids["order_id"]):
+            if order not in ("o05", "o20"):
+                np.testing.assert_array_equal(
+                    users[row], previous_model["user_factors"][int(order[1:])])
+
+        assert report == {"known_orders": 19, "new_orders": 2,
+                          "known_products": 10, "new_products": 1}
+
+    def test_folds_in_new_rows(self, previous_model, vocabulary, train):
+        users, items, _ = warm_start_factors(previous_model, vocabulary, train,
+                                             _params())
+        new_orders = np.flatnonzero(vocabulary.ids["order_id"].isin(["o05", "o20"]))
+        new_product = vocabulary.ids["product_id"].get_loc("p10")
+
+        # New products from the known orders that bought them, which happens
+        # before the new orders are folded in
+        known_users = users.copy()
+        known_users[new_orders] = 0
+        buyers = csr_matrix(train.T[new_product])
+        np.testing.assert_allclose(items[new_product],
+                                   FoldIn(known_users, 0.1).solve(buyers)[0])
+
+        # New orders from their products, including the new one
+        np.testing.assert_allclose(users[new_orders],
+                                   FoldIn(items, 0.1).solve(train[new_orders]))
+
+    def test_factor_mismatch(self, previous_model, vocabulary, train):
+        with pytest.raises(ValueError):
+            warm_start_factors(previous_model, vocabulary, train, _params(factors=8))
+
+
+class TestTrainImplicitWarm:
+    def test_report(self, previous_model, vocabulary, train):
+        user_vecs, item_vecs, _, report = train_implicit_warm(
+            train, train, train, vocabulary, previous_model, _params())
+
+        assert user_vecs.shape == (21, FACTORS)
+        assert item_vecs.shape == (11, FACTORS)
+        assert report["iterations"] == 2 and report["cold_iterations"] == 4
+        assert report["drift"]["ndcg@5"] == pytest.approx(
+            report["warm"]["ndcg@5"] - report["cold"]["ndcg@5"])
+
+    def test_without_comparison(self, previous_model, vocabulary, train):
+        *_, report = train_implicit_warm(train, train, train, vocabulary,
+                                         previous_model,
+                                         _params(warm_start_compare=False))
+        assert "drift" not in report
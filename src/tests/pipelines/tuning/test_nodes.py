@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from scipy.sparse import random as sparse_random
+
+from productrec.pipelines.tuning import tune_hyperparameters
+from productrec.pipelines.tuning.nodes import (
+    _grid,
+    _sample,
+    _successive_halving,
+    _validation_split,
+)
+
+SPACE = {"alpha": [1, 10], "factors": [4, 8], "regularization": [0.01, 0.1]}
+
+
+@pytest.fixture
+def product_train():
+    matrix = sparse_random(200, 40, density=0.1, format="csr", random_state=0)
+    matrix.data[:] = 1
+    return matrix
+
+
+def _params(**params):
+    return dict({"alpha": 1, "factors": 4, "regularization": 0.1, "iterations": 3,
+                 "seed": 42, "tuning_space": SPACE, "tuning_trials": 3,
+                 "tuning_workers": 1, "tuning_validation_orders": 50}, **params)
+
+
+class TestTuneHyperparameters:
+    @pytest.mark.parametrize("search", ["grid", "random", "halving"])
+    def test_returns_a_configuration_of_the_space(self, product_train, search):
+        best = tune_hyperparameters(product_train, _params(tuning_search=search))
+
+        assert set(best) == {"alpha", "factors", "regularization", "iterations"}
+        for key, values in SPACE.items():
+            assert best[key] in values
+
+    def test_unknown_search(self, product_train):
+        with pytest.raises(ValueError):
+            tune_hyperparameters(product_train, _params(tuning_search="bayesian"))
+
+
+class TestSearchSpace:
+    def test_grid(self):
+        grid = _grid(SPACE)
+        assert len(grid) == 8
+        assert len({tuple(candidate.values()) for candidate in grid}) == 8
+
+    def test_sample(self):
+        rng = np.random.default_rng(0)
+        sample = _sample(SPACE, 3, rng)
+        assert len({tuple(candidate.values()) for candidate in sample}) == 3
+        assert _sample(SPACE, 100, rng) == _grid(SPACE)
+
+    def test_successive_halving(self):
+        budgets = []
+
+        def run_trials(candidates):
+            budgets.append([candidate["iterations"] for candidate in candidates])
+            return [dict(candidate, score=candidate["alpha"] * candidate["factors"])
+                    for candidate in candidates]
+
+        params = {"iterations": 50, "tuning_trials": 8, "tuning_halving_factor": 2,
+                  "tuning_halving_min_iterations": 5}
+        trials = _successive_halving(run_trials, dict(SPACE, iterations=[40]), params,
+                                     np.random.default_rng(0))
+
+        assert budgets == [[5] * 8, [10] * 4, [20] * 2, [40]]
+        assert len(trials) == 15
+        assert trials[-1]["alpha"] == 10 and trials[-1]["factors"] == 8
+
+
+class TestValidationSplit:
+    def test_holds_out_one_product_of_sampled_orders(self, product_train):
+        observed, validation, heldout = _validation_split(product_train, _params())
+
+        assert ((observed + heldout) != product_train).nnz == 0
+        sizes = np.diff(heldout.indptr)
+        assert sizes.sum() == 50 and sizes.max() == 1
+        # The validation orders are the observed part of the sampled orders
+        rows = sizes > 0
+        assert (validation[rows] != observed[rows]).nnz == 0
+        assert validation[~rows].nnz == 0
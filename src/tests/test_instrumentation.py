@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from productrec.instrumentation import RunProfile, data_size
+
+
+class TestRunProfile:
+    def test_records_sequential_nodes(self):
+        profile = RunProfile("test", "run")
+        profile.start_node("first", [])
+        buffer = np.ones(2 ** 20)
+        profile.finish_node("first", {}, {"buffer": buffer})
+
+        record, = profile.nodes
+        assert not record["overlapped"]
+        assert record["peak_rss_delta_mb"] >= 0
+        assert record["outputs"]["buffer"]["bytes"] == buffer.nbytes
+
+    def test_overlapping_nodes_have_no_peak(self):
+        profile = RunProfile("test", "run")
+        profile.start_node("first", [])
+        profile.start_node("second", [])
+        profile.finish_node("first", {}, {})
+        profile.finish_node("second", {}, {})
+        profile.start_node("third", [])
+        profile.finish_node("third", {}, {})
+
+        peaks = {record["node"]: record["peak_rss_delta_mb"]
+                 for record in profile.nodes}
+        assert peaks["first"] is None and peaks["second"] is None
+        assert peaks["third"] is not None
+
+
+class TestDataSize:
+    def test_sizes(self):
+        frame = pd.DataFrame({"a": np.arange(10, dtype=np.int64)})
+        assert data_size(frame)["rows"] == 10
+        assert data_size(np.zeros((3, 4)))["bytes"] == 96
+        assert data_size("text") == {"rows": None, "nnz": None, "bytes": None}
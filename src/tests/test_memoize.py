@@ -0,0 +1,148 @@
+import time
+from collections import Counter
+
+import pandas as pd
+import pytest
+from kedro.extras.datasets.pickle import PickleDataSet
+from kedro.io import DataCatalog, MemoryDataSet
+from kedro.pipeline import Pipeline, node
+
+from productrec.extras.datasets import ChunkedParquetDataSet
+from productrec.memoize import MemoizingRunner, NodeCache
+
+CALLS = Counter()
+
+
+def scale(numbers, params):
+    CALLS["scale"] += 1
+    return [number * params["factor"] for number in numbers]
+
+
+def total(scaled):
+    CALLS["total"] += 1
+    return sum(scaled)
+
+
+def chunks(numbers):
+    CALLS["chunks"] += 1
+    return (pd.DataFrame({"number": [number]}) for number in numbers)
+
+
+@pytest.fixture(autouse=True)
+def calls():
+    CALLS.clear()
+    return CALLS
+
+
+@pytest.fixture
+def numbers(tmp_path):
+    data_set = PickleDataSet(filepath=str(tmp_path / "numbers.pkl"))
+    data_set.save([1, 2, 3])
+    return data_set
+
+
+@pytest.fixture
+def pipeline():
+    return Pipeline([
+        node(scale, ["numbers", "parameters"], "scaled", name="scale"),
+        node(total, "scaled", "total", name="total"),
+    ])
+
+
+def _run(tmp_path, numbers, pipeline, **params):
+    catalog = DataCatalog({
+        "numbers": numbers,
+        "scaled": PickleDataSet(filepath=str(tmp_path / "scaled.pkl")),
+        "parameters": MemoryDataSet(dict({"factor": 2, "unused": 0}, **params)),
+    })
+    return MemoizingRunner(directory=str(tmp_path / "cache")).run(pipeline, catalog)
+
+
+class TestMemoizingRunner:
+    def test_hit(self, tmp_path, numbers, pipeline, calls):
+        assert _run(tmp_path, numbers, pipeline) == {"total": 12}
+        assert _run(tmp_path, numbers, pipeline) == {"total": 12}
+        assert calls == {"scale": 1, "total": 1}
+
+    def test_hit_restores_deleted_outputs(self, tmp_path, numbers, pipeline, calls):
+        _run(tmp_path, numbers, pipeline)
+        (tmp_path / "scaled.pkl").unlink()
+
+        assert _run(tmp_path, numbers, pipeline) == {"total": 12}
+        assert calls == {"scale": 1, "total": 1}
+        assert (tmp_path / "scaled.pkl").exists()
+
+    def test_miss_after_param_change(self, tmp_path, numbers, pipeline, calls):
+        _run(tmp_path, numbers, pipeline)
+        # A parameter the node never read does not matter
+        _run(tmp_path, numbers, pipeline, unused=1)
+        assert calls == {"scale": 1, "total": 1}
+
+        assert _run(tmp_path, numbers, pipeline, factor=3) == {"total": 18}
+        assert calls == {"scale": 2, "total": 2}
+
+    def test_miss_after_input_change(self, tmp_path, numbers, pipeline, calls):
+        _run(tmp_path, numbers, pipeline)
+        time.sleep(0.01)
+        numbers.save([1, 2, 3, 4])
+
+        assert _run(tmp_path, numbers, pipeline) == {"total": 20}
+        assert calls == {"scale": 2, "total": 2}
+
+    def test_memory_inputs_always_run(self, tmp_path, pipeline, calls):
+        # Their content is never hashed, so neither node can be identified
+        numbers = MemoryDataSet([1, 2, 3])
+        _run(tmp_path, numbers, pipeline)
+        _run(tmp_path, numbers, pipeline)
+        assert calls == {"scale": 2, "total": 2}
+
+    def test_caches_chunked_outputs(self, tmp_path, numbers, calls):
+        pipeline = Pipeline([node(chunks, "numbers", "frame", name="chunks")])
+        frame = ChunkedParquetDataSet(filepath=str(tmp_path / "frame.parquet"))
+
+        def run():
+            catalog = DataCatalog({"numbers": numbers, "frame": frame})
+            MemoizingRunner(directory=str(tmp_path / "cache")).run(pipeline, catalog)
+
+        run()
+        (tmp_path / "frame.parquet").unlink()
+        run()
+
+        assert calls == {"chunks": 1}
+        assert frame.load()["number"].tolist() == [1, 2, 3]
+
+    def test_clear(self, tmp_path, numbers, pipeline, calls):
+        _run(tmp_path, numbers, pipeline)
+        cache = NodeCache(str(tmp_path / "cache"))
+        assert cache.clear("total") == 1
+        assert list(cache.entries().node) == ["scale"]
+
+        _run(tmp_path, numbers, pipeline)
+        assert calls == {"scale": 1, "total": 2}
+
+        assert NodeCache(str(tmp_path / "cache")).clear() == 2
+        _run(tmp_path, numbers, pipeline)
+        assert calls == {"scale": 2, "total": 3}
+
+
+class TestNodeCache:
+    def test_evicts_least_recently_used(self, tmp_path):
+        directory = str(tmp_path / "cache")
+        for name in ["first", "second"]:
+            cache = NodeCache(directory, max_entries=2)
+            cache.store(name, name, name, {}, {"out": name})
+            time.sleep(0.01)
+
+        cache = NodeCache(directory, max_entries=2)
+        assert cache.lookup("first", {}) == "first"
+        time.sleep(0.01)
+        cache.store("third", "third", "third", {}, {"out": "third"})
+
+        assert set(cache.index) == {"first", "third"}
+        assert not (tmp_path / "cache" / "entries" / "second").exists()
+        assert cache.load("first", "out") == "first"
+
+    def test_skips_outputs_over_the_size_limit(self, tmp_path):
+        cache = NodeCache(str(tmp_path / "cache"), max_mb=0.001)
+        assert not cache.store("big", "big", "big", {}, {"out": "x" * 10000})
+        assert cache.lookup("big", {}) is None
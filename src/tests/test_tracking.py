@@ -0,0 +1,117 @@
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from productrec import tracking
+
+
+class RecordingBackend:
+    batches = []
+
+    def __init__(self, name, config, directory):
+        pass
+
+    def write(self, batch):
+        self.batches.append(batch)
+
+    def close(self):
+        pass
+
+
+class FailingBackend(RecordingBackend):
+    def write(self, batch):
+        raise ConnectionError("unreachable")
+
+
+class BlockingBackend(RecordingBackend):
+    release = threading.Event()
+
+    def write(self, batch):
+        self.release.wait()
+
+
+@pytest.fixture(autouse=True)
+def backends(monkeypatch):
+    RecordingBackend.batches = []
+    monkeypatch.setitem(tracking.BACKENDS, "recording", RecordingBackend)
+    monkeypatch.setitem(tracking.BACKENDS, "failing", FailingBackend)
+    monkeypatch.setitem(tracking.BACKENDS, "blocking", BlockingBackend)
+    yield
+    tracking.finish_run()
+
+
+def _draw(figure, values):
+    figure.add_subplot().plot(values)
+
+
+class TestTracking:
+    def test_nothing_is_logged_outside_a_run(self):
+        tracking.set_node("node")
+        tracking.log({"value": 1})
+        tracking.log_plot("plot", _draw, [1, 2])
+
+    def test_local_backend(self, tmp_path):
+        tracking.start_run("run", {"factors": 8}, directory=str(tmp_path))
+        tracking.set_node("train")
+        tracking.log({"loss": 0.5})
+        tracking.log_table("trials", pd.DataFrame({"score": [0.1, 0.2]}))
+        tracking.set_node("report")
+        tracking.log_plot("curve/train", _draw, [1, 2, 3])
+        tracking.finish_run()
+
+        run = tmp_path / "run"
+        assert json.loads((run / "config.json").read_text()) == {"factors": 8}
+        lines = [json.loads(line)
+                 for line in (run / "metrics.jsonl").read_text().splitlines()]
+        assert lines[0]["loss"] == 0.5 and lines[0]["_node"] == "train"
+        assert lines[1]["_node"] == "report"
+        assert "render_seconds/curve/train" in lines[1]
+
+        table, = (run / "tables").glob("trials.*.parquet")
+        assert pd.read_parquet(table)["score"].tolist() == [0.1, 0.2]
+        image, = (run / "images").glob("curve_train.*.png")
+        assert image.read_bytes().startswith(b"\x89PNG")
+
+    def test_batches(self):
+        tracking.start_run("run", {}, backends=["recording"], batch_size=2,
+                           flush_seconds=60)
+        for step in range(5):
+            tracking.log({"step": step})
+        tracking.finish_run()
+
+        sizes = [len(batch) for batch in RecordingBackend.batches]
+        assert sizes == [2, 2, 1]
+        steps = [entry["value"]["step"] for batch in RecordingBackend.batches
+                 for entry in batch]
+        assert steps == list(range(5))
+
+    def test_drops_failing_backends(self, caplog):
+        tracking.start_run("run", {}, backends=["failing", "recording"],
+                           batch_size=1)
+        tracking.log({"first": 1})
+        tracking.log({"second": 2})
+        tracking.finish_run()
+
+        assert len(RecordingBackend.batches) == 2
+        assert caplog.text.count("Dropping the FailingBackend") == 1
+
+    def test_slow_backends_do_not_block_logging(self):
+        BlockingBackend.release.clear()
+        tracking.start_run("run", {}, backends=["blocking"], batch_size=1)
+        for step in range(100):
+            tracking.log({"step": step})
+        BlockingBackend.release.set()
+        tracking.finish_run()
+
+    def test_failed_plots_are_skipped(self, caplog):
+        def broken(figure):
+            raise ValueError("no data")
+
+        tracking.start_run("run", {}, backends=["recording"])
+        tracking.log_plot("broken", broken)
+        tracking.finish_run()
+
+        assert "Could not render broken" in caplog.text
+        assert not RecordingBackend.batches